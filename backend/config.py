@@ -0,0 +1,82 @@
+import os
+from dotenv import load_dotenv
+
+# Load settings from backend/.env if present
+load_dotenv()
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Location of the ml-models training code and its saved artifacts
+ML_MODELS_DIR = os.getenv("AGRISEVA_ML_MODELS_DIR", os.path.join(BACKEND_DIR, "..", "ml-models"))
+MODEL_DIR = os.getenv("AGRISEVA_MODEL_DIR", os.path.join(ML_MODELS_DIR, "saved_models"))
+
+# Versioned model registry (published by the ml-models training scripts). When a model
+# has an activated version it is served instead of MODEL_DIR; POST /api/admin/models/...
+# swaps versions at runtime and needs ADMIN_TOKEN (empty disables the admin endpoints)
+MODEL_REGISTRY_DIR = os.getenv("AGRISEVA_MODEL_REGISTRY_DIR", os.path.join(ML_MODELS_DIR, "model_registry"))
+ADMIN_TOKEN = os.getenv("AGRISEVA_ADMIN_TOKEN", "")
+# Dummy-input passes per inference session before a loaded version takes traffic
+MODEL_WARMUP_RUNS = int(os.getenv("AGRISEVA_MODEL_WARMUP_RUNS", "3"))
+# Niceness of the thread that warms up versions loaded while serving (0-19, higher yields more)
+MODEL_WARMUP_NICENESS = int(os.getenv("AGRISEVA_MODEL_WARMUP_NICENESS", "10"))
+# How often each worker checks the registry for a version activated through another worker (0 = never)
+MODEL_POLL_SECONDS = float(os.getenv("AGRISEVA_MODEL_POLL_SECONDS", "10"))
+
+# Inference executor settings
+INFERENCE_WORKERS = int(os.getenv("AGRISEVA_INFERENCE_WORKERS", "2"))
+INFERENCE_MAX_QUEUE = int(os.getenv("AGRISEVA_INFERENCE_MAX_QUEUE", "32"))
+
+# Micro-batching for disease detection (a batch closes at max size or max wait)
+BATCH_MAX_SIZE = int(os.getenv("AGRISEVA_BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.getenv("AGRISEVA_BATCH_MAX_WAIT_MS", "10"))
+
+# Model runtime: "auto" prefers ONNX Runtime when an .onnx export is present,
+# "onnx" requires it, "native" always uses PyTorch / NumPy / Keras
+MODEL_BACKEND = os.getenv("AGRISEVA_MODEL_BACKEND", "auto").lower()
+ONNX_SESSIONS = int(os.getenv("AGRISEVA_ONNX_SESSIONS", str(INFERENCE_WORKERS)))
+ONNX_INTRA_OP_THREADS = int(os.getenv("AGRISEVA_ONNX_INTRA_OP_THREADS", "0"))
+ONNX_INTER_OP_THREADS = int(os.getenv("AGRISEVA_ONNX_INTER_OP_THREADS", "1"))
+
+# Disease model precision for the ONNX path: fp32, int8_dynamic or int8_static
+DISEASE_MODEL_VARIANT = os.getenv("AGRISEVA_DISEASE_MODEL_VARIANT", "fp32").lower()
+
+# Disease detection result cache (RESULT_CACHE_PATH enables SQLite persistence)
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("AGRISEVA_RESULT_CACHE_MAX_ENTRIES", "10000"))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("AGRISEVA_RESULT_CACHE_TTL_SECONDS", "86400"))
+RESULT_CACHE_PATH = os.getenv("AGRISEVA_RESULT_CACHE_PATH", "")
+# Rows kept in the SQLite copy, which outlives restarts and is shared between workers
+RESULT_CACHE_DISK_MAX_ENTRIES = int(os.getenv("AGRISEVA_RESULT_CACHE_DISK_MAX_ENTRIES", "100000"))
+
+# Upload limits and early downscaling for disease detection images
+UPLOAD_MAX_BYTES = int(os.getenv("AGRISEVA_UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+IMAGE_MAX_PIXELS = int(os.getenv("AGRISEVA_IMAGE_MAX_PIXELS", str(50_000_000)))
+IMAGE_DECODE_SIZE = int(os.getenv("AGRISEVA_IMAGE_DECODE_SIZE", "256"))
+
+# Durable storage for marketplace, forum and news data (empty path = in-memory only)
+STORAGE_PATH = os.getenv("AGRISEVA_STORAGE_PATH", "")
+STORAGE_POOL_SIZE = int(os.getenv("AGRISEVA_STORAGE_POOL_SIZE", "4"))
+STORAGE_BATCH_SIZE = int(os.getenv("AGRISEVA_STORAGE_BATCH_SIZE", "256"))
+STORAGE_FLUSH_MS = float(os.getenv("AGRISEVA_STORAGE_FLUSH_MS", "20"))
+# Attempts per write batch before its writes are reported as failed
+STORAGE_WRITE_ATTEMPTS = int(os.getenv("AGRISEVA_STORAGE_WRITE_ATTEMPTS", "5"))
+# How often writes from other workers are applied to this worker's in-memory copy
+STORAGE_POLL_MS = float(os.getenv("AGRISEVA_STORAGE_POLL_MS", "50"))
+
+# Market price history file (.npz) loaded at startup and written after ingestion;
+# empty keeps prices in memory, seeded with mock history
+PRICE_STORE_PATH = os.getenv("AGRISEVA_PRICE_STORE_PATH", "")
+# How often each worker reloads the price store file after another worker ingested into it (0 = never)
+PRICE_STORE_POLL_SECONDS = float(os.getenv("AGRISEVA_PRICE_STORE_POLL_SECONDS", "10"))
+
+# Weather upstream (empty URL = mock provider) and its per-location cache; entries
+# are served for WEATHER_STALE_SECONDS past their TTL while a refresh runs
+WEATHER_API_URL = os.getenv("AGRISEVA_WEATHER_API_URL", "")
+WEATHER_TIMEOUT_SECONDS = float(os.getenv("AGRISEVA_WEATHER_TIMEOUT_SECONDS", "5"))
+WEATHER_MAX_CONNECTIONS = int(os.getenv("AGRISEVA_WEATHER_MAX_CONNECTIONS", "20"))
+WEATHER_TTL_SECONDS = float(os.getenv("AGRISEVA_WEATHER_TTL_SECONDS", "600"))
+WEATHER_STALE_SECONDS = float(os.getenv("AGRISEVA_WEATHER_STALE_SECONDS", "1800"))
+WEATHER_CACHE_MAX_ENTRIES = int(os.getenv("AGRISEVA_WEATHER_CACHE_MAX_ENTRIES", "10000"))
+
+# Server processes when run as `python main.py`; more than one needs AGRISEVA_STORAGE_PATH
+# so the workers share marketplace, forum and news data
+WORKERS = int(os.getenv("AGRISEVA_WORKERS", "1"))
@@ -0,0 +1,135 @@
+import math
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# Half the circumference: no two points are further apart than this
+MAX_DISTANCE_KM = math.pi * EARTH_RADIUS_KM
+
+# 0.25 degrees is about 28 km north-south, so a 50 km query touches a handful of cells
+DEFAULT_CELL_DEGREES = 0.25
+
+Cell = Tuple[int, int]
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Great-circle distances in km from one point to arrays of points"""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def validate_point(lat: float, lon: float):
+    if not -90 <= lat <= 90:
+        raise ValueError("latitude must be between -90 and 90")
+    if not -180 <= lon <= 180:
+        raise ValueError("longitude must be between -180 and 180")
+
+
+class GridIndex:
+    """Points bucketed into a uniform latitude/longitude grid.
+
+    A radius query only visits the cells overlapping the query's bounding box,
+    then ranks the points found there by exact haversine distance in one
+    vectorized pass. Keys are any hashable id: product ids, mandi names.
+    """
+
+    def __init__(self, cell_degrees: float = DEFAULT_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self._rows = math.ceil(180 / cell_degrees)
+        self._columns = math.ceil(360 / cell_degrees)
+        self._cells: Dict[Cell, Dict[Hashable, Tuple[float, float]]] = {}
+        self._points: Dict[Hashable, Cell] = {}
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._points
+
+    def clear(self):
+        self.__init__(self.cell_degrees)
+
+    def _row(self, lat: float) -> int:
+        return min(int((lat + 90) // self.cell_degrees), self._rows - 1)
+
+    def _column(self, lon: float) -> int:
+        return int((lon + 180) // self.cell_degrees) % self._columns
+
+    def add(self, key: Hashable, lat: float, lon: float):
+        """Index a point, replacing any previous position for the key"""
+        validate_point(lat, lon)
+        self.remove(key)
+        cell = (self._row(lat), self._column(lon))
+        self._cells.setdefault(cell, {})[key] = (lat, lon)
+        self._points[key] = cell
+
+    def remove(self, key: Hashable):
+        cell = self._points.pop(key, None)
+        if cell is None:
+            return
+        points = self._cells[cell]
+        del points[key]
+        if not points:
+            del self._cells[cell]
+
+    def get(self, key: Hashable) -> Optional[Tuple[float, float]]:
+        cell = self._points.get(key)
+        return None if cell is None else self._cells[cell][key]
+
+    def _cells_near(self, lat: float, lon: float, radius_km: float) -> Iterable[Cell]:
+        """Occupied cells overlapping the bounding box of a circle"""
+        lat_span = radius_km / KM_PER_DEGREE
+        south, north = max(lat - lat_span, -90.0), min(lat + lat_span, 90.0)
+        rows = range(self._row(south), self._row(north) + 1)
+
+        # Longitude degrees shrink towards the poles; size the box for the widest row
+        widest = math.cos(math.radians(max(abs(south), abs(north))))
+        lon_span = 180.0 if widest < 1e-9 else radius_km / (KM_PER_DEGREE * widest)
+        if lon_span >= 180:
+            columns: Set[int] = set(range(self._columns))
+        else:
+            first = int((lon - lon_span + 180) // self.cell_degrees)
+            last = int((lon + lon_span + 180) // self.cell_degrees)
+            columns = {column % self._columns for column in range(first, last + 1)}
+
+        # Sparse grids: checking the occupied cells is cheaper than probing the whole box
+        if len(rows) * len(columns) > len(self._cells):
+            return [cell for cell in self._cells if cell[0] in rows and cell[1] in columns]
+        return [(row, column) for row in rows for column in columns if (row, column) in self._cells]
+
+    def within(self, lat: float, lon: float, radius_km: float, limit: Optional[int] = None) -> List[Tuple[Hashable, float]]:
+        """(key, distance_km) for points within radius_km, closest first"""
+        validate_point(lat, lon)
+        if radius_km <= 0:
+            raise ValueError("radius_km must be positive")
+
+        keys: List[Hashable] = []
+        coordinates: List[Tuple[float, float]] = []
+        for cell in self._cells_near(lat, lon, radius_km):
+            points = self._cells[cell]
+            keys.extend(points)
+            coordinates.extend(points.values())
+        if not keys:
+            return []
+
+        points = np.array(coordinates, dtype=np.float64)
+        distances = haversine_km(lat, lon, points[:, 0], points[:, 1])
+        inside = np.flatnonzero(distances <= radius_km)
+        order = inside[np.argsort(distances[inside], kind="stable")]
+        if limit is not None:
+            order = order[:limit]
+        return [(keys[i], float(distances[i])) for i in order]
+
+    def nearest(self, lat: float, lon: float, k: int = 1, max_radius_km: float = MAX_DISTANCE_KM) -> List[Tuple[Hashable, float]]:
+        """The k closest points, widening the search radius until enough are found"""
+        radius_km = self.cell_degrees * KM_PER_DEGREE
+        while True:
+            radius_km = min(radius_km, max_radius_km)
+            found = self.within(lat, lon, radius_km, limit=k)
+            if len(found) >= k or radius_km >= max_radius_km:
+                return found
+            radius_km *= 2
@@ -0,0 +1,72 @@
+import io
+import warnings
+from typing import BinaryIO, Union
+
+from fastapi import UploadFile
+from PIL import Image, ImageOps
+
+from config import IMAGE_DECODE_SIZE, IMAGE_MAX_PIXELS, UPLOAD_MAX_BYTES
+
+READ_CHUNK_BYTES = 64 * 1024
+
+
+class ImageRejected(ValueError):
+    """Raised for uploads that are not decodable, safe-sized images"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+async def read_upload(file: UploadFile, max_bytes: int = UPLOAD_MAX_BYTES, digest=None) -> BinaryIO:
+    """Stream an upload in chunks, rejecting it as soon as it passes max_bytes.
+
+    Nothing is buffered here: the multipart parser has already spooled the body
+    (to disk past 1 MB), so the file is rewound and returned for decode_image.
+    Chunks are fed to digest (a hashlib object), if given, on the way through.
+    """
+    total = 0
+    while True:
+        chunk = await file.read(READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise ImageRejected(f"Image exceeds the {max_bytes // (1024 * 1024)} MB upload limit", status_code=413)
+        if digest is not None:
+            digest.update(chunk)
+    await file.seek(0)
+    return file.file
+
+
+def decode_image(data: Union[bytes, BinaryIO], target_size: int = IMAGE_DECODE_SIZE, max_pixels: int = IMAGE_MAX_PIXELS) -> Image.Image:
+    """Decode an upload straight to roughly target_size pixels on its short side.
+
+    The pixel count is checked from the header before any decoding, JPEGs are
+    decoded at a reduced DCT scale via draft(), other formats are shrunk with
+    reduce(), and EXIF orientation is applied so phone photos are upright.
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", Image.DecompressionBombWarning)
+            image = Image.open(io.BytesIO(data) if isinstance(data, bytes) else data)
+    except (Image.DecompressionBombWarning, Image.DecompressionBombError):
+        raise ImageRejected("Image dimensions are too large", status_code=413)
+    except Exception:
+        raise ImageRejected("File is not a readable image")
+
+    width, height = image.size
+    if width * height > max_pixels:
+        raise ImageRejected("Image dimensions are too large", status_code=413)
+
+    try:
+        # JPEG only: pick the smallest DCT scale that still covers target_size
+        image.draft("RGB", (target_size, target_size))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+
+        factor = min(image.size) // target_size
+        if factor >= 2:
+            image = image.reduce(factor)
+        return image
+    except Exception:
+        raise ImageRejected("File is not a readable image")
@@ -0,0 +1,186 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import (
+    BATCH_MAX_SIZE,
+    BATCH_MAX_WAIT_MS,
+    INFERENCE_MAX_QUEUE,
+    INFERENCE_WORKERS,
+)
+from metrics import Histogram
+
+
+class InferenceQueueFull(Exception):
+    """Raised when too many inference requests are already waiting"""
+
+
+class InferenceExecutor:
+    """Bounded thread pool that keeps CPU-bound model inference off the event loop"""
+
+    def __init__(self, max_workers: int = INFERENCE_WORKERS, max_queue: int = INFERENCE_MAX_QUEUE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        # PyTorch releases the GIL inside its kernels, so threads share one loaded model
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._active = 0
+        # Calls that returned, and calls whose fn raised
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of submitted calls still waiting for a worker thread"""
+        return max(0, self._pending - self._active)
+
+    def _call(self, fn: Callable[..., Any], args: tuple) -> Any:
+        with self._lock:
+            self._active += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run fn(*args) on the pool, rejecting the call if the queue is full"""
+        if self._pending >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise InferenceQueueFull("Inference queue is full, please retry shortly")
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._pool, self._call, fn, args)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self._pending -= 1
+        self.completed += 1
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        """Current executor counters for the metrics endpoint"""
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "active": self._active,
+            "queue_depth": self.queue_depth,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+class MicroBatcher:
+    """Groups concurrent inference requests into batches that share one forward pass"""
+
+    def __init__(
+        self,
+        predict_batch: Callable[[List[Any]], List[Any]],
+        executor: InferenceExecutor,
+        max_batch_size: int = BATCH_MAX_SIZE,
+        max_wait_ms: float = BATCH_MAX_WAIT_MS,
+    ):
+        self.predict_batch = predict_batch
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._dispatches: set = set()
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64])
+        self.batch_latency_ms = Histogram([5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000])
+
+    def start(self):
+        """Start the collector task on the running event loop"""
+        self._queue = asyncio.Queue()
+        # One batch in flight per worker; while all are busy requests pile up
+        # in the queue, so batches grow with load
+        self._slots = asyncio.Semaphore(self.executor.max_workers)
+        self._task = asyncio.create_task(self._collect())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its own result from a shared batch"""
+        if self._queue is None:
+            raise RuntimeError("MicroBatcher.start() has not been called")
+        if self._queue.qsize() >= self.executor.max_queue * self.max_batch_size:
+            self.executor.rejected += 1
+            raise InferenceQueueFull("Inference queue is full, please retry shortly")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                # Take whatever is already queued without waiting
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch: List[Tuple[Any, asyncio.Future]]):
+        started = time.perf_counter()
+        try:
+            results = await self.executor.run(self.predict_batch, [item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+            self.batch_sizes.observe(len(batch))
+            self.batch_latency_ms.observe((time.perf_counter() - started) * 1000)
+
+        for (_, future), result in zip(batch, results):
+            # Callers that disconnected have already cancelled their future
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Batching configuration, queue depth and histograms"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "batch_size": self.batch_sizes.snapshot(),
+            "batch_latency_ms": self.batch_latency_ms.snapshot(),
+        }
+
@@ -1,16 +1,37 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends
+from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Any, Tuple
 import numpy as np
 from PIL import Image
 import io
+import os
 import json
 import asyncio
+import hmac
+import sqlite3
 from datetime import datetime, timedelta
 import random
 import requests
+import httpx
+
+from inference import InferenceExecutor, InferenceQueueFull, MicroBatcher
+from model_serving import disease_model_version, load_crop_model, load_disease_model
+from model_rollout import ModelLoadInProgress, ModelSlot, ServingModel, warm_up_crop, warm_up_disease
+from result_cache import ResultCache
+from image_ingest import ImageRejected, decode_image, read_upload
+from storage import Collection, FeedStore, MarketplaceStore
+from price_series import PriceSeries, PriceStore
+from price_ingest import ingest as ingest_prices
+from persistence import open_backend
+from search_index import InvertedIndex
+from geo_index import GridIndex
+from config import (
+    ADMIN_TOKEN, MODEL_DIR, MODEL_POLL_SECONDS, PRICE_STORE_PATH, PRICE_STORE_POLL_SECONDS, STORAGE_POLL_MS, WORKERS
+)
+from soil_batch import RowError, iter_csv_chunks, iter_file, iter_json_chunks, locations_needing_weather, rows_to_features, spool_stream
+from weather import create_weather_cache
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -71,6 +92,8 @@ class MarketplaceProduct(BaseModel):
     quantity: str
     category: str
     location: str
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
     seller_name: str
     seller_contact: str
     images: Optional[List[str]] = []
@@ -105,11 +128,149 @@ class MarketPrice(BaseModel):
     unit: str
     updated_at: datetime
 
+class ModelActivationRequest(BaseModel):
+    version: Optional[str] = None  # latest published version when omitted
+    wait: bool = False  # respond once the version is serving instead of right away
+
 # In-memory storage
-marketplace_data: List[MarketplaceProduct] = []
-forum_data: List[ForumPost] = []
-news_data: List[NewsArticle] = []
-price_data: List[MarketPrice] = []
+marketplace_store = MarketplaceStore()
+forum_store = FeedStore("created_at")
+news_store = FeedStore("published_at")
+# Replaced as a whole by ingestion and reloads, never modified while requests read it
+price_store = PriceStore()
+price_store_mtime: Optional[int] = None  # PRICE_STORE_PATH version the prices were loaded from or saved as
+price_ingest_lock = asyncio.Lock()
+
+# Full-text search indexes, updated as listings and posts are created
+marketplace_search = InvertedIndex()
+forum_search = InvertedIndex()
+marketplace_locations = GridIndex()
+
+# Title terms count double towards ranking
+TITLE_WEIGHT = 2
+
+def add_product_to(search: InvertedIndex, locations: GridIndex, product: MarketplaceProduct):
+    search.add(product.id, [(product.title, TITLE_WEIGHT), (product.description, 1)])
+    if product.latitude is not None and product.longitude is not None:
+        locations.add(product.id, product.latitude, product.longitude)
+
+def index_product(product: MarketplaceProduct):
+    add_product_to(marketplace_search, marketplace_locations, product)
+
+def unindex_product(product: MarketplaceProduct):
+    marketplace_search.remove(product.id)
+    marketplace_locations.remove(product.id)
+
+def rebuild_product_indexes(products: List[MarketplaceProduct]):
+    """Build replacement search and location indexes (in the reload thread); returns the swap"""
+    search, locations = InvertedIndex(), GridIndex()
+    for product in products:
+        add_product_to(search, locations, product)
+    
+    def swap():
+        global marketplace_search, marketplace_locations
+        marketplace_search, marketplace_locations = search, locations
+    return swap
+
+def index_forum_post(post: ForumPost):
+    forum_search.add(post.id, [(post.title, TITLE_WEIGHT), (post.content, 1)])
+
+def rebuild_forum_search(posts: List[ForumPost]):
+    search = InvertedIndex()
+    for post in posts:
+        search.add(post.id, [(post.title, TITLE_WEIGHT), (post.content, 1)])
+    
+    def swap():
+        global forum_search
+        forum_search = search
+    return swap
+
+marketplace_store.subscribe(index_product, unindex_product, rebuild_product_indexes)
+forum_store.subscribe(index_forum_post, lambda post: forum_search.remove(post.id), rebuild_forum_search)
+
+# Durable storage, opened at startup when AGRISEVA_STORAGE_PATH is set
+storage_backend = None
+
+def attach_storage():
+    """Persist the stores through the configured backend; reload_stale_stores() then loads them"""
+    global storage_backend
+    storage_backend = open_backend()
+    if storage_backend is None:
+        if WORKERS > 1:
+            print("AGRISEVA_STORAGE_PATH is not set: each worker keeps its own in-memory data")
+        return
+    for store, name, model in (
+        (marketplace_store, "marketplace", MarketplaceProduct),
+        (forum_store, "forum", ForumPost),
+        (news_store, "news", NewsArticle),
+    ):
+        store.attach(storage_backend, name, model.model_dump_json, model.model_validate_json)
+
+async def reload_stale_stores():
+    """Load each stale store (just attached, or reset by the change feed) in a thread and swap it in.
+
+    Until the swap, requests keep reading the previous copy; nothing here blocks the event loop.
+    """
+    for store in (marketplace_store, forum_store, news_store):
+        if not store.stale:
+            continue
+        store.begin_reload()
+        try:
+            install = await asyncio.to_thread(store.load_snapshot)
+        except sqlite3.Error as e:
+            store.cancel_reload()
+            print(f"Could not reload {store.name}: {e}")
+            continue
+        install()
+
+async def sync_storage(interval: float):
+    """Apply other workers' writes to the in-memory stores; the SQLite reads run off the event loop"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            reset, changes = await asyncio.to_thread(storage_backend.read_changes)
+        except sqlite3.Error as e:
+            print(f"Could not read storage changes: {e}")
+            continue
+        # Applied here, so request handlers never see an index mid-update; a reset
+        # only marks the stores stale, and they are rebuilt off the loop
+        storage_backend.apply_changes(reset, changes)
+        await reload_stale_stores()
+
+async def add_new_record(store: Collection, item: Any) -> Any:
+    """Add an item under a fresh id; persisted id allocation is a blocking transaction, so it runs in a thread"""
+    item.id = None
+    if storage_backend is not None:
+        item.id = await asyncio.to_thread(store.allocate_id)
+    return store.add(item)
+
+# Model inference state: each slot serves one model version and can swap to a
+# newly published one at runtime (see the admin endpoints)
+inference_executor = InferenceExecutor()
+disease_slot = ModelSlot("disease", load_disease_model, warm_up_disease)
+crop_slot = ModelSlot("crop", load_crop_model, warm_up_crop)
+model_slots = {"disease": disease_slot, "crop": crop_slot}
+model_backends = {"disease": "mock", "crop": "rules"}
+
+# Registry, price store and storage change-feed pollers started at startup
+watchers: List[asyncio.Task] = []
+
+# Repeated uploads of the same photo are answered from this cache
+disease_cache = ResultCache()
+
+def on_disease_swap(serving: ServingModel):
+    model_backends["disease"] = serving.backend
+    # Results from the previous version are dropped from the cache
+    if serving.version is None:
+        disease_cache.set_model_version(disease_model_version(MODEL_DIR, serving.backend))
+    else:
+        disease_cache.set_model_version(f"{serving.version}:{serving.backend}")
+
+disease_slot.subscribe(on_disease_swap)
+crop_slot.subscribe(lambda serving: model_backends.update(crop=serving.backend))
+
+# Weather lookups share one cache, so a district's farmers cause one upstream call per TTL
+weather_cache = create_weather_cache()
 
 # Mock AI models (in production, these would be loaded TensorFlow/PyTorch models)
 def get_current_season() -> str:
@@ -124,14 +285,10 @@ def get_current_season() -> str:
     else:
         return "Spring"
 
-def mock_weather_api(location: str) -> WeatherData:
-    """Mock weather API call"""
-    return WeatherData(
-        temperature=25 + random.uniform(-5, 10),
-        humidity=60 + random.uniform(-20, 30),
-        rainfall=random.uniform(0, 100),
-        season=get_current_season()
-    )
+async def get_weather_data(location: str) -> WeatherData:
+    """Current weather through the shared per-location cache"""
+    conditions = await weather_cache.get(location)
+    return WeatherData(**conditions, season=get_current_season())
 
 def generate_crop_recommendations(soil: SoilData, weather: WeatherData) -> List[CropRecommendation]:
     """Generate crop recommendations based on soil and weather data"""
@@ -214,7 +371,7 @@ def generate_crop_recommendations(soil: SoilData, weather: WeatherData) -> List[
     recommendations.sort(key=lambda x: x.confidence, reverse=True)
     return recommendations[:3]  # Return top 3 recommendations
 
-def mock_disease_detection(image_data: bytes) -> DiseaseDetectionResult:
+def mock_disease_detection(image: Image.Image) -> DiseaseDetectionResult:
     """Mock disease detection using image data"""
     diseases = [
         {
@@ -334,6 +491,59 @@ def mock_disease_detection(image_data: bytes) -> DiseaseDetectionResult:
     selected_disease = random.choice(diseases)
     return DiseaseDetectionResult(**selected_disease)
 
+def run_disease_detection_batch(images: List[Image.Image]) -> List[DiseaseDetectionResult]:
+    """Run disease detection on a batch of decoded images (called on the inference executor)"""
+    # Read once: the whole batch runs on this version even if a swap happens meanwhile
+    disease_model = disease_slot.current.model
+    if disease_model is None:
+        return [mock_disease_detection(image) for image in images]
+    
+    predictions = disease_model.predict_batch(images, top_k=1)
+    return [DiseaseDetectionResult(**top[0]) for top in predictions]
+
+def score_soil_rows(rows: List[Any], weather_by_location: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Score one chunk of soil rows (called on the inference executor with weather prefetched).
+
+    A location whose weather fetch failed maps to the exception; its rows get an error.
+    """
+    def weather_for(location: str) -> Dict[str, float]:
+        weather = weather_by_location[location]
+        if isinstance(weather, Exception):
+            raise RowError(f"Weather unavailable for {location or 'a blank location'}: {weather}")
+        return weather
+    
+    features, valid, errors = rows_to_features(rows, weather_for)
+    results: List[Dict[str, Any]] = [{"error": error} for error in errors]
+    valid_rows = np.flatnonzero(valid)
+    if len(valid_rows) == 0:
+        return results
+    
+    crop_model = crop_slot.current.model
+    if crop_model is not None:
+        # One scaler.transform and one forward pass for the whole chunk
+        crops, confidences = crop_model.predict_batch(features[valid_rows], top_k=3)
+        for j, i in enumerate(valid_rows):
+            results[i] = {"recommendations": [
+                {"crop": str(crop), "confidence": float(confidence), "rank": rank + 1}
+                for rank, (crop, confidence) in enumerate(zip(crops[j], confidences[j]))
+            ]}
+        return results
+    
+    # Rule-based fallback when no trained model is available
+    for i in valid_rows:
+        nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall = features[i].tolist()
+        soil = SoilData(ph=ph, nitrogen=nitrogen, phosphorus=phosphorus, potassium=potassium, location="")
+        weather = WeatherData(temperature=temperature, humidity=humidity, rainfall=rainfall,
+                              season=get_current_season())
+        results[i] = {"recommendations": [
+            {"crop": rec.crop, "confidence": rec.confidence, "rank": rank + 1}
+            for rank, rec in enumerate(generate_crop_recommendations(soil, weather))
+        ]}
+    return results
+
+# Concurrent uploads are grouped into shared forward passes
+disease_batcher = MicroBatcher(run_disease_detection_batch, inference_executor)
+
 # API Routes
 
 @app.get("/")
@@ -342,7 +552,64 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now()}
+    return {"status": "healthy", "timestamp": datetime.now(), "model_backends": model_backends}
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """Get runtime metrics for the inference executor"""
+    return {
+        "inference": inference_executor.stats(),
+        "disease_batching": disease_batcher.stats(),
+        "disease_cache": disease_cache.stats(),
+        "weather_cache": weather_cache.stats(),
+        "storage": storage_backend.stats() if storage_backend else {"backend": "memory"},
+        "model_backends": model_backends,
+        "model_versions": {name: slot.current.version for name, slot in model_slots.items()}
+    }
+
+# Admin Endpoints
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints need the AGRISEVA_ADMIN_TOKEN value in the X-Admin-Token header"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (AGRISEVA_ADMIN_TOKEN is not set)")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+@app.get("/api/admin/models", dependencies=[Depends(require_admin)])
+async def get_model_versions():
+    """Serving, loading and published versions of each model"""
+    return {name: await asyncio.to_thread(slot.status) for name, slot in model_slots.items()}
+
+@app.post("/api/admin/models/{name}/activate", dependencies=[Depends(require_admin)])
+async def activate_model_version(name: str, request: ModelActivationRequest):
+    """Load a published model version in the background, warm it up and swap it in.
+    
+    Requests keep being served by the current version until the swap, and
+    batches already running finish on it. Only this worker swaps immediately;
+    the others follow within AGRISEVA_MODEL_POLL_SECONDS.
+    """
+    slot = model_slots.get(name)
+    if slot is None:
+        raise HTTPException(status_code=404, detail=f"Unknown model: {name}")
+    
+    try:
+        version = slot.start_activation(request.version)
+    except ImportError as e:
+        raise HTTPException(status_code=503, detail=f"Model registry unavailable: {e}")
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ModelLoadInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    if not request.wait:
+        return JSONResponse(status_code=202, content={"model": name, "version": version, "status": "loading"})
+    
+    await slot.wait()
+    if slot.current.version != version:
+        raise HTTPException(status_code=500, detail=f"Model version failed to load: {slot.last_error}")
+    return {"model": name, "version": version, "status": "serving", "current": slot.current.describe()}
 
 # Crop Advisory Endpoints
 @app.post("/api/crop-advisory/analyze")
@@ -352,7 +619,7 @@ async def analyze_crop_advisory(request: CropAdvisoryRequest):
         # Get weather data if not provided
         weather = request.weather
         if not weather:
-            weather = mock_weather_api(request.soil.location)
+            weather = await get_weather_data(request.soil.location)
         
         # Generate recommendations
         recommendations = generate_crop_recommendations(request.soil, weather)
@@ -366,12 +633,66 @@ async def analyze_crop_advisory(request: CropAdvisoryRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/crop-advisory/analyze-batch")
+async def analyze_crop_advisory_batch(request: Request):
+    """Score many soil samples (JSON array or CSV) and stream results as NDJSON"""
+    content_type = request.headers.get("content-type", "")
+    
+    if "multipart/form-data" in content_type:
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Missing CSV file field 'file'")
+        chunks = iter_csv_chunks(iter_file(upload.file))
+    elif "csv" in content_type:
+        # Spool the body first: the response stream cannot read the request concurrently
+        chunks = iter_csv_chunks(iter_file(await spool_stream(request.stream())))
+    elif "json" in content_type:
+        try:
+            rows = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON body")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of soil samples")
+        
+        async def json_chunks():
+            for chunk in iter_json_chunks(rows):
+                yield chunk
+        
+        chunks = json_chunks()
+    else:
+        raise HTTPException(status_code=415, detail="Send application/json, text/csv or a multipart CSV file")
+    
+    async def generate():
+        # The 200 status is already sent, so every failure becomes an error line
+        row_number = 0
+        try:
+            async for chunk in chunks:
+                # Fetch missing weather once per distinct location, concurrently
+                locations = locations_needing_weather(chunk)
+                conditions = await asyncio.gather(*(weather_cache.get(location) for location in locations),
+                                                  return_exceptions=True)
+                try:
+                    results = await inference_executor.run(score_soil_rows, chunk, dict(zip(locations, conditions)))
+                except InferenceQueueFull as e:
+                    results = [{"error": str(e)}] * len(chunk)
+                lines = []
+                for result in results:
+                    lines.append(json.dumps({"row": row_number, **result}))
+                    row_number += 1
+                yield "\n".join(lines) + "\n"
+        except Exception as e:
+            yield json.dumps({"row": row_number, "error": f"Batch aborted: {e}"}) + "\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
 @app.get("/api/weather/{location}")
 async def get_weather(location: str):
     """Get weather data for a location"""
     try:
-        weather = mock_weather_api(location)
-        return weather
+        return await get_weather_data(location)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Weather service unavailable: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -383,51 +704,109 @@ async def analyze_plant_disease(file: UploadFile = File(...)):
         if not file.content_type.startswith("image/"):
             raise HTTPException(status_code=400, detail="File must be an image")
         
-        # Read image data
-        image_data = await file.read()
+        # Check the size and hash the spooled upload in chunks; it is decoded from the spool, not copied
+        digest = disease_cache.hasher()
+        image_file = await read_upload(file, digest=digest)
         
-        # Mock processing delay
-        await asyncio.sleep(2)
-        
-        # Generate mock result
-        result = mock_disease_detection(image_data)
+        # Identical uploads (e.g. retries on a flaky connection) hit the cache
+        cache_key = digest.hexdigest()
+        cached = await disease_cache.get(cache_key)
+        if cached is not None:
+            result = DiseaseDetectionResult(**cached)
+        else:
+            model_version = disease_cache.model_version
+            # Decode straight to ~256px, then batch inference; both run off the event loop
+            image = await inference_executor.run(decode_image, image_file)
+            result = await disease_batcher.submit(image)
+            disease_cache.put(cache_key, result.model_dump(mode="json"), model_version=model_version)
         
         return {
             "filename": file.filename,
             "result": result,
+            "cached": cached is not None,
             "timestamp": datetime.now()
         }
+    except HTTPException:
+        raise
+    except ImageRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except InferenceQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Marketplace Endpoints
+# Wider searches would scan most of the grid for a marketplace that trades locally anyway
+NEARBY_RADIUS_MAX_KM = 500.0
+
 @app.get("/api/marketplace/products")
 async def get_marketplace_products(
     category: Optional[str] = None,
     location: Optional[str] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    near: Optional[str] = None,
+    radius_km: float = Query(50.0, gt=0, le=NEARBY_RADIUS_MAX_KM),
+    sort: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0)
 ):
-    """Get marketplace products with filtering"""
-    products = marketplace_data.copy()
+    """Get marketplace products with filtering; near=lat,lon limits results to radius_km and adds distance_km"""
+    if category == "all":
+        category = None
     
-    if category and category != "all":
-        products = [p for p in products if p.category.lower() == category.lower()]
+    # Search and near narrow the indexed filters to matching ids; without an explicit sort,
+    # nearby results come closest first and search results by relevance
+    scores = marketplace_search.search(search) if search else None
+    distances = None
+    if near is not None:
+        try:
+            lat, lon = (float(part) for part in near.split(","))
+            distances = dict(marketplace_locations.within(lat, lon, radius_km))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"near must be 'lat,lon' within range: {e}")
     
-    if location:
-        products = [p for p in products if location.lower() in p.location.lower()]
+    candidate_ids = None
+    for ids in (scores, distances):
+        if ids is not None:
+            candidate_ids = set(ids) if candidate_ids is None else candidate_ids.intersection(ids)
     
-    if search:
-        products = [p for p in products if search.lower() in p.title.lower() or search.lower() in p.description.lower()]
+    rank = None
+    if sort is None and distances is not None:
+        rank = lambda p: distances[p.id]
+    elif sort is None and scores is not None:
+        rank = lambda p: -scores[p.id]
+    
+    try:
+        products, total = marketplace_store.query(
+            category=category,
+            location=location,
+            min_price=min_price,
+            max_price=max_price,
+            candidate_ids=candidate_ids,
+            sort=sort,
+            offset=0 if rank else offset,
+            limit=None if rank else limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    return {"products": products, "total": len(products)}
+    if rank:
+        products.sort(key=rank)
+        products = products[offset:None if limit is None else offset + limit]
+    
+    if distances is not None:
+        products = [{**p.model_dump(), "distance_km": round(distances[p.id], 2)} for p in products]
+    
+    return {"products": products, "total": total}
 
 @app.post("/api/marketplace/products")
 async def create_marketplace_product(product: MarketplaceProduct):
     """Create a new marketplace product listing"""
     try:
-        product.id = len(marketplace_data) + 1
         product.created_at = datetime.now()
-        marketplace_data.append(product)
+        await add_new_record(marketplace_store, product)
         
         return {"message": "Product listed successfully", "product": product}
     except Exception as e:
@@ -436,48 +815,63 @@ async def create_marketplace_product(product: MarketplaceProduct):
 @app.get("/api/marketplace/products/{product_id}")
 async def get_marketplace_product(product_id: int):
     """Get a specific marketplace product"""
-    product = next((p for p in marketplace_data if p.id == product_id), None)
+    product = marketplace_store.get(product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     return product
 
 # Forum Endpoints
+FEED_PAGE_MAX = 100
+
 @app.get("/api/forum/posts")
 async def get_forum_posts(
     category: Optional[str] = None,
     search: Optional[str] = None,
-    limit: int = 10,
-    offset: int = 0
+    limit: int = Query(10, ge=1, le=FEED_PAGE_MAX),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    include_total: bool = True
 ):
-    """Get forum posts with filtering and pagination"""
-    posts = forum_data.copy()
-    
-    if category and category != "all":
-        posts = [p for p in posts if p.category == category]
+    """Get forum posts with filtering and pagination.
+
+    Newest-first pages continue from next_cursor; search results are ranked by
+    relevance and paginated by offset.
+    """
+    if category == "all":
+        category = None
     
     if search:
-        posts = [p for p in posts if search.lower() in p.title.lower() or search.lower() in p.content.lower()]
-    
-    # Sort by creation date (newest first)
-    posts.sort(key=lambda x: x.created_at or datetime.min, reverse=True)
-    
-    # Apply pagination
-    paginated_posts = posts[offset:offset + limit]
+        if include_total:
+            scores = forum_search.search(search)
+        else:
+            # Without a total only the requested window needs ranking, so the index can stop early
+            in_category = (lambda post_id: bool(forum_store.filter([post_id], category))) if category else None
+            scores = forum_search.search(search, limit=offset + limit, accept=in_category)
+        posts = forum_store.filter(scores, category)
+        paginated_posts = posts[offset:offset + limit]
+        next_cursor = None
+        total = len(posts) if include_total else None
+    else:
+        try:
+            paginated_posts, next_cursor = forum_store.page(category, cursor, offset, limit)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        total = forum_store.count(category) if include_total else None
     
     return {
         "posts": paginated_posts,
-        "total": len(posts),
+        "total": total,
         "limit": limit,
-        "offset": offset
+        "offset": offset,
+        "next_cursor": next_cursor
     }
 
 @app.post("/api/forum/posts")
 async def create_forum_post(post: ForumPost):
     """Create a new forum post"""
     try:
-        post.id = len(forum_data) + 1
         post.created_at = datetime.now()
-        forum_data.append(post)
+        await add_new_record(forum_store, post)
         
         return {"message": "Post created successfully", "post": post}
     except Exception as e:
@@ -486,7 +880,7 @@ async def create_forum_post(post: ForumPost):
 @app.get("/api/forum/posts/{post_id}")
 async def get_forum_post(post_id: int):
     """Get a specific forum post"""
-    post = next((p for p in forum_data if p.id == post_id), None)
+    post = forum_store.get(post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     return post
@@ -495,26 +889,23 @@ async def get_forum_post(post_id: int):
 @app.get("/api/news")
 async def get_agriculture_news(
     category: Optional[str] = None,
-    limit: int = 10,
-    offset: int = 0
+    limit: int = Query(10, ge=1, le=FEED_PAGE_MAX),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    include_total: bool = True
 ):
-    """Get agricultural news"""
-    news = news_data.copy()
-    
-    if category:
-        news = [n for n in news if n.category.lower() == category.lower()]
-    
-    # Sort by publication date (newest first)
-    news.sort(key=lambda x: x.published_at, reverse=True)
-    
-    # Apply pagination
-    paginated_news = news[offset:offset + limit]
+    """Get agricultural news, newest first; pass next_cursor back for the following page"""
+    try:
+        paginated_news, next_cursor = news_store.page(category, cursor, offset, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return {
         "news": paginated_news,
-        "total": len(news),
+        "total": news_store.count(category) if include_total else None,
         "limit": limit,
-        "offset": offset
+        "offset": offset,
+        "next_cursor": next_cursor
     }
 
 @app.get("/api/market-prices")
@@ -523,18 +914,178 @@ async def get_market_prices(
     market: Optional[str] = None
 ):
     """Get current market prices"""
-    prices = price_data.copy()
+    prices = [MarketPrice(**snapshot) for snapshot in price_store.latest(commodity, market)]
+    return {"prices": prices, "total": len(prices)}
+
+def get_price_series(commodity: str, market: str) -> PriceSeries:
+    series = price_store.get(commodity, market)
+    if series is None:
+        raise HTTPException(status_code=404, detail="No price history for this commodity and market")
+    return series
+
+def format_times(times: np.ndarray) -> List[str]:
+    return np.datetime_as_string(times, unit="s").tolist()
+
+def format_values(values: np.ndarray) -> List[float]:
+    return np.round(values.astype(np.float64), 2).tolist()
+
+# Series responses are plain columns, returned as JSONResponse to skip per-item encoding
+@app.get("/api/market-prices/history")
+async def get_price_history(
+    commodity: str,
+    market: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """Get raw price history for a commodity in one market"""
+    series = get_price_series(commodity, market)
+    times, prices = series.range(start, end)
+    return JSONResponse({
+        "commodity": series.commodity,
+        "market": series.market,
+        "unit": series.unit,
+        "time": format_times(times),
+        "price": format_values(prices)
+    })
+
+@app.get("/api/market-prices/ohlc")
+async def get_price_ohlc(
+    commodity: str,
+    market: str,
+    interval: str = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """Get daily or weekly open/high/low/close prices"""
+    series = get_price_series(commodity, market)
+    try:
+        bars = series.ohlc(interval, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    if commodity:
-        prices = [p for p in prices if commodity.lower() in p.commodity.lower()]
+    return JSONResponse({
+        "commodity": series.commodity,
+        "market": series.market,
+        "unit": series.unit,
+        "interval": interval,
+        "time": format_times(bars["time"]),
+        **{field: format_values(bars[field]) for field in ("open", "high", "low", "close", "mean")},
+        "count": bars["count"].tolist()
+    })
+
+@app.get("/api/market-prices/rolling")
+async def get_price_rolling_average(
+    commodity: str,
+    market: str,
+    window: int = 7,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """Get the rolling average price over a window of consecutive observations"""
+    series = get_price_series(commodity, market)
+    try:
+        times, means = series.rolling_mean(window, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
+    return JSONResponse({
+        "commodity": series.commodity,
+        "market": series.market,
+        "unit": series.unit,
+        "window": window,
+        "time": format_times(times),
+        "average": format_values(means)
+    })
+
+# Longest look-back for price changes; also keeps the window within datetime64 range
+PRICE_CHANGE_MAX_DAYS = 3650
+
+@app.get("/api/market-prices/change")
+async def get_price_change(
+    commodity: str,
+    market: Optional[str] = None,
+    days: float = Query(7, gt=0, le=PRICE_CHANGE_MAX_DAYS),
+    end: Optional[datetime] = None
+):
+    """Get percent price change over the last N days, for one market or every market trading the commodity"""
     if market:
-        prices = [p for p in prices if market.lower() in p.market.lower()]
+        series_list = [get_price_series(commodity, market)]
+    else:
+        series_list = price_store.for_commodity(commodity)
     
-    # Sort by update time (newest first)
-    prices.sort(key=lambda x: x.updated_at, reverse=True)
+    changes = [change for change in (s.percent_change(days, end) for s in series_list) if change]
+    return {"changes": changes, "total": len(changes)}
+
+def file_mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def ingest_price_file(file, base: PriceStore) -> Tuple[PriceStore, Dict[str, Any], Optional[int]]:
+    """Load a price file into a copy of base, so requests keep reading base until the swap"""
+    store = base.copy()
+    report = ingest_prices(file, store)
+    mtime = None
+    if PRICE_STORE_PATH:
+        store.save(PRICE_STORE_PATH)
+        mtime = file_mtime(PRICE_STORE_PATH)
+    return store, report, mtime
+
+def load_price_store(path: str) -> PriceStore:
+    store = PriceStore()
+    store.load(path)
+    return store
+
+async def watch_price_store(interval: float):
+    """Reload PRICE_STORE_PATH when another worker has ingested into it"""
+    global price_store, price_store_mtime
+    while True:
+        await asyncio.sleep(interval)
+        mtime = file_mtime(PRICE_STORE_PATH)
+        if mtime is None or mtime == price_store_mtime or price_ingest_lock.locked():
+            continue
+        try:
+            store = await asyncio.to_thread(load_price_store, PRICE_STORE_PATH)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not reload prices from {PRICE_STORE_PATH}: {e}")
+            price_store_mtime = mtime
+            continue
+        price_store, price_store_mtime = store, mtime
+        print(f"Reloaded {store.rows} price rows in {len(store)} series from {PRICE_STORE_PATH}")
+
+@app.post("/api/market-prices/ingest", dependencies=[Depends(require_admin)])
+async def ingest_market_prices(request: Request):
+    """Bulk-load a CSV or gzip-compressed CSV of daily mandi prices (multipart file or raw body).
+
+    Needs the admin token. The other workers reload the saved store within
+    AGRISEVA_PRICE_STORE_POLL_SECONDS.
+    """
+    global price_store, price_store_mtime
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Missing CSV file field 'file'")
+        file = upload.file
+    else:
+        # Spooled to disk past a small size, so large files never sit in memory
+        file = await spool_stream(request.stream())
     
-    return {"prices": prices, "total": len(prices)}
+    try:
+        # One ingest at a time, each building on the last; parsing and loading run off the event loop
+        async with price_ingest_lock:
+            store, report, mtime = await asyncio.to_thread(ingest_price_file, file, price_store)
+            price_store = store
+            if mtime is not None:
+                price_store_mtime = mtime
+    except (ValueError, UnicodeDecodeError, EOFError, OSError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not ingest price file: {e}")
+    finally:
+        file.close()
+    
+    return report
 
 # Government Support Endpoints
 @app.get("/api/support/schemes")
@@ -633,11 +1184,10 @@ async def get_support_contacts():
 
 # Initialize some mock data
 async def initialize_mock_data():
-    """Initialize the application with mock data"""
-    global marketplace_data, forum_data, news_data, price_data
-    
+    """Initialize the application with mock data; persisted collections are only seeded when empty"""
+    global price_store, price_store_mtime
     # Mock marketplace products
-    marketplace_data = [
+    products = [
         MarketplaceProduct(
             id=1,
             title="Fresh Tomatoes",
@@ -646,6 +1196,8 @@ async def initialize_mock_data():
             quantity="100 kg",
             category="Vegetables",
             location="Maharashtra",
+            latitude=18.5204,
+            longitude=73.8567,
             seller_name="Ramesh Sharma",
             seller_contact="9876543210",
             rating=4.5,
@@ -659,15 +1211,20 @@ async def initialize_mock_data():
             quantity="500 kg",
             category="Grains",
             location="Punjab",
+            latitude=30.9010,
+            longitude=75.8573,
             seller_name="Gurpreet Singh",
             seller_contact="9876543211",
             rating=4.8,
             created_at=datetime.now() - timedelta(days=2)
         )
     ]
+    if not marketplace_store.stale and marketplace_store.is_empty():
+        for product in products:
+            marketplace_store.add(product)
     
     # Mock forum posts
-    forum_data = [
+    posts = [
         ForumPost(
             id=1,
             title="Best practices for tomato farming in monsoon",
@@ -691,9 +1248,12 @@ async def initialize_mock_data():
             created_at=datetime.now() - timedelta(hours=6)
         )
     ]
+    if not forum_store.stale and forum_store.is_empty():
+        for post in posts:
+            forum_store.add(post)
     
     # Mock news data
-    news_data = [
+    articles = [
         NewsArticle(
             id=1,
             title="New Agricultural Policy Announced by Government",
@@ -713,49 +1273,59 @@ async def initialize_mock_data():
             published_at=datetime.now() - timedelta(hours=3)
         )
     ]
+    if not news_store.stale and news_store.is_empty():
+        for article in articles:
+            news_store.add(article)
     
-    # Mock price data
-    price_data = [
-        MarketPrice(
-            commodity="Rice",
-            price=2850.0,
-            change=2.5,
-            market="Delhi",
-            unit="per quintal",
-            updated_at=datetime.now()
-        ),
-        MarketPrice(
-            commodity="Wheat",
-            price=2150.0,
-            change=-1.2,
-            market="Punjab",
-            unit="per quintal",
-            updated_at=datetime.now()
-        ),
-        MarketPrice(
-            commodity="Tomato",
-            price=25.0,
-            change=5.8,
-            market="Maharashtra",
-            unit="per kg",
-            updated_at=datetime.now()
-        ),
-        MarketPrice(
-            commodity="Onion",
-            price=18.0,
-            change=-3.1,
-            market="Karnataka",
-            unit="per kg",
-            updated_at=datetime.now()
-        )
-    ]
+    # Price history from the configured store file, else mock data: 90 days per
+    # market ending at the current price and change
+    price_store = PriceStore()
+    if PRICE_STORE_PATH and os.path.exists(PRICE_STORE_PATH):
+        price_store_mtime = file_mtime(PRICE_STORE_PATH)
+        price_store = load_price_store(PRICE_STORE_PATH)
+    else:
+        rng = np.random.default_rng(7)
+        today = datetime.now().replace(microsecond=0)
+        times = np.array([today - timedelta(days=d) for d in range(89, -1, -1)], dtype="datetime64[s]")
+        for commodity, market, unit, price, change in [
+            ("Rice", "Delhi", "per quintal", 2850.0, 2.5),
+            ("Wheat", "Punjab", "per quintal", 2150.0, -1.2),
+            ("Tomato", "Maharashtra", "per kg", 25.0, 5.8),
+            ("Onion", "Karnataka", "per kg", 18.0, -3.1)
+        ]:
+            previous = price / (1 + change / 100)
+            earlier = previous / np.cumprod(1 + rng.normal(0, 0.01, len(times) - 2))
+            price_store.append(commodity, market, times, np.concatenate([earlier[::-1], [previous, price]]), unit)
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize the application"""
+    attach_storage()
+    await reload_stale_stores()
     await initialize_mock_data()
+    for slot in model_slots.values():
+        slot.load_startup()
+        if MODEL_POLL_SECONDS > 0:
+            watchers.append(asyncio.create_task(slot.watch(MODEL_POLL_SECONDS)))
+    if storage_backend is not None:
+        watchers.append(asyncio.create_task(sync_storage(STORAGE_POLL_MS / 1000)))
+    if PRICE_STORE_PATH and PRICE_STORE_POLL_SECONDS > 0:
+        watchers.append(asyncio.create_task(watch_price_store(PRICE_STORE_POLL_SECONDS)))
+    disease_batcher.start()
     print("AgriSeva API started successfully!")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release inference worker threads and flush storage"""
+    for watcher in watchers:
+        watcher.cancel()
+    await disease_batcher.stop()
+    inference_executor.shutdown()
+    disease_cache.close()
+    await weather_cache.aclose()
+    if storage_backend:
+        storage_backend.close()
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    uvicorn.run("main:app", host="0.0.0.0", port=8001, workers=WORKERS)
@@ -0,0 +1,40 @@
+import threading
+from typing import Any, Dict, List
+
+
+class Histogram:
+    """Fixed-bucket histogram in the Prometheus style (cumulative counts per upper bound)"""
+
+    def __init__(self, bounds: List[float]):
+        self.bounds = sorted(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            for i, bound in enumerate(self.bounds):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+            else:
+                self.counts[-1] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Cumulative bucket counts plus count, sum and mean"""
+        with self._lock:
+            buckets = {}
+            running = 0
+            for bound, count in zip(self.bounds, self.counts):
+                running += count
+                buckets[str(bound)] = running
+            buckets["+Inf"] = self.count
+            return {
+                "buckets": buckets,
+                "count": self.count,
+                "sum": round(self.sum, 3),
+                "mean": round(self.sum / self.count, 3) if self.count else 0.0,
+            }
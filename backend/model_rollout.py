@@ -0,0 +1,261 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from config import BATCH_MAX_SIZE, MODEL_DIR, MODEL_REGISTRY_DIR, MODEL_WARMUP_NICENESS, MODEL_WARMUP_RUNS
+from model_serving import IMAGE_SIZE, import_ml_module
+
+# Backend names load_disease_model / load_crop_model report when no model was found
+FALLBACK_BACKENDS = {"disease": "mock", "crop": "rules"}
+
+# Registry problems that leave the backend serving MODEL_DIR (e.g. ml-models not deployed)
+REGISTRY_ERRORS = (ImportError, OSError, ValueError)
+
+
+def lower_thread_priority():
+    """Runs on the warm-up thread: Linux niceness is per thread, so only warm-up yields to requests"""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), MODEL_WARMUP_NICENESS)
+    except (AttributeError, OSError):
+        pass
+
+
+# Runtime warm-ups run one at a time on a low-priority thread; PyTorch's intra-op
+# threads for this thread are spawned from it and inherit the lower priority
+warmup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-warmup",
+                                     initializer=lower_thread_priority)
+
+
+def run_paced(run: Callable[[], Any], paced: bool) -> Any:
+    # While traffic is being served, sleep as long as each batch took so warm-up
+    # uses at most about half of the CPU time it could take
+    started = time.perf_counter()
+    result = run()
+    if paced:
+        time.sleep(time.perf_counter() - started)
+    return result
+
+
+class ModelLoadInProgress(Exception):
+    """Raised when a version is requested while another one is still loading"""
+
+
+class ServingModel:
+    """A loaded model and where it came from; swapped as one object so readers never see a mix"""
+
+    def __init__(self, model: Optional[Any], backend: str, source: str,
+                 version: Optional[str] = None, manifest: Optional[Dict[str, Any]] = None):
+        self.model = model
+        self.backend = backend
+        self.source = source
+        # Registry version, or None when serving the plain MODEL_DIR artifacts
+        self.version = version
+        self.manifest = manifest
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "version": self.version,
+            "source": self.source,
+            "metrics": self.manifest["metrics"] if self.manifest else {},
+            "created_at": self.manifest["created_at"] if self.manifest else None,
+        }
+
+
+def warm_up_disease(model: Any, manifest: Optional[Dict[str, Any]], paced: bool = False,
+                    runs: int = MODEL_WARMUP_RUNS):
+    """Run dummy leaf images through every session at the batch sizes traffic will use"""
+    size = manifest["input_spec"].get("shape", [IMAGE_SIZE])[-1] if manifest else IMAGE_SIZE
+    image = Image.new("RGB", (size, size), (34, 139, 34))
+    for batch_size in sorted({1, BATCH_MAX_SIZE}):
+        for _ in range(runs * session_count(model)):
+            predictions = run_paced(lambda: model.predict_batch([image] * batch_size, top_k=1), paced)
+            if len(predictions) != batch_size:
+                raise ValueError("Disease model returned the wrong number of predictions during warm-up")
+
+
+def warm_up_crop(model: Any, manifest: Optional[Dict[str, Any]], paced: bool = False,
+                 runs: int = MODEL_WARMUP_RUNS):
+    """Run dummy soil rows through every session at the batch sizes traffic will use"""
+    num_features = manifest["input_spec"].get("shape", [None, 7])[-1] if manifest else 7
+    for batch_size in sorted({1, BATCH_MAX_SIZE}):
+        features = np.zeros((batch_size, num_features), dtype=np.float32)
+        for _ in range(runs * session_count(model)):
+            crops, _ = run_paced(lambda: model.predict_batch(features, top_k=3), paced)
+            if len(crops) != batch_size:
+                raise ValueError("Crop model returned the wrong number of predictions during warm-up")
+
+
+def session_count(model: Any) -> int:
+    # Pooled ONNX sessions are handed out in turn, so sequential runs reach each one
+    sessions = getattr(model, "sessions", None)
+    return sessions.size if sessions is not None else 1
+
+
+class ModelSlot:
+    """The model version one endpoint family serves, replaceable without a restart.
+
+    Callers read `slot.current` once per batch and use that object throughout,
+    so a swap never changes the model under an in-flight request; the previous
+    version is freed once its last batch finishes. New versions are verified,
+    loaded and warmed up on a background thread and only then swapped in.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        load: Callable[[str], Tuple[Optional[Any], str]],
+        warm_up: Callable[[Any, Optional[Dict[str, Any]], bool], None],
+        registry_dir: str = MODEL_REGISTRY_DIR,
+    ):
+        self.name = name
+        self.load = load
+        self.warm_up = warm_up
+        self.registry_dir = registry_dir
+        self.current = ServingModel(None, FALLBACK_BACKENDS[name], MODEL_DIR)
+        self.loading: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self.swaps = 0
+        self._failed_version: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._on_swap: List[Callable[[ServingModel], None]] = []
+
+    @property
+    def registry(self):
+        return import_ml_module("model_registry")
+
+    def subscribe(self, on_swap: Callable[[ServingModel], None]):
+        """Call on_swap(serving) after every swap, including the startup load"""
+        self._on_swap.append(on_swap)
+
+    def load_version(self, version: str) -> ServingModel:
+        """Verify and load a registry version (blocking; run off the event loop)"""
+        path = self.registry.version_path(self.registry_dir, self.name, version)
+        manifest = self.registry.verify(path)
+        model, backend = self.load(path)
+        if model is None:
+            raise ValueError(f"Version {version} has no loadable {self.name} model")
+        return ServingModel(model, backend, path, version, manifest)
+
+    def load_startup(self):
+        """Serve the activated registry version if there is one, otherwise MODEL_DIR"""
+        try:
+            version = self.registry.current_version(self.registry_dir, self.name)
+        except REGISTRY_ERRORS as e:
+            version = None
+            self.last_error = f"registry: {e}"
+            print(f"Model registry unavailable ({e}), serving the {self.name} model from {MODEL_DIR}")
+
+        if version is not None:
+            try:
+                serving = self.load_version(version)
+                # Nothing is being served yet, so warm up at full speed
+                self.warm_up(serving.model, serving.manifest, False)
+                self._swap(serving)
+                return
+            except Exception as e:
+                self._failed_version = version
+                self.last_error = f"{version}: {e}"
+                print(f"Could not load {self.name} model version {version} ({e}), using {MODEL_DIR}")
+
+        model, backend = self.load(MODEL_DIR)
+        if model is not None:
+            self.warm_up(model, None, False)
+        self._swap(ServingModel(model, backend, MODEL_DIR))
+
+    def start_activation(self, version: Optional[str] = None) -> str:
+        """Begin loading a version (latest published by default) in the background.
+
+        Unknown versions raise FileNotFoundError and invalid names ValueError
+        straight away; load and warm-up failures are kept in last_error and leave
+        the current version serving.
+        """
+        if self.loading is not None:
+            raise ModelLoadInProgress(f"{self.name} model version {self.loading} is still loading")
+        version = version or self.registry.latest_version(self.registry_dir, self.name)
+        if version is None:
+            raise FileNotFoundError(f"No published versions of the {self.name} model in {self.registry_dir}")
+        self.registry.version_path(self.registry_dir, self.name, version)
+
+        self.loading = version
+        self._task = asyncio.create_task(self._activate(version, persist=True))
+        return version
+
+    async def wait(self):
+        """Wait for the background activation, if any, to finish"""
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    async def _activate(self, version: str, persist: bool):
+        self.loading = version
+        try:
+            serving = await asyncio.to_thread(self.load_version, version)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(warmup_executor, self.warm_up, serving.model, serving.manifest, True)
+        except Exception as e:
+            self._failed_version = version
+            self.last_error = f"{version}: {e}"
+            print(f"Could not load {self.name} model version {version}: {e}")
+            return
+        finally:
+            self.loading = None
+
+        self.last_error = None
+        self._swap(serving)
+        if persist:
+            # Other workers and the next restart pick the version up from the registry
+            try:
+                self.registry.set_current_version(self.registry_dir, self.name, version)
+            except REGISTRY_ERRORS as e:
+                self.last_error = f"{version} is serving but could not be recorded as current: {e}"
+                print(f"Could not record {self.name} model version {version} as current: {e}")
+
+    def _swap(self, serving: ServingModel):
+        # A single reference assignment: batches already running keep the object they read
+        self.current = serving
+        self.swaps += 1
+        for on_swap in self._on_swap:
+            on_swap(serving)
+        print(f"Serving {self.name} model {serving.version or 'from ' + serving.source} ({serving.backend})")
+
+    async def watch(self, interval: float):
+        """Follow versions activated through other workers by polling the registry pointer"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                version = self.registry.current_version(self.registry_dir, self.name)
+            except REGISTRY_ERRORS as e:
+                error = f"registry: {e}"
+                if error != self.last_error:
+                    print(f"Could not read the {self.name} model registry pointer: {e}")
+                self.last_error = error
+                continue
+            if version in (None, self.current.version, self._failed_version) or self.loading is not None:
+                continue
+            await self._activate(version, persist=False)
+
+    def status(self) -> Dict[str, Any]:
+        """Serving version, load state and published versions for the admin endpoint"""
+        status = {
+            "current": self.current.describe(),
+            "loading": self.loading,
+            "last_error": self.last_error,
+            "swaps": self.swaps,
+            "activated": None,
+            "published": [],
+        }
+        try:
+            status["activated"] = self.registry.current_version(self.registry_dir, self.name)
+            status["published"] = [
+                {"version": manifest["version"], "created_at": manifest["created_at"], "metrics": manifest["metrics"]}
+                for manifest in self.registry.list_versions(self.registry_dir, self.name)
+            ]
+        except REGISTRY_ERRORS as e:
+            status["registry_error"] = str(e)
+        return status
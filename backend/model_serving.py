@@ -0,0 +1,248 @@
+import json
+import os
+import queue
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from config import (
+    DISEASE_MODEL_VARIANT,
+    ML_MODELS_DIR,
+    MODEL_BACKEND,
+    MODEL_DIR,
+    ONNX_INTER_OP_THREADS,
+    ONNX_INTRA_OP_THREADS,
+    ONNX_SESSIONS,
+)
+
+DISEASE_ONNX_VARIANTS = {
+    "fp32": "disease_detection.onnx",
+    "int8_dynamic": "disease_detection_int8_dynamic.onnx",
+    "int8_static": "disease_detection_int8_static.onnx",
+}
+CROP_ONNX_FILE = "crop_recommendation.onnx"
+
+# ImageNet normalization used by DiseaseDetectionModel.get_transforms
+IMAGE_SIZE = 224
+IMAGE_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32).reshape(1, 3, 1, 1)
+IMAGE_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32).reshape(1, 3, 1, 1)
+
+
+def import_ml_module(name: str):
+    """Import a module from the ml-models directory"""
+    if ML_MODELS_DIR not in sys.path:
+        sys.path.insert(0, ML_MODELS_DIR)
+    return __import__(name)
+
+
+class OnnxSessionPool:
+    """Fixed pool of ONNX Runtime CPU sessions shared by the inference threads"""
+
+    def __init__(
+        self,
+        model_path: str,
+        size: int = ONNX_SESSIONS,
+        intra_op_threads: int = ONNX_INTRA_OP_THREADS,
+        inter_op_threads: int = ONNX_INTER_OP_THREADS,
+    ):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+
+        self.model_path = model_path
+        self._sessions: queue.Queue = queue.Queue()
+        for _ in range(max(1, size)):
+            self._sessions.put(ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"]))
+
+        session = self._sessions.queue[0]
+        self.input_name = session.get_inputs()[0].name
+        self.size = self._sessions.qsize()
+
+    def run(self, inputs: np.ndarray) -> np.ndarray:
+        """Run the first model output on a free session, blocking until one is available"""
+        session = self._sessions.get()
+        try:
+            return session.run(None, {self.input_name: inputs})[0]
+        finally:
+            self._sessions.put(session)
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - np.max(logits, axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / np.sum(exp, axis=1, keepdims=True)
+
+
+class OnnxDiseaseModel:
+    """Disease detection on ONNX Runtime with the same predict_batch output as DiseaseDetectionModel"""
+
+    def __init__(self, sessions: OnnxSessionPool, classes: List[str], class_info: Dict[str, Any]):
+        self.sessions = sessions
+        self.classes = classes
+        self.class_info = class_info
+
+    @classmethod
+    def load(cls, model_dir: str = MODEL_DIR, variant: str = DISEASE_MODEL_VARIANT) -> "OnnxDiseaseModel":
+        with open(os.path.join(model_dir, "disease_metadata.json")) as f:
+            metadata = json.load(f)
+        sessions = OnnxSessionPool(os.path.join(model_dir, DISEASE_ONNX_VARIANTS[variant]))
+        return cls(sessions, metadata["classes"], metadata["class_info"])
+
+    def preprocess(self, images: List[Image.Image]) -> np.ndarray:
+        """Resize, scale and normalize to an NCHW float32 batch (matches the eval transforms)"""
+        batch = np.stack([
+            np.asarray(image.convert("RGB").resize((IMAGE_SIZE, IMAGE_SIZE), Image.BILINEAR), dtype=np.float32)
+            for image in images
+        ])
+        batch = batch.transpose(0, 3, 1, 2) / 255.0
+        return np.ascontiguousarray((batch - IMAGE_MEAN) / IMAGE_STD, dtype=np.float32)
+
+    def format_prediction(self, class_idx: int, confidence: float) -> Dict[str, Any]:
+        class_name = self.classes[class_idx]
+        return {
+            "disease": class_name.replace("_", " ").title(),
+            "confidence": confidence,
+            "severity": self.class_info[class_name]["severity"],
+            "description": self.class_info[class_name]["description"],
+            "symptoms": [f"Symptoms of {class_name.replace('_', ' ')}"],
+            "causes": [f"Common causes of {class_name.replace('_', ' ')}"],
+            "treatments": self.class_info[class_name]["treatments"],
+        }
+
+    def predict_batch(self, images: List[Image.Image], top_k: int = 3) -> List[List[Dict[str, Any]]]:
+        """Predict diseases for a list of PIL images with a single session run"""
+        probabilities = softmax(self.sessions.run(self.preprocess(images)))
+        top_indices = np.argsort(-probabilities, axis=1)[:, :top_k]
+        return [
+            [self.format_prediction(int(idx), float(probabilities[row, idx]) * 100) for idx in top_indices[row]]
+            for row in range(len(images))
+        ]
+
+
+class OnnxCropModel:
+    """Crop recommendation on ONNX Runtime with the same predict_batch output as CropRecommendationModel"""
+
+    def __init__(self, sessions: OnnxSessionPool, scaler_mean, scaler_scale, classes: List[str]):
+        self.sessions = sessions
+        self.scaler_mean = np.asarray(scaler_mean, dtype=np.float64)
+        self.scaler_scale = np.asarray(scaler_scale, dtype=np.float64)
+        self.classes = np.asarray(classes)
+        self.top_k_predictions = import_ml_module("crop_numpy_predictor").top_k_predictions
+
+    @classmethod
+    def load(cls, model_dir: str = MODEL_DIR) -> "OnnxCropModel":
+        with open(os.path.join(model_dir, "metadata.json")) as f:
+            metadata = json.load(f)
+        sessions = OnnxSessionPool(os.path.join(model_dir, CROP_ONNX_FILE))
+        return cls(sessions, metadata["scaler_mean"], metadata["scaler_scale"], metadata["classes"])
+
+    def predict_batch(self, features: np.ndarray, top_k: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+        """Predict top-k crops for an (n, 7) feature array"""
+        features = np.asarray(features, dtype=np.float64).reshape(-1, len(self.scaler_mean))
+        scaled = ((features - self.scaler_mean) / self.scaler_scale).astype(np.float32)
+        return self.top_k_predictions(self.sessions.run(scaled), self.classes, top_k)
+
+
+def try_load_onnx(loader, model_dir: str, filename: str) -> Optional[Any]:
+    """Load an ONNX model if configured; under "auto" a failed load falls back to native"""
+    if not use_onnx(model_dir, filename):
+        return None
+    try:
+        return loader(model_dir)
+    except Exception as e:
+        if MODEL_BACKEND == "onnx":
+            raise
+        print(f"Could not load {filename} ({e}), falling back to native model runtime")
+        return None
+
+
+def use_onnx(model_dir: str, filename: str) -> bool:
+    """Whether the configured backend and installed packages allow ONNX serving"""
+    if MODEL_BACKEND == "native":
+        return False
+    if not os.path.exists(os.path.join(model_dir, filename)):
+        if MODEL_BACKEND == "onnx":
+            print(f"AGRISEVA_MODEL_BACKEND=onnx but {filename} is missing in {model_dir}")
+        return False
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        print("onnxruntime not installed, falling back to native model runtimes")
+        return False
+    return True
+
+
+def artifact_version(path: str) -> str:
+    """Cheap identity for a model file (size and modification time)"""
+    stat = os.stat(path)
+    return f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def disease_model_version(model_dir: str, backend: str) -> str:
+    """Version string for the loaded disease model, used to invalidate cached results"""
+    if backend == "mock":
+        return "mock"
+    if backend == "pytorch":
+        return artifact_version(os.path.join(model_dir, "disease_detection_pytorch.pth"))
+    return artifact_version(os.path.join(model_dir, DISEASE_ONNX_VARIANTS[DISEASE_MODEL_VARIANT]))
+
+
+def load_disease_model(model_dir: str = MODEL_DIR) -> Tuple[Optional[Any], str]:
+    """Load the disease detection model and name its backend ("onnx", "onnx-int8_static", "pytorch" or "mock")"""
+    if DISEASE_MODEL_VARIANT not in DISEASE_ONNX_VARIANTS:
+        raise ValueError(f"Unknown AGRISEVA_DISEASE_MODEL_VARIANT: {DISEASE_MODEL_VARIANT}")
+
+    model = try_load_onnx(OnnxDiseaseModel.load, model_dir, DISEASE_ONNX_VARIANTS[DISEASE_MODEL_VARIANT])
+    if model is not None:
+        print(f"ONNX disease model ({DISEASE_MODEL_VARIANT}) loaded from {model_dir} ({model.sessions.size} sessions)")
+        return model, "onnx" if DISEASE_MODEL_VARIANT == "fp32" else f"onnx-{DISEASE_MODEL_VARIANT}"
+
+    if not os.path.exists(os.path.join(model_dir, "disease_detection_pytorch.pth")):
+        print(f"No disease detection model found in {model_dir}, using mock detection")
+        return None, "mock"
+
+    try:
+        module = import_ml_module("disease_detection_model")
+    except ImportError as e:
+        print(f"Disease detection dependencies unavailable ({e}), using mock detection")
+        return None, "mock"
+
+    model = module.DiseaseDetectionModel()
+    model.load_model(model_dir)
+    return model, "pytorch"
+
+
+def load_crop_model(model_dir: str = MODEL_DIR) -> Tuple[Optional[Any], str]:
+    """Load the crop recommendation model and name its backend ("onnx", "numpy", "keras" or "rules").
+
+    The NumPy export is preferred over Keras so API workers never import TensorFlow.
+    """
+    model = try_load_onnx(OnnxCropModel.load, model_dir, CROP_ONNX_FILE)
+    if model is not None:
+        print(f"ONNX crop model loaded from {model_dir} ({model.sessions.size} sessions)")
+        return model, "onnx"
+
+    if os.path.exists(os.path.join(model_dir, "crop_recommendation.npz")):
+        module = import_ml_module("crop_numpy_predictor")
+        model = module.NumpyCropPredictor.load(model_dir)
+        print(f"NumPy crop model loaded from {model_dir}")
+        return model, "numpy"
+
+    if not os.path.exists(os.path.join(model_dir, "crop_recommendation_tf")):
+        print(f"No crop recommendation model found in {model_dir}, using rule-based advisory")
+        return None, "rules"
+
+    try:
+        module = import_ml_module("crop_recommendation_model")
+    except ImportError as e:
+        print(f"Crop recommendation dependencies unavailable ({e}), using rule-based advisory")
+        return None, "rules"
+
+    model = module.CropRecommendationModel()
+    model.load_model(model_dir)
+    return model, "keras"
@@ -0,0 +1,418 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from config import STORAGE_BATCH_SIZE, STORAGE_FLUSH_MS, STORAGE_PATH, STORAGE_POOL_SIZE, STORAGE_WRITE_ATTEMPTS
+
+# Statement text is kept constant so each connection's statement cache reuses
+# the compiled (prepared) statement instead of re-parsing SQL on every call
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS records ("
+    "collection TEXT NOT NULL, id INTEGER NOT NULL, data TEXT NOT NULL, "
+    "PRIMARY KEY (collection, id)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS sequences (collection TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+    # Change log read by the other processes sharing the database file
+    "CREATE TABLE IF NOT EXISTS changes ("
+    "seq INTEGER PRIMARY KEY AUTOINCREMENT, collection TEXT NOT NULL, id INTEGER NOT NULL, origin TEXT NOT NULL)",
+)
+UPSERT_RECORD = "INSERT OR REPLACE INTO records (collection, id, data) VALUES (?, ?, ?)"
+DELETE_RECORD = "DELETE FROM records WHERE collection = ? AND id = ?"
+SELECT_RECORD = "SELECT data FROM records WHERE collection = ? AND id = ?"
+SELECT_COLLECTION = "SELECT id, data FROM records WHERE collection = ? ORDER BY id"
+COUNT_COLLECTION = "SELECT COUNT(*) FROM records WHERE collection = ?"
+BUMP_SEQUENCE = (
+    "INSERT INTO sequences (collection, value) VALUES (?, ?) "
+    "ON CONFLICT (collection) DO UPDATE SET value = MAX(value, excluded.value)"
+)
+NEXT_SEQUENCE = (
+    "INSERT INTO sequences (collection, value) VALUES (?, 1) "
+    "ON CONFLICT (collection) DO UPDATE SET value = value + 1"
+)
+SELECT_SEQUENCE = "SELECT value FROM sequences WHERE collection = ?"
+INSERT_CHANGE = "INSERT INTO changes (collection, id, origin) VALUES (?, ?, ?)"
+SELECT_CHANGES = (
+    "SELECT c.seq, c.collection, c.id, r.data FROM changes c "
+    "LEFT JOIN records r ON r.collection = c.collection AND r.id = c.id "
+    "WHERE c.seq > ? AND c.origin != ? ORDER BY c.seq"
+)
+CHANGE_BOUNDS = "SELECT COALESCE(MIN(seq), 0), COALESCE(MAX(seq), 0) FROM changes"
+PRUNE_CHANGES = "DELETE FROM changes WHERE seq <= (SELECT MAX(seq) FROM changes) - ?"
+
+LOAD_CHUNK_ROWS = 1000
+CHANGE_LOG_ROWS = 10000
+PRUNE_EVERY_BATCHES = 100
+RETRY_BASE_SECONDS = 0.05
+
+# Called with (id, data) for a record another process wrote, data None when it was deleted
+ChangeHandler = Callable[[int, Optional[str]], None]
+# (collection, id, data) rows returned by read_changes
+Change = Tuple[str, int, Optional[str]]
+
+
+class PersistenceError(Exception):
+    """Raised by flush() when queued writes could not be committed"""
+
+
+class PersistenceBackend:
+    """Durable record storage behind the in-memory stores.
+
+    Records are JSON documents keyed by (collection, id). Writes may be
+    buffered; flush() makes every earlier write durable and visible, or raises
+    PersistenceError for the ones that could not be committed. get, load and
+    count first wait for buffered writes, so call them off the event loop.
+    """
+
+    def next_id(self, collection: str) -> int:
+        """Atomically allocate the next id for a collection"""
+        raise NotImplementedError
+
+    def put(self, collection: str, item_id: int, data: str):
+        raise NotImplementedError
+
+    def delete(self, collection: str, item_id: int):
+        raise NotImplementedError
+
+    def get(self, collection: str, item_id: int) -> Optional[str]:
+        raise NotImplementedError
+
+    def load(self, collection: str) -> Iterator[Tuple[int, str]]:
+        """Every (id, data) record in a collection, in id order"""
+        raise NotImplementedError
+
+    def count(self, collection: str) -> int:
+        raise NotImplementedError
+
+    def watch(self, collection: str, on_change: ChangeHandler, on_reset: Callable[[], None]):
+        """Register for changes other processes make to a collection.
+
+        on_reset is called instead when changes were missed and the caller
+        should reload from scratch.
+        """
+
+    def read_changes(self) -> Tuple[bool, List[Change]]:
+        """(reset, changes) committed by other processes since the last call.
+
+        Blocking; call it off the event loop. reset means changes were missed.
+        """
+        return False, []
+
+    def apply_changes(self, reset: bool, changes: List[Change]):
+        """Deliver read_changes() output to the watchers, on the thread that owns the stores"""
+
+    def poll(self):
+        """Read and deliver pending changes from other processes in one blocking call"""
+        self.apply_changes(*self.read_changes())
+
+    def flush(self):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+    def close(self):
+        pass
+
+
+class ConnectionPool:
+    """Fixed set of SQLite connections handed out one caller at a time"""
+
+    def __init__(self, path: str, size: int):
+        self._connections: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(size):
+            self._connections.put(self.open(path))
+
+    @staticmethod
+    def open(path: str) -> sqlite3.Connection:
+        # Autocommit mode: transactions are opened explicitly where needed
+        connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None, cached_statements=64)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL only syncs at checkpoints; a crash can lose the last commits, never corrupt
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA busy_timeout=5000")
+        connection.execute("PRAGMA temp_store=MEMORY")
+        return connection
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        connection = self._connections.get()
+        try:
+            yield connection
+        finally:
+            self._connections.put(connection)
+
+    def close(self):
+        while not self._connections.empty():
+            self._connections.get_nowait().close()
+
+
+class SQLiteBackend(PersistenceBackend):
+    """SQLite (WAL mode) reference backend, safe to share between processes.
+
+    Writes are queued and committed by a single writer thread in batches of up
+    to batch_size, waiting at most flush_ms for a batch to fill. A batch that
+    fails is retried with backoff; if it still fails its writes are counted in
+    stats() and the next flush() raises. Reads and id allocation use a pool of
+    connections, which WAL lets run alongside the writer.
+
+    Each batch also appends to a change log. read_changes() checks PRAGMA
+    data_version, which only moves when another connection commits, so it costs
+    one cheap query until some other process (e.g. another uvicorn worker) writes.
+    """
+
+    def __init__(
+        self,
+        path: str = STORAGE_PATH,
+        pool_size: int = STORAGE_POOL_SIZE,
+        batch_size: int = STORAGE_BATCH_SIZE,
+        flush_ms: float = STORAGE_FLUSH_MS,
+        write_attempts: int = STORAGE_WRITE_ATTEMPTS,
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self.write_attempts = max(1, write_attempts)
+
+        self._writer = ConnectionPool.open(path)
+        for statement in SCHEMA:
+            self._writer.execute(statement)
+        self._pool = ConnectionPool(path, pool_size)
+
+        # Changes are tagged with their origin so a process skips its own
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._watchers: Dict[str, Tuple[ChangeHandler, Callable[[], None]]] = {}
+        self._watch_lock = threading.Lock()
+        self._watcher = ConnectionPool.open(path)
+        self._data_version = self._watcher.execute("PRAGMA data_version").fetchone()[0]
+        self._last_change = self._watcher.execute(CHANGE_BOUNDS).fetchone()[1]
+        self.changes_applied = 0
+        self.reloads = 0
+
+        # Highest id known to be covered by each collection's sequence, so put()
+        # only touches the sequence for explicitly numbered records (seed data, imports)
+        self._sequence_floor: Dict[str, int] = {}
+        self._sequence_lock = threading.Lock()
+
+        self._pending: "queue.Queue[Optional[Tuple[str, str, int, Optional[str]]]]" = queue.Queue()
+        self.batches = 0
+        self.writes = 0
+        self.retries = 0
+        self.failed_writes = 0
+        self.last_error: Optional[str] = None
+        # Failures not yet raised by flush(); guarded by _errors_lock
+        self._unreported: List[str] = []
+        self._errors_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._write_loop, name="sqlite-writer", daemon=True)
+        self._thread.start()
+
+    def _write_loop(self):
+        while True:
+            operation = self._pending.get()
+            if operation is None:
+                self._pending.task_done()
+                return
+
+            batch: List[Tuple[str, str, int, Optional[str]]] = [operation]
+            try:
+                while len(batch) < self.batch_size:
+                    operation = self._pending.get(timeout=self.flush_interval)
+                    if operation is None:
+                        # Put the stop marker back so the loop exits after this batch
+                        self._pending.task_done()
+                        self._pending.put(None)
+                        break
+                    batch.append(operation)
+            except queue.Empty:
+                pass
+
+            try:
+                self._commit_with_retry(batch, self.write_attempts)
+            finally:
+                for _ in batch:
+                    self._pending.task_done()
+
+    def _commit_with_retry(self, batch: List[Tuple[str, str, int, Optional[str]]], attempts: int):
+        for attempt in range(attempts):
+            try:
+                self._commit(batch)
+                return
+            except sqlite3.Error as e:
+                error = e
+            if attempt + 1 < attempts:
+                self.retries += 1
+                time.sleep(RETRY_BASE_SECONDS * 2 ** attempt)
+
+        if len(batch) > 1:
+            # One bad write should not take the rest of its batch down with it;
+            # transient errors have had their retries, so each write gets one attempt
+            for operation in batch:
+                self._commit_with_retry([operation], 1)
+            return
+
+        kind, collection, item_id, _ = batch[0]
+        message = f"SQLite {kind} of {collection} {item_id} failed: {error}"
+        print(message)
+        with self._errors_lock:
+            self.failed_writes += 1
+            self.last_error = message
+            self._unreported.append(message)
+
+    def _commit(self, batch: List[Tuple[str, str, int, Optional[str]]]):
+        self._writer.execute("BEGIN IMMEDIATE")
+        try:
+            # Consecutive operations of the same kind go through one executemany each
+            start = 0
+            while start < len(batch):
+                end = start
+                while end < len(batch) and batch[end][0] == batch[start][0]:
+                    end += 1
+                run = batch[start:end]
+                if run[0][0] == "put":
+                    self._writer.executemany(UPSERT_RECORD, [(c, i, d) for _, c, i, d in run])
+                else:
+                    self._writer.executemany(DELETE_RECORD, [(c, i) for _, c, i, _ in run])
+                self._writer.executemany(INSERT_CHANGE, [(c, i, self.origin) for _, c, i, _ in run])
+                start = end
+            if self.batches % PRUNE_EVERY_BATCHES == 0:
+                self._writer.execute(PRUNE_CHANGES, (CHANGE_LOG_ROWS,))
+            self._writer.execute("COMMIT")
+        except sqlite3.Error:
+            if self._writer.in_transaction:
+                self._writer.execute("ROLLBACK")
+            raise
+        self.batches += 1
+        self.writes += len(batch)
+
+    def _update_sequence(self, statement: str, collection: str, *params) -> int:
+        with self._pool.connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute(statement, (collection, *params))
+                value = connection.execute(SELECT_SEQUENCE, (collection,)).fetchone()[0]
+                connection.execute("COMMIT")
+            except sqlite3.Error:
+                connection.execute("ROLLBACK")
+                raise
+        with self._sequence_lock:
+            self._sequence_floor[collection] = max(self._sequence_floor.get(collection, 0), value)
+        return value
+
+    def next_id(self, collection: str) -> int:
+        return self._update_sequence(NEXT_SEQUENCE, collection)
+
+    def put(self, collection: str, item_id: int, data: str):
+        # A record with an id past the sequence (seed data, imports) moves the sequence
+        # before put() returns, so a concurrent next_id() can never hand the id out again
+        if item_id > self._sequence_floor.get(collection, 0):
+            self._update_sequence(BUMP_SEQUENCE, collection, item_id)
+        self._pending.put(("put", collection, item_id, data))
+
+    def delete(self, collection: str, item_id: int):
+        self._pending.put(("delete", collection, item_id, None))
+
+    def get(self, collection: str, item_id: int) -> Optional[str]:
+        self._pending.join()
+        with self._pool.connection() as connection:
+            row = connection.execute(SELECT_RECORD, (collection, item_id)).fetchone()
+        return row[0] if row else None
+
+    def load(self, collection: str) -> Iterator[Tuple[int, str]]:
+        self._pending.join()
+        with self._pool.connection() as connection:
+            cursor = connection.execute(SELECT_COLLECTION, (collection,))
+            while True:
+                rows = cursor.fetchmany(LOAD_CHUNK_ROWS)
+                if not rows:
+                    break
+                yield from rows
+
+    def count(self, collection: str) -> int:
+        self._pending.join()
+        with self._pool.connection() as connection:
+            return connection.execute(COUNT_COLLECTION, (collection,)).fetchone()[0]
+
+    def watch(self, collection: str, on_change: ChangeHandler, on_reset: Callable[[], None]):
+        self._watchers[collection] = (on_change, on_reset)
+
+    def read_changes(self) -> Tuple[bool, List[Change]]:
+        if not self._watchers:
+            return False, []
+        with self._watch_lock:
+            version = self._watcher.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return False, []
+            self._data_version = version
+
+            oldest, newest = self._watcher.execute(CHANGE_BOUNDS).fetchone()
+            if oldest > self._last_change + 1:
+                # The log was pruned past our position: reload everything
+                self._last_change = newest
+                return True, []
+
+            last_seen = newest
+            changes = []
+            for seq, collection, item_id, data in self._watcher.execute(
+                SELECT_CHANGES, (self._last_change, self.origin)
+            ):
+                changes.append((collection, item_id, data))
+                last_seen = max(last_seen, seq)
+            self._last_change = max(self._last_change, last_seen)
+            return False, changes
+
+    def apply_changes(self, reset: bool, changes: List[Change]):
+        if reset:
+            self.reloads += 1
+            for _, on_reset in self._watchers.values():
+                on_reset()
+            return
+        for collection, item_id, data in changes:
+            watcher = self._watchers.get(collection)
+            if watcher:
+                watcher[0](item_id, data)
+                self.changes_applied += 1
+
+    def flush(self):
+        """Block until every queued write has been committed.
+
+        Raises PersistenceError if any write failed since the previous flush().
+        """
+        self._pending.join()
+        with self._errors_lock:
+            unreported, self._unreported = self._unreported, []
+        if unreported:
+            raise PersistenceError("; ".join(unreported))
+
+    def stats(self) -> dict:
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "pending_writes": self._pending.qsize(),
+            "writes": self.writes,
+            "batches": self.batches,
+            "mean_batch_size": round(self.writes / self.batches, 2) if self.batches else 0.0,
+            "retries": self.retries,
+            "failed_writes": self.failed_writes,
+            "last_error": self.last_error,
+            "origin": self.origin,
+            "changes_applied": self.changes_applied,
+            "reloads": self.reloads,
+        }
+
+    def close(self):
+        self._pending.put(None)
+        self._thread.join()
+        self._writer.close()
+        with self._watch_lock:
+            self._watcher.close()
+        self._pool.close()
+
+
+def open_backend(path: str = STORAGE_PATH) -> Optional[PersistenceBackend]:
+    """SQLite backend when a storage path is configured, otherwise None (memory only)"""
+    if not path:
+        return None
+    return SQLiteBackend(path)
@@ -0,0 +1,239 @@
+import argparse
+import os
+import time
+from typing import Any, BinaryIO, Dict, Iterator, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from config import PRICE_STORE_PATH
+from price_series import PriceStore
+from storage import normalize
+
+DEFAULT_CHUNK_ROWS = 100_000
+# Agmarknet reports modal prices in Rs/quintal
+DEFAULT_UNIT = "per quintal"
+MAX_INVALID_EXAMPLES = 10
+
+# Header spellings seen on Agmarknet and mandi exports, after lowercasing and
+# replacing spaces with underscores
+COLUMN_ALIASES = {
+    "commodity": "commodity",
+    "commodity_name": "commodity",
+    "market": "market",
+    "market_name": "market",
+    "mandi": "market",
+    "date": "date",
+    "arrival_date": "date",
+    "price_date": "date",
+    "reported_date": "date",
+    "price": "price",
+    "modal_price": "price",
+    "modal_x0020_price": "price",
+    "modal_price_(rs./quintal)": "price",
+    "unit": "unit",
+}
+REQUIRED_COLUMNS = ("commodity", "market", "date", "price")
+
+# Tried in order on the rows the previous formats could not parse
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d-%b-%Y", "%Y-%m-%d %H:%M:%S")
+
+
+def canonical_column(name: str) -> str:
+    return COLUMN_ALIASES.get(name.strip().lower().replace(" ", "_"), "")
+
+
+def is_gzip(file: BinaryIO) -> bool:
+    """Sniff the gzip magic bytes without consuming the stream"""
+    position = file.tell()
+    magic = file.read(2)
+    file.seek(position)
+    return magic == b"\x1f\x8b"
+
+
+def read_chunks(source: Union[str, BinaryIO], chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Stream a CSV (optionally gzip-compressed) as DataFrames of canonical string columns"""
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            compression = "gzip" if is_gzip(f) else None
+    else:
+        compression = "gzip" if is_gzip(source) else None
+
+    reader = pd.read_csv(
+        source,
+        chunksize=chunk_rows,
+        dtype=str,
+        keep_default_na=False,
+        compression=compression,
+        encoding="utf-8-sig",
+        usecols=lambda name: canonical_column(name) != "",
+    )
+    for chunk in reader:
+        chunk.columns = [canonical_column(name) for name in chunk.columns]
+        missing = [column for column in REQUIRED_COLUMNS if column not in chunk.columns]
+        if missing:
+            raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+        yield chunk
+
+
+def parse_dates(values: pd.Series) -> pd.Series:
+    """Vectorized date parsing, one pass per known format over the still-unparsed rows"""
+    parsed = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+    values = values.str.strip()
+    remaining = values != ""
+    for date_format in DATE_FORMATS:
+        if not remaining.any():
+            break
+        attempt = pd.to_datetime(values[remaining], format=date_format, errors="coerce")
+        parsed[attempt.index] = attempt
+        remaining &= parsed.isna()
+    return parsed
+
+
+def encode_names(values: pd.Series) -> Tuple[np.ndarray, List[str]]:
+    """Per-row codes of the normalized names and the first display spelling of each.
+
+    String work runs once per distinct value, not per row; codes are -1 for blanks.
+    """
+    codes, uniques = pd.factorize(values)
+    keys, names = pd.factorize(np.array([normalize(value) for value in uniques], dtype=object))
+    display = [""] * len(names)
+    for unique, key in zip(uniques, keys):
+        if not display[key]:
+            display[key] = unique.strip()
+    key_codes = keys[codes]
+    key_codes[np.asarray(names, dtype=object)[key_codes] == ""] = -1
+    return key_codes, display
+
+
+def validate_chunk(chunk: pd.DataFrame) -> Dict[str, Any]:
+    """Typed columns for the valid rows of a raw chunk, plus the row numbers that failed"""
+    commodity, commodity_names = encode_names(chunk["commodity"])
+    market, market_names = encode_names(chunk["market"])
+
+    # Dumps repeat a handful of dates, so parse each distinct string once
+    date_codes, date_values = pd.factorize(chunk["date"])
+    dates = parse_dates(pd.Series(date_values, dtype=object)).to_numpy(dtype="datetime64[D]")[date_codes]
+
+    prices = pd.to_numeric(chunk["price"], errors="coerce").to_numpy(dtype=np.float64, copy=True)
+    retry = np.isnan(prices)
+    if retry.any():
+        # Thousands separators ("2,850") are rare, so only failed rows are cleaned
+        cleaned = chunk["price"][retry].str.replace(",", "", regex=False)
+        prices[retry] = pd.to_numeric(cleaned, errors="coerce").to_numpy(dtype=np.float64)
+
+    if "unit" in chunk.columns:
+        unit_codes, unit_values = pd.factorize(chunk["unit"].str.strip())
+        units = np.asarray(unit_values, dtype=object)[unit_codes]
+    else:
+        units = np.full(len(chunk), "", dtype=object)
+
+    valid = (commodity >= 0) & (market >= 0) & ~np.isnat(dates) & np.isfinite(prices) & (prices > 0)
+    return {
+        "commodity": commodity[valid],
+        "market": market[valid],
+        "date": dates[valid],
+        "price": prices[valid].astype(np.float32),
+        "unit": units[valid],
+        "commodity_names": commodity_names,
+        "market_names": market_names,
+        "invalid_rows": chunk.index[~valid].tolist(),
+    }
+
+
+def load_chunk(columns: Dict[str, Any], store: PriceStore, default_unit: str = DEFAULT_UNIT) -> int:
+    """Deduplicate on (commodity, market, date), keeping the last row, and append each series in one call"""
+    commodity, market, dates = columns["commodity"], columns["market"], columns["date"]
+    if not len(dates):
+        return 0
+
+    # Sort by series then date; the row position breaks ties so the last duplicate sorts last
+    order = np.lexsort((np.arange(len(dates)), dates, market, commodity))
+    commodity, market, dates = commodity[order], market[order], dates[order]
+    series_ends = np.append((commodity[1:] != commodity[:-1]) | (market[1:] != market[:-1]), True)
+    keep = series_ends | np.append(dates[1:] != dates[:-1], True)
+    order = order[keep]
+    commodity, market, dates = commodity[keep], market[keep], dates[keep]
+    prices = columns["price"][order]
+    units = columns["unit"][order]
+    times = dates.astype("datetime64[s]")
+
+    starts = np.flatnonzero(np.append(True, (commodity[1:] != commodity[:-1]) | (market[1:] != market[:-1])))
+    ends = np.append(starts[1:], len(dates))
+    commodity_names, market_names = columns["commodity_names"], columns["market_names"]
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        series = store.series_for(commodity_names[commodity[start]], market_names[market[start]], units[start])
+        if not series.unit:
+            series.unit = default_unit
+        # Rows are sorted and unique per series, so extend skips append's checks
+        series.extend(times[start:end], prices[start:end])
+    return len(dates)
+
+
+def ingest(
+    source: Union[str, BinaryIO],
+    store: PriceStore,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    default_unit: str = DEFAULT_UNIT,
+) -> Dict[str, Any]:
+    """Stream a price file into the store chunk by chunk and report throughput"""
+    start = time.perf_counter()
+    rows_before = store.rows
+    series_before = len(store)
+    rows_read = 0
+    invalid_rows: List[int] = []
+    invalid_count = 0
+
+    for chunk in read_chunks(source, chunk_rows):
+        rows_read += len(chunk)
+        columns = validate_chunk(chunk)
+        invalid = columns["invalid_rows"]
+        invalid_count += len(invalid)
+        invalid_rows.extend(invalid[:MAX_INVALID_EXAMPLES - len(invalid_rows)])
+        load_chunk(columns, store, default_unit)
+
+    seconds = time.perf_counter() - start
+    rows_added = store.rows - rows_before
+    return {
+        "rows_read": rows_read,
+        "rows_invalid": invalid_count,
+        # Repeats of (commodity, market, date) within the file or already in the store
+        "rows_duplicate": rows_read - invalid_count - rows_added,
+        "rows_added": rows_added,
+        "series_added": len(store) - series_before,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows_read / seconds, 1) if seconds else None,
+        # Data row numbers (0-based, header excluded) of the first invalid rows
+        "invalid_examples": invalid_rows,
+    }
+
+
+def main():
+    """Bulk-load daily mandi price CSV / CSV.gz files into the price store file"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--store", default=PRICE_STORE_PATH, help="price store .npz (default AGRISEVA_PRICE_STORE_PATH)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--unit", default=DEFAULT_UNIT, help="unit for rows without a unit column")
+    args = parser.parse_args()
+
+    if not args.store:
+        parser.error("--store or AGRISEVA_PRICE_STORE_PATH is required")
+
+    store = PriceStore()
+    if os.path.exists(args.store):
+        store.load(args.store)
+        print(f"Loaded {store.rows} rows in {len(store)} series from {args.store}")
+
+    for path in args.files:
+        report = ingest(path, store, args.chunk_rows, args.unit)
+        print(f"{path}: {report['rows_read']} rows read, {report['rows_added']} added, "
+              f"{report['rows_duplicate']} duplicate, {report['rows_invalid']} invalid "
+              f"in {report['seconds']}s ({report['rows_per_sec']} rows/sec)")
+
+    store.save(args.store)
+    print(f"Saved {store.rows} rows in {len(store)} series to {args.store}")
+
+
+if __name__ == "__main__":
+    main()
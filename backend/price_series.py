@@ -0,0 +1,296 @@
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from storage import normalize
+
+SECONDS_PER_DAY = 86400
+# Bucket widths and origins in seconds; 1970-01-05 was a Monday, so weeks start on Mondays
+INTERVALS = {
+    "day": (SECONDS_PER_DAY, 0),
+    "week": (7 * SECONDS_PER_DAY, 4 * SECONDS_PER_DAY),
+}
+
+
+def to_datetime64(value: Any) -> np.ndarray:
+    """Timestamps (datetimes, ISO strings or datetime64) as datetime64[s]"""
+    return np.asarray(value, dtype="datetime64[s]")
+
+
+class PriceSeries:
+    """Append-only columnar price history for one (commodity, market).
+
+    Times (datetime64[s]) and prices (float32) live in two growable arrays kept
+    in time order. Appends after the last timestamp are a copy into spare
+    capacity; older rows are merged in, and a repeated timestamp keeps the
+    newest value.
+    """
+
+    def __init__(self, commodity: str, market: str, unit: str = "", capacity: int = 64):
+        self.commodity = commodity
+        self.market = market
+        self.unit = unit
+        self._times = np.empty(capacity, dtype="datetime64[s]")
+        self._prices = np.empty(capacity, dtype=np.float32)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def copy(self) -> "PriceSeries":
+        series = PriceSeries(self.commodity, self.market, self.unit, capacity=0)
+        series._times = self._times.copy()
+        series._prices = self._prices.copy()
+        series._size = self._size
+        return series
+
+    @property
+    def times(self) -> np.ndarray:
+        return self._times[:self._size]
+
+    @property
+    def prices(self) -> np.ndarray:
+        return self._prices[:self._size]
+
+    def append(self, times: Any, prices: Any):
+        times = to_datetime64(times).ravel()
+        prices = np.asarray(prices, dtype=np.float32).ravel()
+        if len(times) != len(prices):
+            raise ValueError("times and prices must have the same length")
+        if not len(times):
+            return
+
+        if len(times) == 1 or bool(np.all(times[1:] > times[:-1])):
+            self.extend(times, prices)
+            return
+
+        self._merge(times, prices)
+
+    def extend(self, times: np.ndarray, prices: np.ndarray):
+        """Add datetime64[s] / float32 rows that are already in strictly increasing time order"""
+        if self._size and times[0] <= self._times[self._size - 1]:
+            self._merge(times, prices)
+            return
+        end = self._size + len(times)
+        if end > len(self._times):
+            self._reserve(end)
+        self._times[self._size:end] = times
+        self._prices[self._size:end] = prices
+        self._size = end
+
+    def _merge(self, times: np.ndarray, prices: np.ndarray):
+        # Backfill or duplicates: stable sort so later rows win on equal timestamps
+        all_times = np.concatenate([self.times, times])
+        all_prices = np.concatenate([self.prices, prices])
+        order = np.argsort(all_times, kind="stable")
+        all_times = all_times[order]
+        all_prices = all_prices[order]
+        keep = np.append(all_times[1:] != all_times[:-1], True)
+
+        # Fill new arrays and swap them in, so readers never see a half-merged series
+        size = int(keep.sum())
+        capacity = max(size, len(self._times))
+        merged_times = np.empty(capacity, dtype="datetime64[s]")
+        merged_prices = np.empty(capacity, dtype=np.float32)
+        merged_times[:size] = all_times[keep]
+        merged_prices[:size] = all_prices[keep]
+        self._times, self._prices, self._size = merged_times, merged_prices, size
+
+    def _reserve(self, size: int):
+        if size <= len(self._times):
+            return
+        capacity = max(size, 2 * len(self._times))
+        times = np.empty(capacity, dtype="datetime64[s]")
+        prices = np.empty(capacity, dtype=np.float32)
+        times[:self._size] = self.times
+        prices[:self._size] = self.prices
+        self._times = times
+        self._prices = prices
+
+    def range(self, start: Any = None, end: Any = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Views of the rows with start <= time <= end"""
+        times = self.times
+        lo = 0 if start is None else int(np.searchsorted(times, to_datetime64(start), side="left"))
+        hi = self._size if end is None else int(np.searchsorted(times, to_datetime64(end), side="right"))
+        return times[lo:hi], self.prices[lo:hi]
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """Most recent price and its percent change from the previous row"""
+        if not self._size:
+            return None
+        price = float(self._prices[self._size - 1])
+        change = 0.0
+        if self._size > 1:
+            previous = float(self._prices[self._size - 2])
+            change = (price - previous) / previous * 100 if previous else 0.0
+        return {
+            "commodity": self.commodity,
+            "market": self.market,
+            "unit": self.unit,
+            "price": round(price, 2),
+            "change": round(change, 2),
+            "updated_at": self._times[self._size - 1].astype(datetime),
+        }
+
+    def ohlc(self, interval: str = "day", start: Any = None, end: Any = None) -> Dict[str, np.ndarray]:
+        """Open/high/low/close, mean and row count per day or week bucket"""
+        if interval not in INTERVALS:
+            raise ValueError(f"interval must be one of {', '.join(INTERVALS)}")
+        width, origin = INTERVALS[interval]
+
+        times, prices = self.range(start, end)
+        if not len(times):
+            empty = np.empty(0)
+            return {"time": times, "open": empty, "high": empty, "low": empty, "close": empty, "mean": empty, "count": empty}
+
+        buckets = (times.astype(np.int64) - origin) // width
+        starts = np.flatnonzero(np.append(True, buckets[1:] != buckets[:-1]))
+        counts = np.diff(np.append(starts, len(prices)))
+        prices = prices.astype(np.float64)
+        return {
+            "time": (buckets[starts] * width + origin).astype("datetime64[s]"),
+            "open": prices[starts],
+            "high": np.maximum.reduceat(prices, starts),
+            "low": np.minimum.reduceat(prices, starts),
+            "close": prices[starts + counts - 1],
+            "mean": np.add.reduceat(prices, starts) / counts,
+            "count": counts,
+        }
+
+    def rolling_mean(self, window: int, start: Any = None, end: Any = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Mean of each run of window consecutive rows, stamped at the run's last row"""
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        times, prices = self.range(start, end)
+        if len(prices) < window:
+            return times[:0], np.empty(0)
+        sums = np.cumsum(np.append(0.0, prices.astype(np.float64)))
+        return times[window - 1:], (sums[window:] - sums[:-window]) / window
+
+    def percent_change(self, days: float, end: Any = None) -> Optional[Dict[str, Any]]:
+        """Change from the last price at or before (end - days) to the last price at or before end"""
+        times = self.times
+        last = self._size - 1 if end is None else int(np.searchsorted(times, to_datetime64(end), side="right")) - 1
+        if last < 0:
+            return None
+        target = times[last] - np.timedelta64(int(days * SECONDS_PER_DAY), "s")
+        first = int(np.searchsorted(times, target, side="right")) - 1
+        if first < 0:
+            return None
+
+        old, new = float(self._prices[first]), float(self._prices[last])
+        return {
+            "commodity": self.commodity,
+            "market": self.market,
+            "from": times[first].astype(datetime),
+            "to": times[last].astype(datetime),
+            "from_price": round(old, 2),
+            "to_price": round(new, 2),
+            "percent_change": round((new - old) / old * 100, 2) if old else None,
+        }
+
+
+class PriceStore:
+    """Price series keyed by normalized (commodity, market), with name lookups for filtering.
+
+    Not safe to modify while other threads read it: writers build a copy() and
+    swap the new store in.
+    """
+
+    def __init__(self):
+        self._series: Dict[Tuple[str, str], PriceSeries] = {}
+        self._markets: Dict[str, Set[str]] = defaultdict(set)
+        self._commodities: Dict[str, Set[str]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def clear(self):
+        self.__init__()
+
+    @property
+    def rows(self) -> int:
+        return sum(len(series) for series in self._series.values())
+
+    def copy(self) -> "PriceStore":
+        """Independent copy of every series, to modify while this store keeps serving reads"""
+        store = PriceStore()
+        for key, series in self._series.items():
+            store._series[key] = series.copy()
+            store._markets[key[0]].add(key[1])
+            store._commodities[key[1]].add(key[0])
+        return store
+
+    def series_for(self, commodity: str, market: str, unit: str = "") -> PriceSeries:
+        """Existing series for (commodity, market), or a new empty one"""
+        key = (normalize(commodity), normalize(market))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = PriceSeries(commodity, market, unit)
+            self._markets[key[0]].add(key[1])
+            self._commodities[key[1]].add(key[0])
+        elif unit:
+            series.unit = unit
+        return series
+
+    def append(self, commodity: str, market: str, times: Any, prices: Any, unit: str = "") -> PriceSeries:
+        series = self.series_for(commodity, market, unit)
+        series.append(times, prices)
+        return series
+
+    def save(self, path: str):
+        """Write every series to one .npz as concatenated columns plus per-series lengths"""
+        series = list(self._series.values())
+        empty = np.empty(0)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                commodities=np.array([s.commodity for s in series], dtype=str),
+                markets=np.array([s.market for s in series], dtype=str),
+                units=np.array([s.unit for s in series], dtype=str),
+                lengths=np.array([len(s) for s in series], dtype=np.int64),
+                times=np.concatenate([s.times for s in series]) if series else empty.astype("datetime64[s]"),
+                prices=np.concatenate([s.prices for s in series]) if series else empty.astype(np.float32),
+            )
+        # Readers never see a half-written file
+        os.replace(tmp_path, path)
+
+    def load(self, path: str):
+        """Append every series from a file written by save()"""
+        with np.load(path) as data:
+            times = data["times"]
+            prices = data["prices"]
+            offsets = np.concatenate([[0], np.cumsum(data["lengths"])])
+            for i, (commodity, market, unit) in enumerate(zip(data["commodities"], data["markets"], data["units"])):
+                self.append(str(commodity), str(market), times[offsets[i]:offsets[i + 1]],
+                            prices[offsets[i]:offsets[i + 1]], str(unit))
+
+    def get(self, commodity: str, market: str) -> Optional[PriceSeries]:
+        return self._series.get((normalize(commodity), normalize(market)))
+
+    def for_commodity(self, commodity: str) -> List[PriceSeries]:
+        """Every market's series for one commodity (exact normalized name)"""
+        key = normalize(commodity)
+        return [self._series[(key, market)] for market in self._markets.get(key, ())]
+
+    def find(self, commodity: Optional[str] = None, market: Optional[str] = None) -> List[PriceSeries]:
+        """Series whose commodity and market names contain the given substrings"""
+        commodity_key = normalize(commodity) if commodity else ""
+        market_key = normalize(market) if market else ""
+
+        # Match against the distinct names, then expand to series
+        commodities = [c for c in self._markets if commodity_key in c]
+        if not market_key:
+            return [self._series[(c, m)] for c in commodities for m in self._markets[c]]
+        markets = {m for m in self._commodities if market_key in m}
+        return [self._series[(c, m)] for c in commodities for m in self._markets[c] & markets]
+
+    def latest(self, commodity: Optional[str] = None, market: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Newest price per matching series, most recently updated first"""
+        snapshots = [s.latest() for s in self.find(commodity, market) if len(s)]
+        snapshots.sort(key=lambda snapshot: snapshot["updated_at"], reverse=True)
+        return snapshots
@@ -0,0 +1,219 @@
+import asyncio
+import hashlib
+import json
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import RESULT_CACHE_DISK_MAX_ENTRIES, RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_PATH, RESULT_CACHE_TTL_SECONDS
+
+WRITE_BATCH_SIZE = 256
+PRUNE_EVERY_BATCHES = 20
+# Keeps the max_disk_entries rows that expire last, i.e. the most recently written
+PRUNE_RESULTS = (
+    "DELETE FROM results WHERE expires_at <= ? OR key IN "
+    "(SELECT key FROM results ORDER BY expires_at DESC LIMIT -1 OFFSET ?)"
+)
+
+
+class ResultCache:
+    """Content-addressed LRU cache with TTL eviction and optional SQLite persistence.
+
+    Entries are tagged with the model version that produced them; switching
+    versions drops every entry from the previous model.
+
+    With persistence, disk lookups run in a thread (get() is a coroutine) and
+    inserts, invalidations and pruning are queued to one writer thread that
+    commits them in batches, so the event loop never waits on SQLite. The
+    table is pruned to max_disk_entries rows as it grows.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = RESULT_CACHE_TTL_SECONDS,
+        persist_path: str = RESULT_CACHE_PATH,
+        max_disk_entries: int = RESULT_CACHE_DISK_MAX_ENTRIES,
+    ):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self.model_version = ""
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._writer: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._pending: "queue.Queue[Optional[Tuple]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self.disk_batches = 0
+        if persist_path:
+            self._writer = self._connect(persist_path)
+            self._writer.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, model_version TEXT, expires_at REAL, value TEXT)"
+            )
+            self._writer.execute("CREATE INDEX IF NOT EXISTS results_expires_at ON results (expires_at)")
+            self._writer.execute(PRUNE_RESULTS, (time.time(), self.max_disk_entries))
+            self._writer.commit()
+            # Separate connection for lookups, so they never wait behind a batch commit
+            self._db = self._connect(persist_path)
+            self._thread = threading.Thread(target=self._write_loop, name="result-cache-writer", daemon=True)
+            self._thread.start()
+
+    @staticmethod
+    def _connect(path: str) -> sqlite3.Connection:
+        connection = sqlite3.connect(path, check_same_thread=False)
+        # WAL lets several server workers share the cache file
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA busy_timeout=5000")
+        return connection
+
+    @staticmethod
+    def key(data: bytes) -> str:
+        """Content hash used as the cache key"""
+        digest = ResultCache.hasher()
+        digest.update(data)
+        return digest.hexdigest()
+
+    @staticmethod
+    def hasher():
+        """Incremental form of key() for content read in chunks; hexdigest() is the key"""
+        return hashlib.blake2b(digest_size=20)
+
+    def set_model_version(self, version: str):
+        """Invalidate every cached result that was not produced by this model version"""
+        with self._lock:
+            if version == self.model_version:
+                return
+            self.model_version = version
+            self._entries.clear()
+            if self._writer:
+                self._pending.put(("invalidate", version))
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            model_version = self.model_version
+
+        if self._db:
+            row = await asyncio.to_thread(self._read, key, model_version)
+            if row and row[0] > now:
+                value = json.loads(row[1])
+                with self._lock:
+                    if model_version == self.model_version:
+                        self._store(key, row[0], value)
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _read(self, key: str, model_version: str) -> Optional[Tuple[float, str]]:
+        with self._db_lock:
+            if self._db is None:
+                return None
+            return self._db.execute(
+                "SELECT expires_at, value FROM results WHERE key = ? AND model_version = ?",
+                (key, model_version),
+            ).fetchone()
+
+    def put(self, key: str, value: Dict[str, Any], model_version: Optional[str] = None):
+        """Cache a result; pass the model version read before inference so results
+        from a model swapped out in the meantime are dropped instead of mislabelled"""
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            if model_version is not None and model_version != self.model_version:
+                return
+            self._store(key, expires_at, value)
+            if self._writer:
+                self._pending.put(("put", key, self.model_version, expires_at, value))
+
+    def _write_loop(self):
+        while True:
+            operation = self._pending.get()
+            batch: List[Tuple] = []
+            while operation is not None:
+                batch.append(operation)
+                if len(batch) >= WRITE_BATCH_SIZE:
+                    break
+                try:
+                    operation = self._pending.get_nowait()
+                except queue.Empty:
+                    break
+            try:
+                if batch:
+                    self._commit(batch)
+            except sqlite3.Error as e:
+                # Only the disk copy is lost; the entries stay cached in memory
+                self._writer.rollback()
+                print(f"Result cache batch of {len(batch)} writes failed: {e}")
+            if operation is None:
+                return
+
+    def _commit(self, batch: List[Tuple]):
+        for operation in batch:
+            if operation[0] == "put":
+                _, key, model_version, expires_at, value = operation
+                self._writer.execute(
+                    "INSERT OR REPLACE INTO results (key, model_version, expires_at, value) VALUES (?, ?, ?, ?)",
+                    (key, model_version, expires_at, json.dumps(value)),
+                )
+            else:
+                self._writer.execute("DELETE FROM results WHERE model_version != ?", (operation[1],))
+        self.disk_batches += 1
+        if self.disk_batches % PRUNE_EVERY_BATCHES == 0:
+            self._writer.execute(PRUNE_RESULTS, (time.time(), self.max_disk_entries))
+        self._writer.commit()
+
+    def _store(self, key: str, expires_at: float, value: Dict[str, Any]):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "persistent": self._db is not None,
+            "max_disk_entries": self.max_disk_entries,
+            "pending_disk_writes": self._pending.qsize(),
+            "model_version": self.model_version,
+        }
+
+    def close(self):
+        """Write out queued entries and close the database"""
+        if self._thread is not None:
+            self._pending.put(None)
+            self._thread.join()
+            self._thread = None
+            self._writer.close()
+            self._writer = None
+        with self._db_lock:
+            if self._db:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,280 @@
+import math
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from heapq import heapify, heappop, heappush, heapreplace, merge, nlargest
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+
+def _word_pattern() -> "re.Pattern[str]":
+    r"""Letters, digits and combining marks in the Basic Multilingual Plane.
+
+    \w alone splits Indic words apart: Devanagari matras and virama are
+    category M, so the marks are added to the character class explicitly.
+    """
+    marks = "".join(
+        re.escape(chr(code)) for code in range(0x10000)
+        if unicodedata.category(chr(code)) in ("Mn", "Mc")
+    )
+    return re.compile(f"[\\w{marks}]+")
+
+
+WORD_PATTERN = _word_pattern()
+
+MIN_PREFIX_LENGTH = 2
+# A prefix expands to at most this many terms, the most frequent among the first
+# MAX_PREFIX_SCAN vocabulary terms that start with it
+MAX_PREFIX_EXPANSIONS = 16
+MAX_PREFIX_SCAN = 256
+PREFIX_WEIGHT = 0.5
+# New terms go to a small sorted list merged into the main vocabulary in batches
+VOCABULARY_MERGE_SIZE = 1024
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into case-folded NFC word tokens for Latin and Indic scripts"""
+    return WORD_PATTERN.findall(unicodedata.normalize("NFC", text).casefold().replace("_", " "))
+
+
+class _TermQuery:
+    """One vocabulary term a query token expanded to, with its query-time BM25 constants"""
+
+    __slots__ = ("term", "postings", "weight", "idf")
+
+    def __init__(self, term: str, postings: Dict[int, int], weight: float, idf: float):
+        self.term = term
+        self.postings = postings
+        self.weight = weight
+        self.idf = idf
+
+
+class InvertedIndex:
+    """Incremental inverted index with BM25 ranking and prefix matching.
+
+    Every query token must match a document, either exactly or as a prefix of
+    one of its terms; prefix-only matches score at PREFIX_WEIGHT.
+
+    Queries are evaluated document at a time from the most selective token,
+    looking the other tokens up per candidate. With a limit, the driving
+    token's postings are visited in impact order (highest term frequency
+    first) and scoring stops once no unvisited document can beat the current
+    top results, using per-term upper bounds on the BM25 contribution.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._doc_terms: Dict[int, Counter] = {}
+        self._doc_lengths: Dict[int, int] = {}
+        self._total_length = 0
+        # Sorted vocabulary plus a small sorted list of terms added since the last merge;
+        # terms whose postings emptied stay listed until the next merge
+        self._vocabulary: List[str] = []
+        self._new_terms: List[str] = []
+        self._dead_terms = 0
+        # term -> [highest frequency, shortest document length] ever seen: only
+        # loosened by removals, so they stay valid upper-bound inputs
+        self._bounds: Dict[str, List[int]] = {}
+        # term -> (doc ids, frequencies) by descending frequency, built on demand
+        self._impacts: Dict[str, Tuple[List[int], List[int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def clear(self):
+        self.__init__(self.k1, self.b)
+
+    def add(self, doc_id: int, fields: Iterable[Tuple[str, int]]):
+        """Index (text, weight) fields for a document, replacing any previous version"""
+        if doc_id in self._doc_terms:
+            self.remove(doc_id)
+
+        terms: Counter = Counter()
+        for text, weight in fields:
+            for token, count in Counter(tokenize(text or "")).items():
+                terms[token] += count * weight
+
+        length = sum(terms.values())
+        for term, frequency in terms.items():
+            new_term = term not in self._postings
+            self._postings[term][doc_id] = frequency
+            if new_term:
+                self._add_term(term)
+            self._impacts.pop(term, None)
+            bound = self._bounds.setdefault(term, [frequency, length])
+            bound[0] = max(bound[0], frequency)
+            bound[1] = min(bound[1], length)
+
+        self._doc_terms[doc_id] = terms
+        self._doc_lengths[doc_id] = length
+        self._total_length += length
+
+    def remove(self, doc_id: int):
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+
+        for term in terms:
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            self._impacts.pop(term, None)
+            if not postings:
+                del self._postings[term]
+                del self._bounds[term]
+                self._dead_terms += 1
+        self._total_length -= self._doc_lengths.pop(doc_id)
+
+    def _add_term(self, term: str):
+        if self._dead_terms and self._contains_term(term):
+            # Still listed from before its postings emptied
+            self._dead_terms -= 1
+            return
+        insort(self._new_terms, term)
+        if len(self._new_terms) >= VOCABULARY_MERGE_SIZE:
+            self._merge_vocabulary()
+
+    def _contains_term(self, term: str) -> bool:
+        for terms in (self._vocabulary, self._new_terms):
+            i = bisect_left(terms, term)
+            if i < len(terms) and terms[i] == term:
+                return True
+        return False
+
+    def _merge_vocabulary(self):
+        """Fold the new terms in and drop emptied ones: one O(V) pass per VOCABULARY_MERGE_SIZE new terms"""
+        self._vocabulary = [term for term in merge(self._vocabulary, self._new_terms) if term in self._postings]
+        self._new_terms = []
+        self._dead_terms = 0
+
+    def _expand(self, token: str) -> List[Tuple[str, float]]:
+        """Exact term plus up to MAX_PREFIX_EXPANSIONS vocabulary terms that start with the token"""
+        matches = [(token, 1.0)] if token in self._postings else []
+        if len(token) < MIN_PREFIX_LENGTH:
+            return matches
+
+        candidates = []
+        scans = [islice(terms, bisect_left(terms, token), None) for terms in (self._vocabulary, self._new_terms)]
+        for term in merge(*scans):
+            if not term.startswith(token) or len(candidates) >= MAX_PREFIX_SCAN:
+                break
+            if term != token and term in self._postings:
+                candidates.append(term)
+        candidates = nlargest(MAX_PREFIX_EXPANSIONS, candidates, key=lambda term: len(self._postings[term]))
+        return matches + [(term, PREFIX_WEIGHT) for term in candidates]
+
+    def _impact_order(self, term: str) -> Tuple[List[int], List[int]]:
+        impacts = self._impacts.get(term)
+        if impacts is None:
+            ranked = sorted(self._postings[term].items(), key=lambda item: item[1], reverse=True)
+            impacts = ([doc_id for doc_id, _ in ranked], [frequency for _, frequency in ranked])
+            self._impacts[term] = impacts
+        return impacts
+
+    def _term_score(self, term: _TermQuery, frequency: int, length: int, avg_length: float) -> float:
+        norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+        return term.weight * term.idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+    def _max_score(self, term: _TermQuery, avg_length: float) -> float:
+        max_frequency, min_length = self._bounds[term.term]
+        return self._term_score(term, max_frequency, min_length, avg_length)
+
+    def search(self, query: str, limit: Optional[int] = None,
+               accept: Optional[Callable[[int], bool]] = None) -> Dict[int, float]:
+        """BM25 scores for documents matching every query token, best first.
+
+        accept, if given, filters candidate documents before they count towards limit.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens or not self._doc_terms:
+            return {}
+
+        n_docs = len(self._doc_terms)
+        avg_length = self._total_length / n_docs
+        token_terms: List[List[_TermQuery]] = []
+        for token in tokens:
+            expansion = []
+            for term, weight in self._expand(token):
+                postings = self._postings[term]
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                expansion.append(_TermQuery(term, postings, weight, idf))
+            if not expansion:
+                return {}
+            token_terms.append(expansion)
+
+        # Drive from the most selective token; the others are looked up per candidate
+        token_terms.sort(key=lambda terms: sum(len(term.postings) for term in terms))
+        driver, others = token_terms[0], token_terms[1:]
+
+        def score(doc_id: int) -> Optional[float]:
+            if accept is not None and not accept(doc_id):
+                return None
+            length = self._doc_lengths[doc_id]
+            total = 0.0
+            for terms in token_terms:
+                # A token counts once per document, via its best-scoring term
+                best = 0.0
+                for term in terms:
+                    frequency = term.postings.get(doc_id)
+                    if frequency:
+                        best = max(best, self._term_score(term, frequency, length, avg_length))
+                if not best:
+                    return None
+                total += best
+            return total
+
+        if limit is None:
+            candidates = set().union(*(term.postings for term in driver))
+            scores = {}
+            for doc_id in candidates:
+                value = score(doc_id)
+                if value is not None:
+                    scores[doc_id] = value
+            return dict(sorted(scores.items(), key=lambda item: item[1], reverse=True))
+
+        return self._top(driver, others, score, limit, avg_length)
+
+    def _top(self, driver: List[_TermQuery], others: List[List[_TermQuery]],
+             score: Callable[[int], Optional[float]], limit: int, avg_length: float) -> Dict[int, float]:
+        """Top-limit documents, visiting the driver's postings in impact order until the bound is met"""
+        if limit <= 0:
+            return {}
+        others_bound = sum(max(self._max_score(term, avg_length) for term in terms) for terms in others)
+
+        # Frontier of (-bound, list, position): the next document of each driver term list
+        lists = []
+        frontier = []
+        for i, term in enumerate(driver):
+            doc_ids, frequencies = self._impact_order(term.term)
+            min_length = self._bounds[term.term][1]
+            lists.append((term, doc_ids, frequencies, min_length))
+            frontier.append((-self._term_score(term, frequencies[0], min_length, avg_length), i, 0))
+        heapify(frontier)
+
+        top: List[Tuple[float, int]] = []
+        seen: Set[int] = set()
+        while frontier:
+            negative_bound, i, position = heappop(frontier)
+            # Nothing left can score more than the best remaining driver impact plus the other tokens' maxima
+            if len(top) >= limit and top[0][0] >= -negative_bound + others_bound:
+                break
+            term, doc_ids, frequencies, min_length = lists[i]
+            if position + 1 < len(doc_ids):
+                bound = self._term_score(term, frequencies[position + 1], min_length, avg_length)
+                heappush(frontier, (-bound, i, position + 1))
+
+            doc_id = doc_ids[position]
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            value = score(doc_id)
+            if value is None:
+                continue
+            if len(top) < limit:
+                heappush(top, (value, doc_id))
+            elif value > top[0][0]:
+                heapreplace(top, (value, doc_id))
+
+        return {doc_id: value for value, doc_id in sorted(top, reverse=True)}
@@ -0,0 +1,182 @@
+import asyncio
+import codecs
+import csv
+import io
+import re
+import tempfile
+from typing import Any, AsyncIterator, BinaryIO, Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+# Model input order used by CropRecommendationModel
+FEATURE_COLUMNS = ['nitrogen', 'phosphorus', 'potassium', 'temperature', 'humidity', 'ph', 'rainfall']
+WEATHER_COLUMNS = ['temperature', 'humidity', 'rainfall']
+
+# Header spellings seen on soil-card exports
+COLUMN_ALIASES = {
+    'n': 'nitrogen',
+    'p': 'phosphorus',
+    'k': 'potassium',
+    'temp': 'temperature',
+    'rain': 'rainfall',
+    'soil_ph': 'ph',
+    'district': 'location',
+    'state': 'location',
+}
+
+DEFAULT_CHUNK_ROWS = 4096
+READ_SIZE = 64 * 1024
+SPOOL_MAX_BYTES = 1024 * 1024
+
+# The only characters that decide where a CSV record ends
+QUOTE_OR_NEWLINE = re.compile(r'["\n]')
+
+
+class RowError(ValueError):
+    """A problem with one row, reported to the client as is"""
+
+
+def normalize_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a CropAdvisoryRequest-shaped row and map header aliases"""
+    if not isinstance(row, dict):
+        raise RowError(f"Expected a JSON object, got {type(row).__name__}")
+    if 'soil' in row:
+        soil, weather = row.get('soil') or {}, row.get('weather') or {}
+        if not isinstance(soil, dict) or not isinstance(weather, dict):
+            raise RowError("soil and weather must be JSON objects")
+        flat = dict(soil)
+        flat.update(weather)
+        row = flat
+
+    normalized = {}
+    for key, value in row.items():
+        if key is None:
+            continue
+        name = key.strip().lower()
+        normalized[COLUMN_ALIASES.get(name, name)] = value
+    return normalized
+
+
+def locations_needing_weather(rows: List[Dict[str, Any]]) -> List[str]:
+    """Distinct locations of rows that are missing a weather column"""
+    locations = {}
+    for row in rows:
+        try:
+            row = normalize_row(row)
+        except RowError:
+            continue
+        if any(row.get(column) in (None, '') for column in WEATHER_COLUMNS):
+            locations[str(row.get('location') or '')] = None
+    return list(locations)
+
+
+def rows_to_features(
+    rows: List[Dict[str, Any]],
+    weather_lookup: Callable[[str], Dict[str, float]],
+) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """Build an (n, 7) feature matrix from soil rows.
+
+    Missing weather columns are filled from weather_lookup(location). Returns the
+    matrix, a boolean mask of rows that parsed cleanly, and a per-row error message.
+    """
+    features = np.zeros((len(rows), len(FEATURE_COLUMNS)), dtype=np.float32)
+    valid = np.ones(len(rows), dtype=bool)
+    errors = [''] * len(rows)
+
+    for i, row in enumerate(rows):
+        try:
+            row = normalize_row(row)
+            if any(row.get(column) in (None, '') for column in WEATHER_COLUMNS):
+                weather = weather_lookup(str(row.get('location') or ''))
+                for column in WEATHER_COLUMNS:
+                    if row.get(column) in (None, ''):
+                        row[column] = weather[column]
+            features[i] = [float(row[column]) for column in FEATURE_COLUMNS]
+        except RowError as e:
+            valid[i] = False
+            errors[i] = str(e)
+        except (KeyError, TypeError, ValueError) as e:
+            valid[i] = False
+            errors[i] = f"Invalid or missing value: {e}"
+
+    return features, valid, errors
+
+
+def iter_json_chunks(rows: Iterable[Dict[str, Any]], chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterable[List[Dict[str, Any]]]:
+    """Split a parsed JSON array into fixed-size row chunks"""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def spool_stream(byte_stream: AsyncIterator[bytes]) -> BinaryIO:
+    """Copy a request body into a temp file that only stays in memory while small"""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    async for data in byte_stream:
+        spool.write(data)
+    spool.seek(0)
+    return spool
+
+
+async def iter_file(file: BinaryIO) -> AsyncIterator[bytes]:
+    """Read a file object in fixed-size blocks; reads run in a thread since uploads may be on disk"""
+    while True:
+        data = await asyncio.to_thread(file.read, READ_SIZE)
+        if not data:
+            break
+        yield data
+
+
+def complete_records_end(text: str) -> int:
+    """Index just past the last newline that ends a CSV record (one outside a quoted field)"""
+    end = 0
+    in_quotes = False
+    # An escaped quote ("") toggles twice, so counting quotes is enough
+    for match in QUOTE_OR_NEWLINE.finditer(text):
+        if match.group() == '"':
+            in_quotes = not in_quotes
+        elif not in_quotes:
+            end = match.end()
+    return end
+
+
+async def iter_csv_chunks(byte_stream: AsyncIterator[bytes], chunk_rows: int = DEFAULT_CHUNK_ROWS) -> AsyncIterator[List[Dict[str, str]]]:
+    """Parse a CSV byte stream into chunks of row dicts without buffering the whole file.
+
+    Blocks are cut at record boundaries, so quoted fields may contain newlines.
+    """
+    header = None
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    pending = ''
+    chunk = []
+
+    def records(text: str):
+        nonlocal header
+        for record in csv.reader(io.StringIO(text)):
+            if not record:
+                continue
+            if header is None:
+                header = record
+                continue
+            chunk.append(dict(zip(header, record)))
+
+    async for data in byte_stream:
+        pending += decoder.decode(data)
+        end = complete_records_end(pending)
+        records(pending[:end])
+        pending = pending[end:]
+        while len(chunk) >= chunk_rows:
+            yield chunk[:chunk_rows]
+            del chunk[:chunk_rows]
+
+    pending += decoder.decode(b'', final=True)
+    if pending.strip():
+        records(pending)
+    while chunk:
+        yield chunk[:chunk_rows]
+        del chunk[:chunk_rows]
@@ -0,0 +1,496 @@
+import base64
+import copy
+import json
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from datetime import datetime
+from itertools import chain, islice, takewhile
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from persistence import PersistenceBackend
+
+# Builds a listener's derived index for a full item list; returns the function that swaps it in
+Rebuild = Callable[[List[Any]], Callable[[], None]]
+
+
+# Compares above every item id, so (key, _AFTER_ANY_ID) follows all entries with that key
+_AFTER_ANY_ID = float("inf")
+
+
+def normalize(value: str) -> str:
+    """Normalized form used as a secondary-index key"""
+    return " ".join(value.split()).lower()
+
+
+class SortedIndex:
+    """Ordered (key, id) index for range scans and ordered pages.
+
+    Entries are kept in sorted blocks of at most 2 * BLOCK_SIZE, so an insert or
+    removal shifts one block rather than the whole index. Equal keys are ordered by id.
+    """
+
+    BLOCK_SIZE = 256
+
+    def __init__(self):
+        self._blocks: List[List[Tuple[Any, int]]] = []
+        self._maxes: List[Tuple[Any, int]] = []  # last entry of each block
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def add(self, key: Any, item_id: int):
+        entry = (key, item_id)
+        if not self._blocks:
+            self._blocks.append([entry])
+            self._maxes.append(entry)
+            self._len = 1
+            return
+        b = min(bisect_left(self._maxes, entry), len(self._blocks) - 1)
+        block = self._blocks[b]
+        insort(block, entry)
+        self._maxes[b] = block[-1]
+        self._len += 1
+        if len(block) > 2 * self.BLOCK_SIZE:
+            self._blocks[b:b + 1] = [block[:self.BLOCK_SIZE], block[self.BLOCK_SIZE:]]
+            self._maxes[b:b + 1] = [block[self.BLOCK_SIZE - 1], block[-1]]
+
+    def remove(self, key: Any, item_id: int):
+        entry = (key, item_id)
+        b = bisect_left(self._maxes, entry)
+        if b == len(self._blocks):
+            return
+        block = self._blocks[b]
+        pos = bisect_left(block, entry)
+        if block[pos] != entry:
+            return
+        del block[pos]
+        self._len -= 1
+        if block:
+            self._maxes[b] = block[-1]
+        else:
+            del self._blocks[b]
+            del self._maxes[b]
+
+    def _lower_bound(self, key: Any) -> Tuple[int, int]:
+        """Block and offset of the first entry whose key is not below key"""
+        probe = (key,)
+        b = bisect_left(self._maxes, probe)
+        if b == len(self._blocks):
+            return b, 0
+        return b, bisect_left(self._blocks[b], probe)
+
+    def _rank(self, key: Any) -> int:
+        """Number of entries whose key is below key"""
+        b, pos = self._lower_bound(key)
+        return sum(len(block) for block in self._blocks[:b]) + pos
+
+    def _ascending_from(self, b: int, pos: int) -> Iterator[Tuple[Any, int]]:
+        for block in self._blocks[b:]:
+            yield from islice(block, pos, None)
+            pos = 0
+
+    def range(self, low: Any = None, high: Any = None) -> List[int]:
+        """Ids whose key lies in [low, high], in ascending key order"""
+        entries = self._ascending_from(*self._lower_bound(low)) if low is not None else self._ascending_from(0, 0)
+        if high is None:
+            return [item_id for _, item_id in entries]
+        return [item_id for _, item_id in takewhile(lambda entry: not high < entry[0], entries)]
+
+    def count(self, low: Any = None, high: Any = None) -> int:
+        """Number of ids whose key lies in [low, high], without visiting them"""
+        start = 0 if low is None else self._rank(low)
+        if high is None:
+            return self._len - start
+        # Entries with key <= high are those below the first entry past high
+        b = bisect_right(self._maxes, (high, _AFTER_ANY_ID))
+        end = sum(len(block) for block in self._blocks[:b])
+        if b < len(self._blocks):
+            end += bisect_right(self._blocks[b], (high, _AFTER_ANY_ID))
+        return max(0, end - start)
+
+    def ids(self, reverse: bool = False) -> Iterator[int]:
+        if reverse:
+            entries = chain.from_iterable(reversed(block) for block in reversed(self._blocks))
+        else:
+            entries = chain.from_iterable(self._blocks)
+        return (item_id for _, item_id in entries)
+
+    def descending(self, before: Any = None, offset: int = 0, limit: int = 10) -> List[int]:
+        """Page of ids in descending key order, starting below the before key"""
+        if before is None:
+            b, pos = len(self._blocks) - 1, len(self._blocks[-1]) if self._blocks else 0
+        else:
+            b, pos = self._lower_bound(before)
+            if pos == 0:
+                b -= 1
+                pos = len(self._blocks[b]) if b >= 0 else 0
+        # Skip whole blocks of the offset before walking entries
+        while b >= 0 and offset >= pos:
+            offset -= pos
+            b -= 1
+            pos = len(self._blocks[b]) if b >= 0 else 0
+        page: List[int] = []
+        pos -= offset
+        while b >= 0 and len(page) < limit:
+            block = self._blocks[b]
+            page.extend(item_id for _, item_id in reversed(block[max(0, pos - limit + len(page)):pos]))
+            b -= 1
+            pos = len(self._blocks[b]) if b >= 0 else 0
+        return page
+
+
+def encode_cursor(timestamp: datetime, item_id: int) -> str:
+    """Opaque cursor for the position just after (timestamp, id) in a newest-first feed"""
+    raw = json.dumps([timestamp.isoformat(), item_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor; ValueError for anything encode_cursor could not have produced"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, item_id = json.loads(raw)
+        timestamp = datetime.fromisoformat(timestamp)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    # Feed keys are naive datetimes and int ids; anything else cannot be compared with them
+    if timestamp.tzinfo is not None or type(item_id) is not int:
+        raise ValueError("Invalid cursor")
+    return timestamp, item_id
+
+
+
+class Collection:
+    """Id assignment, optional persistence and change listeners shared by the stores.
+
+    Subclasses maintain their own indexes in _index/_unindex. With a backend
+    attached, ids come from its atomic sequence and every add and remove is
+    written through. The in-memory copy is this process's read cache: request
+    handlers only ever read it, and the owner of the event loop keeps it
+    current by applying the backend's change feed. When the copy is stale (just
+    attached, or the feed reset) a replacement is built with load_snapshot() in
+    a thread and swapped in with the function it returns, on the event loop.
+    """
+
+    def __init__(self):
+        self._by_id: Dict[int, Any] = {}
+        self._next_id = 1
+        self._backend: Optional[PersistenceBackend] = None
+        self.name = ""
+        self._encode: Optional[Callable[[Any], str]] = None
+        self._decode: Optional[Callable[[str], Any]] = None
+        self.stale = False
+        # Local writes made while a snapshot loads, replayed onto it when it is installed
+        self._replay: Optional[Dict[int, Optional[Any]]] = None
+        self._listeners: List[Tuple[Callable[[Any], None], Optional[Callable[[Any], None]], Optional[Rebuild]]] = []
+        self._reset()
+
+    def _reset(self):
+        raise NotImplementedError
+
+    def _index(self, item: Any):
+        raise NotImplementedError
+
+    def _unindex(self, item: Any):
+        raise NotImplementedError
+
+    def attach(self, backend: PersistenceBackend, name: str, encode: Callable[[Any], str], decode: Callable[[str], Any]):
+        """Persist this collection under name; it is stale until the first snapshot is installed"""
+        self._backend = backend
+        self.name = name
+        self._encode = encode
+        self._decode = decode
+        self.stale = True
+        backend.watch(name, self._apply_change, self._mark_stale)
+
+    def subscribe(
+        self,
+        on_add: Callable[[Any], None],
+        on_remove: Optional[Callable[[Any], None]] = None,
+        rebuild: Optional["Rebuild"] = None,
+    ):
+        """Call on_add for every item indexed and on_remove when one leaves.
+
+        rebuild(items), if given, runs in load_snapshot's thread and builds the
+        listener's derived index from scratch; it returns a function that swaps
+        that index in, called on the event loop just before the snapshot is installed.
+        """
+        self._listeners.append((on_add, on_remove, rebuild))
+
+    def _mark_stale(self):
+        self.stale = True
+
+    def begin_reload(self):
+        """Start recording local writes; call on the event loop before load_snapshot()"""
+        self._replay = {}
+
+    def load_snapshot(self) -> Callable[[], None]:
+        """Build a fresh copy from the backend (blocking; run it in a thread).
+
+        Returns the function that installs it, to be called on the event loop.
+        """
+        fresh = copy.copy(self)
+        fresh._by_id = {}
+        fresh._next_id = 1
+        fresh._listeners = []
+        fresh._reset()
+        items = [self._decode(data) for _, data in self._backend.load(self.name)]
+        for item in items:
+            fresh._insert(item)
+        swaps = [rebuild(items) for _, _, rebuild in list(self._listeners) if rebuild]
+
+        def install():
+            for swap in swaps:
+                swap()
+            listeners, replay = self._listeners, self._replay or {}
+            self.__dict__.update(vars(fresh))
+            self._listeners = listeners
+            self._replay = None
+            self.stale = False
+            for item_id, item in replay.items():
+                self._pop(item_id)
+                if item is not None:
+                    self._insert(item)
+
+        return install
+
+    def cancel_reload(self):
+        """Stop recording local writes after load_snapshot() failed; the copy stays stale"""
+        self._replay = None
+
+    def _apply_change(self, item_id: int, data: Optional[str]):
+        """Mirror a record another process wrote (data) or deleted (None)"""
+        self._pop(item_id)
+        if data is not None:
+            self._insert(self._decode(data))
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def is_empty(self) -> bool:
+        return not self._by_id
+
+    def _insert(self, item: Any):
+        self._by_id[item.id] = item
+        self._next_id = max(self._next_id, item.id + 1)
+        self._index(item)
+        for on_add, _, _ in self._listeners:
+            on_add(item)
+
+    def _pop(self, item_id: int) -> Optional[Any]:
+        item = self._by_id.pop(item_id, None)
+        if item is not None:
+            self._unindex(item)
+            for _, on_remove, _ in self._listeners:
+                if on_remove:
+                    on_remove(item)
+        return item
+
+    def allocate_id(self) -> int:
+        """Next free id; with a backend this is a SQLite transaction, so call it off the event loop"""
+        return self._backend.next_id(self.name) if self._backend else self._next_id
+
+    def add(self, item: Any) -> Any:
+        """Insert an item, assigning the next id if it has none"""
+        if item.id is None:
+            item.id = self._backend.next_id(self.name) if self._backend else self._next_id
+        self._pop(item.id)
+        self._insert(item)
+        if self._replay is not None:
+            self._replay[item.id] = item
+        if self._backend:
+            self._backend.put(self.name, item.id, self._encode(item))
+        return item
+
+    def remove(self, item_id: int) -> Optional[Any]:
+        item = self._pop(item_id)
+        if self._replay is not None:
+            self._replay[item_id] = None
+        if item is not None and self._backend:
+            self._backend.delete(self.name, item_id)
+        return item
+
+    def get(self, item_id: int) -> Optional[Any]:
+        return self._by_id.get(item_id)
+
+
+class MarketplaceStore(Collection):
+    """Marketplace listings with a primary-key map and secondary indexes.
+
+    Category and location are indexed by normalized value; price and created_at
+    are kept in sorted indexes. Filtered queries touch only the matching ids.
+    """
+
+    SORTS = ("newest", "oldest", "price_asc", "price_desc")
+
+    def _reset(self):
+        self._by_category: Dict[str, Set[int]] = defaultdict(set)
+        self._by_location: Dict[str, Set[int]] = defaultdict(set)
+        self._by_price = SortedIndex()
+        self._by_created = SortedIndex()
+
+    def _index(self, product: Any):
+        self._by_category[normalize(product.category)].add(product.id)
+        self._by_location[normalize(product.location)].add(product.id)
+        self._by_price.add(product.price, product.id)
+        if product.created_at is not None:
+            self._by_created.add(product.created_at, product.id)
+
+    def _unindex(self, product: Any):
+        self._discard(self._by_category, normalize(product.category), product.id)
+        self._discard(self._by_location, normalize(product.location), product.id)
+        self._by_price.remove(product.price, product.id)
+        if product.created_at is not None:
+            self._by_created.remove(product.created_at, product.id)
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[int]], key: str, product_id: int):
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(product_id)
+            if not ids:
+                del index[key]
+
+    def _location_ids(self, location: str) -> Set[int]:
+        """Exact normalized match, else substring match over the distinct location keys"""
+        key = normalize(location)
+        if key in self._by_location:
+            return self._by_location[key]
+        matches: Set[int] = set()
+        for name, ids in self._by_location.items():
+            if key in name:
+                matches |= ids
+        return matches
+
+    @staticmethod
+    def _in_price_range(price: float, min_price: Optional[float], max_price: Optional[float]) -> bool:
+        return (min_price is None or price >= min_price) and (max_price is None or price <= max_price)
+
+    def _sort_key(self, sort: Optional[str]):
+        if sort in ("price_asc", "price_desc"):
+            return lambda product_id: self._by_id[product_id].price
+        if sort in ("newest", "oldest"):
+            return lambda product_id: self._by_id[product_id].created_at
+        return None
+
+    def query(
+        self,
+        category: Optional[str] = None,
+        location: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        candidate_ids: Optional[Set[int]] = None,
+        sort: Optional[str] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Tuple[List[Any], int]:
+        """Filtered, ordered page of products plus the total match count"""
+        if sort is not None and sort not in self.SORTS:
+            raise ValueError(f"sort must be one of {', '.join(self.SORTS)}")
+        reverse = sort in ("newest", "price_desc")
+
+        filters: List[Set[int]] = []
+        if category:
+            filters.append(self._by_category.get(normalize(category), set()))
+        if location:
+            filters.append(self._location_ids(location))
+        if candidate_ids is not None:
+            filters.append(candidate_ids)
+
+        price_bounded = min_price is not None or max_price is not None
+        filters.sort(key=len)
+        if price_bounded and (not filters or self._by_price.count(min_price, max_price) <= len(filters[0])):
+            # The price range is the most selective index and is already ordered by price
+            ordered = [i for i in self._by_price.range(min_price, max_price) if all(i in f for f in filters)]
+            if sort in ("newest", "oldest"):
+                ordered.sort(key=self._sort_key(sort), reverse=reverse)
+            elif reverse:
+                ordered.reverse()
+        elif filters:
+            # Intersect from the smallest set, checking prices only on what survives
+            matched = filters[0].intersection(*filters[1:])
+            if price_bounded:
+                matched = {
+                    i for i in matched
+                    if i in self._by_id and self._in_price_range(self._by_id[i].price, min_price, max_price)
+                }
+            # Price-bounded results default to price order whichever index produced them
+            key = self._sort_key(sort or ("price_asc" if price_bounded else None))
+            ordered = sorted(matched, key=key, reverse=reverse) if key else sorted(matched)
+        else:
+            # No filters: walk the matching index and stop after the page
+            if sort in ("price_asc", "price_desc"):
+                ids = self._by_price.ids(reverse)
+            elif sort in ("newest", "oldest"):
+                ids = self._by_created.ids(reverse)
+            else:
+                ids = iter(self._by_id)
+            end = None if limit is None else offset + limit
+            return [self._by_id[i] for i in islice(ids, offset, end)], len(self._by_id)
+
+        end = None if limit is None else offset + limit
+        return [self._by_id[i] for i in ordered[offset:end]], len(ordered)
+
+
+class FeedStore(Collection):
+    """Newest-first feed (forum posts, news) with a recency index per category.
+
+    Items are keyed by (timestamp, id) so pages can resume from a cursor in
+    O(log n + limit) instead of sorting and slicing the whole feed.
+    """
+
+    def __init__(self, timestamp_field: str):
+        self.timestamp_field = timestamp_field
+        super().__init__()
+
+    def _reset(self):
+        self._recent = SortedIndex()
+        self._by_category: Dict[str, SortedIndex] = defaultdict(SortedIndex)
+
+    def _key(self, item: Any) -> Tuple[datetime, int]:
+        return (getattr(item, self.timestamp_field) or datetime.min, item.id)
+
+    def _index(self, item: Any):
+        key = self._key(item)
+        self._recent.add(key, item.id)
+        self._by_category[normalize(item.category)].add(key, item.id)
+
+    def _unindex(self, item: Any):
+        key = self._key(item)
+        self._recent.remove(key, item.id)
+        category = normalize(item.category)
+        self._by_category[category].remove(key, item.id)
+        if not self._by_category[category]:
+            del self._by_category[category]
+
+    def _category_index(self, category: Optional[str]) -> SortedIndex:
+        if not category:
+            return self._recent
+        return self._by_category.get(normalize(category), SortedIndex())
+
+    def count(self, category: Optional[str] = None) -> int:
+        return len(self._category_index(category))
+
+    def page(
+        self,
+        category: Optional[str] = None,
+        cursor: Optional[str] = None,
+        offset: int = 0,
+        limit: int = 10,
+    ) -> Tuple[List[Any], Optional[str]]:
+        """Newest-first page and the cursor for the next one (None on the last page)"""
+        before = decode_cursor(cursor) if cursor else None
+        # One extra id tells us whether another page exists
+        ids = self._category_index(category).descending(before, offset, limit + 1)
+        items = [self._by_id[i] for i in ids[:limit]]
+        next_cursor = encode_cursor(*self._key(items[-1])) if items and len(ids) > limit else None
+        return items, next_cursor
+
+    def filter(self, item_ids: Iterator[int], category: Optional[str] = None) -> List[Any]:
+        """Items for the given ids, restricted to a category"""
+        items = (self._by_id[i] for i in item_ids if i in self._by_id)
+        if not category:
+            return list(items)
+        key = normalize(category)
+        return [item for item in items if normalize(item.category) == key]
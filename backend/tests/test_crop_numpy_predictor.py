@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from model_serving import import_ml_module
+
+crop_numpy_predictor = import_ml_module("crop_numpy_predictor")
+
+
+def test_top_k_predictions_orders_best_first():
+    probabilities = np.array([
+        [0.1, 0.6, 0.05, 0.25],
+        [0.4, 0.1, 0.3, 0.2],
+    ])
+    crops, confidences = crop_numpy_predictor.top_k_predictions(probabilities, ["a", "b", "c", "d"], top_k=3)
+    assert crops.tolist() == [["b", "d", "a"], ["a", "c", "d"]]
+    np.testing.assert_allclose(confidences, [[60, 25, 10], [40, 30, 20]])
+
+
+def test_numpy_export_matches_keras(tmp_path):
+    pytest.importorskip("tensorflow")
+    model_module = import_ml_module("crop_recommendation_model")
+
+    model = model_module.CropRecommendationModel()
+    data = model.generate_synthetic_data(2200)
+    features = data[model.feature_columns].to_numpy(dtype=np.float32)
+    labels = model.label_encoder.fit_transform(data["label"])
+    scaled = model.scaler.fit_transform(features)
+    model.model = model.create_model(len(model.feature_columns), len(model.label_encoder.classes_))
+    model.model.fit(scaled, labels, epochs=2, batch_size=256, verbose=0)
+
+    model.export_numpy(str(tmp_path))
+    max_diff, top3_match = model.verify_numpy_export(str(tmp_path), n_samples=500)
+    assert max_diff <= 1e-5
+    assert top3_match == 1.0
+
+    predictor = crop_numpy_predictor.NumpyCropPredictor.load(str(tmp_path))
+    reference = model.model.predict(model.scaler.transform(features[:50]), verbose=0)
+    np.testing.assert_allclose(predictor.predict_proba(features[:50]), reference, atol=1e-5)
+
+    soil = {"nitrogen": 80, "phosphorus": 60, "potassium": 40, "temperature": 25,
+            "humidity": 80, "ph": 6.5, "rainfall": 200}
+    recommendations = predictor.predict(soil)
+    assert [r["rank"] for r in recommendations] == [1, 2, 3]
+    assert all(r["crop"] in model.label_encoder.classes_ for r in recommendations)
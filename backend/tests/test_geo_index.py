@@ -0,0 +1,63 @@
+import random
+
+import numpy as np
+import pytest
+
+from geo_index import GridIndex, haversine_km
+
+
+def brute_force(points, lat, lon, radius_km):
+    keys = list(points)
+    coordinates = np.array([points[key] for key in keys])
+    distances = haversine_km(lat, lon, coordinates[:, 0], coordinates[:, 1])
+    return sorted((distance, key) for key, distance in zip(keys, distances) if distance <= radius_km)
+
+
+def test_haversine_known_distance():
+    # Delhi to Mumbai is about 1150 km
+    distance = haversine_km(28.6139, 77.2090, np.array([19.0760]), np.array([72.8777]))[0]
+    assert distance == pytest.approx(1150, abs=10)
+
+
+@pytest.mark.parametrize("center", [(18.5, 73.8), (0.0, 179.9), (89.5, 10.0), (-33.9, -180.0)])
+def test_within_matches_brute_force(center):
+    rng = random.Random(11)
+    index = GridIndex()
+    points = {}
+    for key in range(3000):
+        lat = max(-90.0, min(90.0, center[0] + rng.uniform(-3, 3)))
+        lon = (center[1] + rng.uniform(-3, 3) + 180) % 360 - 180
+        points[key] = (lat, lon)
+        index.add(key, lat, lon)
+
+    for radius_km in (5, 50, 200):
+        found = index.within(center[0], center[1], radius_km)
+        expected = brute_force(points, center[0], center[1], radius_km)
+        assert [key for key, _ in found] and len(found) == len(expected)
+        assert [distance for _, distance in found] == pytest.approx([distance for distance, _ in expected])
+        assert {key for key, _ in found} == {key for _, key in expected}
+
+
+def test_within_limit_and_invalid_queries():
+    index = GridIndex()
+    for key, lon in enumerate((77.0, 77.1, 77.2, 77.3)):
+        index.add(key, 28.0, lon)
+    assert [key for key, _ in index.within(28.0, 77.0, 50, limit=2)] == [0, 1]
+    with pytest.raises(ValueError):
+        index.within(28.0, 77.0, 0)
+    with pytest.raises(ValueError):
+        index.within(91.0, 77.0, 10)
+
+
+def test_move_remove_and_nearest():
+    index = GridIndex()
+    index.add("pune", 18.52, 73.86)
+    index.add("nashik", 20.0, 73.79)
+    index.add("pune", 19.08, 72.88)  # moved to Mumbai
+    assert len(index) == 2
+    assert index.within(18.52, 73.86, 20) == []
+    assert [key for key, _ in index.nearest(18.52, 73.86, k=2)] == ["pune", "nashik"]
+
+    index.remove("pune")
+    assert "pune" not in index
+    assert [key for key, _ in index.nearest(18.52, 73.86)] == ["nashik"]
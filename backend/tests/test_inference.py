@@ -0,0 +1,67 @@
+import asyncio
+import threading
+
+import pytest
+
+from inference import InferenceExecutor, InferenceQueueFull, MicroBatcher
+
+
+def run_batched(predict_batch, items, **kwargs):
+    async def scenario():
+        executor = InferenceExecutor(max_workers=1, max_queue=8)
+        batcher = MicroBatcher(predict_batch, executor, **kwargs)
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit(item) for item in items), return_exceptions=True), batcher
+        finally:
+            await batcher.stop()
+            executor.shutdown()
+
+    return asyncio.run(scenario())
+
+
+def test_concurrent_requests_share_batches_and_get_their_own_results():
+    batches = []
+
+    def predict_batch(items):
+        batches.append(list(items))
+        return [item * 10 for item in items]
+
+    results, batcher = run_batched(predict_batch, range(20), max_batch_size=8, max_wait_ms=20)
+    assert results == [item * 10 for item in range(20)]
+    assert sorted(item for batch in batches for item in batch) == list(range(20))
+    assert max(len(batch) for batch in batches) == 8
+    assert len(batches) <= 4
+    assert batcher.stats()["batch_size"]["count"] == len(batches)
+
+
+def test_a_failed_batch_fails_each_of_its_requests():
+    def predict_batch(items):
+        raise RuntimeError("model crashed")
+
+    results, _ = run_batched(predict_batch, range(3), max_batch_size=4, max_wait_ms=20)
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_executor_counts_outcomes_and_rejects_when_full():
+    async def scenario():
+        executor = InferenceExecutor(max_workers=1, max_queue=1)
+        release = threading.Event()
+        try:
+            assert await executor.run(lambda x: x + 1, 1) == 2
+            with pytest.raises(ZeroDivisionError):
+                await executor.run(lambda: 1 / 0)
+
+            blocked = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(2)]
+            await asyncio.sleep(0.05)
+            with pytest.raises(InferenceQueueFull):
+                await executor.run(lambda: None)
+            release.set()
+            await asyncio.gather(*blocked)
+            return executor.stats()
+        finally:
+            release.set()
+            executor.shutdown()
+
+    stats = asyncio.run(scenario())
+    assert (stats["completed"], stats["failed"], stats["rejected"]) == (3, 1, 1)
@@ -0,0 +1,126 @@
+import json
+
+import pytest
+
+import persistence
+from persistence import PersistenceError, SQLiteBackend
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "agriseva.db")
+
+
+@pytest.fixture
+def open_backend(db_path):
+    backends = []
+
+    def open_one(**kwargs):
+        backend = SQLiteBackend(db_path, pool_size=2, flush_ms=1, **kwargs)
+        backends.append(backend)
+        return backend
+
+    yield open_one
+    for backend in backends:
+        backend.close()
+
+
+def record(item_id, **fields):
+    return json.dumps({"id": item_id, **fields})
+
+
+def test_writes_survive_restart(db_path):
+    backend = SQLiteBackend(db_path)
+    for item_id in range(1, 101):
+        backend.put("products", item_id, record(item_id, name=f"Product {item_id}"))
+    backend.delete("products", 50)
+    backend.close()
+
+    reopened = SQLiteBackend(db_path)
+    try:
+        rows = list(reopened.load("products"))
+        assert [item_id for item_id, _ in rows] == [i for i in range(1, 101) if i != 50]
+        assert json.loads(reopened.get("products", 7))["name"] == "Product 7"
+        assert reopened.get("products", 50) is None
+        assert reopened.count("products") == 99
+        # The sequence was persisted too, so new ids continue after the stored ones
+        assert reopened.next_id("products") == 101
+    finally:
+        reopened.close()
+
+
+def test_next_id_skips_explicitly_numbered_records(open_backend):
+    backend = open_backend()
+    backend.put("posts", 1, record(1))
+    backend.put("posts", 2, record(2))
+    # No flush: the sequence must already cover the seed rows
+    assert backend.next_id("posts") == 3
+    assert backend.next_id("posts") == 4
+
+
+def test_next_id_is_shared_between_processes(open_backend):
+    first, second = open_backend(), open_backend()
+    ids = [first.next_id("news"), second.next_id("news"), first.next_id("news")]
+    assert ids == [1, 2, 3]
+
+
+def test_change_log_delivers_other_writers_changes(open_backend):
+    writer, reader = open_backend(), open_backend()
+    seen = []
+    reader.watch("products", lambda item_id, data: seen.append((item_id, data)), lambda: seen.append("reset"))
+    writer.watch("products", lambda item_id, data: pytest.fail("saw its own write"), lambda: None)
+
+    writer.put("products", 1, record(1, name="Rice"))
+    writer.put("products", 2, record(2, name="Wheat"))
+    writer.delete("products", 1)
+    writer.put("other", 1, record(1))
+    writer.flush()
+
+    reader.poll()
+    writer.poll()
+    assert seen == [(1, None), (2, record(2, name="Wheat")), (1, None)]
+    assert reader.stats()["changes_applied"] == 3
+
+    # Nothing new: data_version is unchanged and nothing is delivered
+    reader.poll()
+    assert len(seen) == 3
+
+
+def test_pruned_change_log_resets_watchers(open_backend, monkeypatch):
+    monkeypatch.setattr(persistence, "CHANGE_LOG_ROWS", 5)
+    monkeypatch.setattr(persistence, "PRUNE_EVERY_BATCHES", 1)
+    writer, reader = open_backend(batch_size=1), open_backend()
+    events = []
+    reader.watch("products", lambda item_id, data: events.append(item_id), lambda: events.append("reset"))
+
+    for item_id in range(1, 31):
+        writer.put("products", item_id, record(item_id))
+    writer.flush()
+
+    reader.poll()
+    assert events == ["reset"]
+    assert reader.stats()["reloads"] == 1
+
+    # After the reset the reader follows the log again from its current end
+    writer.put("products", 31, record(31))
+    writer.flush()
+    reader.poll()
+    assert events == ["reset", 31]
+
+
+def test_failed_writes_are_reported_by_flush(open_backend):
+    backend = open_backend(write_attempts=2)
+    backend.put("products", 1, record(1))
+    # data is NOT NULL, so this write can never commit
+    backend.put("products", 2, None)
+    backend.put("products", 3, record(3))
+
+    with pytest.raises(PersistenceError, match="products 2"):
+        backend.flush()
+    # Reported once; the rest of the batch was still committed
+    backend.flush()
+    assert [item_id for item_id, _ in backend.load("products")] == [1, 3]
+    stats = backend.stats()
+    assert stats["failed_writes"] == 1
+    assert stats["retries"] >= 1
+    assert "products 2" in stats["last_error"]
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from price_series import PriceSeries, PriceStore
+
+
+def days(*values):
+    return np.array([f"2026-03-{day:02d}T{hour:02d}:00" for day, hour in values], dtype="datetime64[s]")
+
+
+def test_out_of_order_appends_merge_and_newest_value_wins():
+    series = PriceSeries("Rice", "Delhi", capacity=2)
+    series.append(days((3, 0), (4, 0)), [30, 40])
+    series.append(days((1, 0), (3, 0)), [10, 31])
+    series.append(days((5, 0)), [50])
+    assert series.times.tolist() == days((1, 0), (3, 0), (4, 0), (5, 0)).tolist()
+    assert series.prices.tolist() == [10, 31, 40, 50]
+    with pytest.raises(ValueError):
+        series.append(days((6, 0)), [1, 2])
+
+
+def test_range_latest_and_percent_change():
+    series = PriceSeries("Onion", "Nashik", "quintal")
+    series.append(days((1, 9), (2, 9), (3, 9), (8, 9)), [100, 110, 120, 150])
+
+    times, prices = series.range("2026-03-02", "2026-03-03T09:00")
+    assert prices.tolist() == [110, 120]
+
+    latest = series.latest()
+    assert (latest["price"], latest["change"]) == (150.0, 25.0)
+
+    change = series.percent_change(5)
+    assert (change["from_price"], change["to_price"], change["percent_change"]) == (120.0, 150.0, 25.0)
+    assert series.percent_change(1, end="2026-03-01T08:00") is None
+
+
+def test_ohlc_buckets_by_day_and_monday_weeks():
+    series = PriceSeries("Wheat", "Indore")
+    # 2026-03-01 is a Sunday, so the weekly buckets start on 02-23 and 03-02
+    series.append(days((1, 6), (1, 12), (1, 18), (2, 6), (3, 6)), [10, 14, 12, 20, 22])
+
+    day = series.ohlc("day")
+    assert day["time"].astype(str).tolist() == ["2026-03-01T00:00:00", "2026-03-02T00:00:00", "2026-03-03T00:00:00"]
+    assert (day["open"][0], day["high"][0], day["low"][0], day["close"][0]) == (10, 14, 10, 12)
+    assert day["count"].tolist() == [3, 1, 1]
+
+    week = series.ohlc("week")
+    assert week["time"].astype(str).tolist() == ["2026-02-23T00:00:00", "2026-03-02T00:00:00"]
+    assert week["mean"].tolist() == pytest.approx([12, 21])
+    with pytest.raises(ValueError):
+        series.ohlc("month")
+
+
+def test_rolling_mean():
+    series = PriceSeries("Tomato", "Pune")
+    series.append(days((1, 0), (2, 0), (3, 0), (4, 0)), [1, 2, 3, 6])
+    times, means = series.rolling_mean(2)
+    assert times.tolist() == days((2, 0), (3, 0), (4, 0)).tolist()
+    assert means.tolist() == pytest.approx([1.5, 2.5, 4.5])
+    assert len(series.rolling_mean(5)[1]) == 0
+
+
+def test_store_lookup_copy_and_save_round_trip(tmp_path):
+    store = PriceStore()
+    store.append("Rice", "Delhi", days((1, 0), (2, 0)), [30, 31], unit="quintal")
+    store.append("Rice", "Azadpur Delhi", days((1, 0)), [29])
+    store.append("Wheat", "Delhi", days((3, 0)), [25])
+
+    assert store.get(" rice ", "DELHI").unit == "quintal"
+    assert len(store.for_commodity("rice")) == 2
+    assert {s.market for s in store.find(market="delhi")} == {"Delhi", "Azadpur Delhi"}
+    assert [row["commodity"] for row in store.latest(market="Delhi")][0] == "Wheat"
+
+    copy = store.copy()
+    copy.append("Rice", "Delhi", days((5, 0)), [40])
+    assert len(store.get("Rice", "Delhi")) == 2
+
+    path = str(tmp_path / "prices.npz")
+    store.save(path)
+    loaded = PriceStore()
+    loaded.load(path)
+    assert (len(loaded), loaded.rows) == (3, 4)
+    assert loaded.get("Rice", "Delhi").prices.tolist() == [30, 31]
+    assert loaded.get("Rice", "Delhi").unit == "quintal"
@@ -0,0 +1,91 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import result_cache
+from result_cache import ResultCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(result_cache, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def get(cache, key):
+    return asyncio.run(cache.get(key))
+
+
+def test_key_is_a_content_hash():
+    assert ResultCache.key(b"leaf") == ResultCache.key(b"leaf") != ResultCache.key(b"leaf2")
+    digest = ResultCache.hasher()
+    digest.update(b"le")
+    digest.update(b"af")
+    assert digest.hexdigest() == ResultCache.key(b"leaf")
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = ResultCache(ttl_seconds=60, persist_path="")
+    cache.put("a", {"disease": "Leaf Blight"})
+    clock[0] += 59
+    assert get(cache, "a") == {"disease": "Leaf Blight"}
+    clock[0] += 2
+    assert get(cache, "a") is None
+    assert (cache.hits, cache.misses, cache.stats()["entries"]) == (1, 1, 0)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(max_entries=2, persist_path="")
+    cache.put("a", {"n": 1})
+    cache.put("b", {"n": 2})
+    assert get(cache, "a") == {"n": 1}
+    cache.put("c", {"n": 3})
+    assert get(cache, "b") is None
+    assert get(cache, "a") == {"n": 1} and get(cache, "c") == {"n": 3}
+    assert cache.evictions == 1
+
+
+def test_model_version_change_invalidates_entries():
+    cache = ResultCache(persist_path="")
+    cache.set_model_version("v1")
+    cache.put("a", {"disease": "Healthy"})
+    cache.set_model_version("v1")
+    assert get(cache, "a") is not None
+
+    cache.set_model_version("v2")
+    assert get(cache, "a") is None
+    # Inference that started under v1 finished after the swap: its result is dropped
+    cache.put("b", {"disease": "Rust"}, model_version="v1")
+    assert get(cache, "b") is None
+    cache.put("b", {"disease": "Rust"}, model_version="v2")
+    assert get(cache, "b") == {"disease": "Rust"}
+
+
+def reopen(cache, path):
+    cache.close()
+    reopened = ResultCache(persist_path=path)
+    reopened.set_model_version(cache.model_version)
+    return reopened
+
+
+def test_persisted_entries_respect_ttl_and_version(tmp_path, clock):
+    path = str(tmp_path / "results.db")
+    cache = ResultCache(ttl_seconds=60, persist_path=path)
+    cache.set_model_version("v1")
+    cache.put("a", {"disease": "Healthy"})
+    cache.put("b", {"disease": "Rust"})
+
+    cache = reopen(cache, path)
+    assert get(cache, "a") == {"disease": "Healthy"}
+
+    clock[0] += 61
+    cache = reopen(cache, path)
+    assert get(cache, "b") is None
+
+    clock[0] -= 61
+    cache.set_model_version("v2")
+    cache = reopen(cache, path)
+    assert get(cache, "b") is None
+    cache.close()
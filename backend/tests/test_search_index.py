@@ -0,0 +1,114 @@
+import random
+
+import pytest
+
+import search_index
+from search_index import InvertedIndex, tokenize
+
+
+def build(docs):
+    index = InvertedIndex()
+    for doc_id, (title, body) in docs.items():
+        index.add(doc_id, [(title, 2), (body, 1)])
+    return index
+
+
+def test_tokenize_folds_case_and_keeps_indic_words():
+    assert tokenize("Fresh TOMATOES, organic_rice") == ["fresh", "tomatoes", "organic", "rice"]
+    assert tokenize("टमाटर बीज") == ["टमाटर", "बीज"]
+
+
+def test_rarer_terms_and_higher_frequency_rank_first():
+    index = build({
+        1: ("Rice", "rice rice rice for sale"),
+        2: ("Rice", "rice for sale"),
+        3: ("Wheat", "wheat and rice for sale"),
+        4: ("Millet", "millet for sale"),
+    })
+    assert list(index.search("rice")) == [1, 2, 3]
+    # "millet" is rarer than "sale", so it carries the two-token query
+    scores = index.search("millet sale")
+    assert list(scores) == [4]
+    assert scores[4] > index.search("sale")[4]
+
+
+def test_title_weight_and_length_normalization():
+    index = build({
+        1: ("Basmati", "long grain"),
+        2: ("Grain", "basmati"),
+        3: ("Grain", "basmati " + "filler " * 50),
+    })
+    assert list(index.search("basmati")) == [1, 2, 3]
+
+
+def test_every_token_must_match():
+    index = build({1: ("Tomato seeds", ""), 2: ("Tomato plants", ""), 3: ("Chilli seeds", "")})
+    assert set(index.search("tomato seeds")) == {1}
+    assert index.search("tomato mango") == {}
+    assert index.search("") == {}
+
+
+def test_prefix_matches_score_below_exact_matches():
+    index = build({1: ("Tom", "variety"), 2: ("Tomato", "variety")})
+    scores = index.search("tom")
+    assert list(scores) == [1, 2]
+    assert index.search("to") and index.search("t") == {}
+
+
+def test_prefix_expansion_keeps_the_most_frequent_terms(monkeypatch):
+    monkeypatch.setattr(search_index, "MAX_PREFIX_EXPANSIONS", 2)
+    index = InvertedIndex()
+    doc_id = 0
+    for term, count in (("seeda", 1), ("seedb", 5), ("seedc", 3), ("seedd", 1)):
+        for _ in range(count):
+            doc_id += 1
+            index.add(doc_id, [(term, 1)])
+    matched = {next(iter(index._doc_terms[d])) for d in index.search("see")}
+    assert matched == {"seedb", "seedc"}
+
+
+def test_remove_and_replace_update_results():
+    index = build({1: ("Onion", "red"), 2: ("Onion", "white")})
+    index.remove(1)
+    assert list(index.search("onion")) == [2]
+    index.add(2, [("Garlic", 1)])
+    assert index.search("onion") == {} and list(index.search("garlic")) == [2]
+    assert index.search("oni") == {}
+    index.add(3, [("Onion", 1)])
+    assert list(index.search("oni")) == [3]
+
+
+def test_vocabulary_merges_in_batches(monkeypatch):
+    monkeypatch.setattr(search_index, "VOCABULARY_MERGE_SIZE", 8)
+    monkeypatch.setattr(search_index, "MAX_PREFIX_EXPANSIONS", 64)
+    index = InvertedIndex()
+    for doc_id in range(50):
+        index.add(doc_id, [(f"crop{doc_id:03d}", 1)])
+    for doc_id in range(0, 50, 2):
+        index.remove(doc_id)
+    assert len(index._new_terms) < 8
+    assert set(index.search("crop")) == set(range(1, 50, 2))
+    assert list(index.search("crop007")) == [7]
+
+
+@pytest.mark.parametrize("limit", [1, 3, 10])
+def test_limited_search_matches_the_exhaustive_top_results(limit):
+    rng = random.Random(7)
+    words = ["".join(rng.choice("abcdef") for _ in range(rng.randint(2, 5))) for _ in range(300)]
+    index = InvertedIndex()
+    for doc_id in range(2000):
+        title = " ".join(rng.choices(words, k=rng.randint(1, 4)))
+        body = " ".join(rng.choices(words, k=rng.randint(2, 20)))
+        index.add(doc_id, [(title, 2), (body, 1)])
+    for doc_id in rng.sample(range(2000), 300):
+        index.remove(doc_id)
+
+    for query in ["ab", "abc d", "fe", "ca db"] + rng.sample(words, 10):
+        full = index.search(query)
+        top = index.search(query, limit=limit)
+        assert list(top.values()) == pytest.approx(list(full.values())[:limit])
+        assert all(full[doc_id] == pytest.approx(score) for doc_id, score in top.items())
+
+        even = index.search(query, limit=limit, accept=lambda doc_id: doc_id % 2 == 0)
+        expected = [score for doc_id, score in full.items() if doc_id % 2 == 0][:limit]
+        assert list(even.values()) == pytest.approx(expected)
@@ -0,0 +1,161 @@
+import base64
+import json
+from datetime import datetime, timedelta
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel
+
+from persistence import SQLiteBackend
+from storage import FeedStore, MarketplaceStore, SortedIndex, decode_cursor, encode_cursor
+
+
+class Product(BaseModel):
+    id: Optional[int] = None
+    title: str = "Tomatoes"
+    category: str = "Vegetables"
+    location: str = "Pune"
+    price: float = 10.0
+    created_at: Optional[datetime] = None
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "agriseva.db"), pool_size=2, flush_ms=1)
+    yield backend
+    backend.close()
+
+
+def attached_store(backend):
+    store = MarketplaceStore()
+    store.attach(backend, "marketplace", Product.model_dump_json, Product.model_validate_json)
+    return store
+
+
+def test_snapshot_loads_persisted_records_and_rebuilds_listeners(backend):
+    for item_id in (1, 2, 3):
+        backend.put("marketplace", item_id, Product(id=item_id, price=item_id).model_dump_json())
+    store = attached_store(backend)
+    titles = {}
+    store.subscribe(lambda p: titles.__setitem__(p.id, p.title), lambda p: titles.pop(p.id),
+                    lambda items: lambda: titles.update({p.id: p.title for p in items}))
+    assert store.stale and store.is_empty()
+
+    store.begin_reload()
+    install = store.load_snapshot()
+    # Nothing changes for readers until the snapshot is installed
+    assert store.is_empty() and not titles
+    install()
+
+    assert not store.stale
+    assert [p.id for p in store.query(sort="price_desc")[0]] == [3, 2, 1]
+    assert titles == {1: "Tomatoes", 2: "Tomatoes", 3: "Tomatoes"}
+
+
+def test_writes_during_a_reload_survive_the_swap(backend):
+    backend.put("marketplace", 1, Product(id=1).model_dump_json())
+    store = attached_store(backend)
+    store.begin_reload()
+    install = store.load_snapshot()
+
+    store.add(Product(id=7, title="Onions"))
+    store.remove(1)
+    install()
+
+    assert store.get(7).title == "Onions"
+    assert store.get(1) is None
+    assert len(store) == 1
+
+
+def test_reset_marks_the_store_stale_and_keeps_serving_the_old_copy(backend):
+    store = attached_store(backend)
+    store.begin_reload()
+    store.load_snapshot()()
+    store.add(Product(id=1))
+
+    backend.apply_changes(True, [])
+    assert store.stale
+    assert store.get(1) is not None
+
+
+def test_sorted_index_ranges_and_pages_across_blocks(monkeypatch):
+    monkeypatch.setattr(SortedIndex, "BLOCK_SIZE", 2)
+    index = SortedIndex()
+    entries = [(key % 7, key) for key in range(40)]
+    for key, item_id in reversed(entries):
+        index.add(key, item_id)
+    for key, item_id in entries[::3]:
+        index.remove(key, item_id)
+    index.remove(99, 99)
+    live = sorted(entry for i, entry in enumerate(entries) if i % 3)
+
+    assert len(index) == len(live)
+    assert list(index.ids()) == [item_id for _, item_id in live]
+    assert index.range(2, 4) == [item_id for key, item_id in live if 2 <= key <= 4]
+    assert index.count(2, 4) == len(index.range(2, 4))
+    assert index.count(5, 1) == 0
+    newest_first = [item_id for key, item_id in reversed(live) if key < 5]
+    assert index.descending(5, offset=3, limit=4) == newest_first[3:7]
+
+
+def test_price_bounded_query_intersects_from_the_most_selective_index(monkeypatch):
+    store = MarketplaceStore()
+    for item_id in range(1, 101):
+        store.add(Product(id=item_id, category="Grains" if item_id <= 3 else "Vegetables", price=100 - item_id))
+
+    walked = []
+    monkeypatch.setattr(store._by_price, "range", lambda *args: walked.append(args) or [])
+    products, total = store.query(category="grains", min_price=0, max_price=98)
+    # Three grains beat a 97-product price range, so the range is never walked
+    assert not walked
+    assert [p.id for p in products] == [3, 2] and total == 2
+    assert [p.id for p in store.query(category="grains", min_price=0, sort="price_desc")[0]] == [1, 2, 3]
+
+
+def test_feed_store_pages_with_cursors():
+    store = FeedStore("created_at")
+    now = datetime(2025, 1, 1)
+    for item_id in range(1, 6):
+        store.add(Product(id=item_id, category="News", created_at=now + timedelta(hours=item_id)))
+
+    page, cursor = store.page(limit=2)
+    assert [p.id for p in page] == [5, 4]
+    page, cursor = store.page(cursor=cursor, limit=2)
+    assert [p.id for p in page] == [3, 2]
+    page, cursor = store.page(cursor=cursor, limit=2)
+    assert [p.id for p in page] == [1]
+    assert cursor is None
+
+
+def cursor_for(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    timestamp = datetime(2025, 3, 1, 12, 30, 15, 250)
+    assert decode_cursor(encode_cursor(timestamp, 42)) == (timestamp, 42)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    cursor_for("just a string"),
+    cursor_for(["2025-03-01T12:00:00"]),
+    cursor_for(["yesterday", 1]),
+    cursor_for(["2025-03-01T12:00:00+05:30", 1]),
+    cursor_for(["2025-03-01T12:00:00", "1"]),
+    cursor_for(["2025-03-01T12:00:00", 1.5]),
+    cursor_for(["2025-03-01T12:00:00", True]),
+])
+def test_invalid_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+
+def test_forum_endpoint_rejects_timezone_aware_cursor():
+    from fastapi.testclient import TestClient
+
+    import main
+
+    client = TestClient(main.app)
+    response = client.get("/api/forum/posts", params={"cursor": cursor_for(["2025-03-01T12:00:00+00:00", 1])})
+    assert response.status_code == 400
@@ -0,0 +1,92 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import weather
+from weather import HttpWeatherProvider, WeatherCache, WeatherProvider, create_fake_upstream
+
+
+class FlakyProvider(WeatherProvider):
+    """Returns 1, 2, 3... as the temperature, or raises while failing is set"""
+
+    def __init__(self, delay_seconds: float = 0.05):
+        self.delay_seconds = delay_seconds
+        self.calls = 0
+        self.failing = False
+
+    async def fetch(self, location):
+        self.calls += 1
+        await asyncio.sleep(self.delay_seconds)
+        if self.failing:
+            raise httpx.ConnectError("upstream down")
+        return {"temperature": float(self.calls), "humidity": 60.0, "rainfall": 0.0}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(weather, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_concurrent_misses_share_one_upstream_call():
+    async def scenario():
+        upstream = create_fake_upstream(delay_seconds=0.05)
+        provider = HttpWeatherProvider("http://weather", transport=httpx.ASGITransport(app=upstream))
+        cache = WeatherCache(provider)
+        try:
+            results = await asyncio.gather(*(cache.get(location) for location in ["Pune", " pune ", "PUNE"] * 10))
+            other = await cache.get("Nashik")
+        finally:
+            await cache.aclose()
+        return upstream, cache, results, other
+
+    upstream, cache, results, other = asyncio.run(scenario())
+    assert upstream.state.calls == 2
+    assert all(result == results[0] for result in results) and other != results[0]
+    assert cache.stats()["coalesced"] == 29 and cache.misses == 31
+
+
+def test_stale_entries_are_served_while_one_refresh_runs(clock):
+    async def scenario():
+        provider = FlakyProvider()
+        cache = WeatherCache(provider, ttl_seconds=60, stale_seconds=120)
+        first = await cache.get("Pune")
+        clock[0] += 30
+        fresh = await cache.get("Pune")
+
+        clock[0] += 60
+        stale = await asyncio.gather(*(cache.get("Pune") for _ in range(5)))
+        await asyncio.sleep(0.1)
+        refreshed = await cache.get("Pune")
+
+        clock[0] += 500
+        expired = await cache.get("Pune")
+        return provider, first, fresh, stale, refreshed, expired
+
+    provider, first, fresh, stale, refreshed, expired = asyncio.run(scenario())
+    assert first["temperature"] == fresh["temperature"] == 1.0
+    assert all(value["temperature"] == 1.0 for value in stale)
+    assert refreshed["temperature"] == 2.0
+    assert expired["temperature"] == 3.0
+    assert provider.calls == 3
+
+
+def test_upstream_failure_falls_back_to_the_last_value(clock):
+    async def scenario():
+        provider = FlakyProvider()
+        cache = WeatherCache(provider, ttl_seconds=60, stale_seconds=0)
+        known = await cache.get("Pune")
+        provider.failing = True
+        clock[0] += 61
+        fallback = await cache.get("Pune")
+        with pytest.raises(httpx.ConnectError):
+            await cache.get("Nashik")
+        return cache, known, fallback
+
+    cache, known, fallback = asyncio.run(scenario())
+    assert fallback == known
+    assert cache.upstream_errors == 2
+    assert cache.stats()["in_flight"] == 0
@@ -0,0 +1,202 @@
+import asyncio
+import random
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from config import (
+    WEATHER_API_URL,
+    WEATHER_CACHE_MAX_ENTRIES,
+    WEATHER_MAX_CONNECTIONS,
+    WEATHER_STALE_SECONDS,
+    WEATHER_TIMEOUT_SECONDS,
+    WEATHER_TTL_SECONDS,
+)
+from storage import normalize
+
+WEATHER_FIELDS = ("temperature", "humidity", "rainfall")
+
+
+class WeatherProvider:
+    """Source of current conditions for a location: temperature, humidity and rainfall"""
+
+    async def fetch(self, location: str) -> Dict[str, float]:
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+
+class MockWeatherProvider(WeatherProvider):
+    """Random plausible conditions, used when no weather API is configured"""
+
+    async def fetch(self, location: str) -> Dict[str, float]:
+        return {
+            "temperature": 25 + random.uniform(-5, 10),
+            "humidity": 60 + random.uniform(-20, 30),
+            "rainfall": random.uniform(0, 100),
+        }
+
+
+class HttpWeatherProvider(WeatherProvider):
+    """GET {base_url}/weather?location=... through one pooled keep-alive client"""
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout_seconds: float = WEATHER_TIMEOUT_SECONDS,
+        max_connections: int = WEATHER_MAX_CONNECTIONS,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout_seconds,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport,
+        )
+
+    async def fetch(self, location: str) -> Dict[str, float]:
+        response = await self.client.get("/weather", params={"location": location})
+        response.raise_for_status()
+        data = response.json()
+        return {field: float(data[field]) for field in WEATHER_FIELDS}
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class WeatherCache:
+    """Per-location TTL cache with request coalescing and stale-while-revalidate.
+
+    Fresh entries are served directly. Entries up to stale_seconds past their
+    TTL are served immediately while one background fetch refreshes them.
+    Concurrent misses for a location share a single upstream call, and an
+    upstream failure falls back to the last known value when there is one.
+    """
+
+    def __init__(
+        self,
+        provider: WeatherProvider,
+        ttl_seconds: float = WEATHER_TTL_SECONDS,
+        stale_seconds: float = WEATHER_STALE_SECONDS,
+        max_entries: int = WEATHER_CACHE_MAX_ENTRIES,
+    ):
+        self.provider = provider
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, float]]]" = OrderedDict()
+        self._inflight: Dict[str, "asyncio.Task[Dict[str, float]]"] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+
+    async def get(self, location: str) -> Dict[str, float]:
+        key = normalize(location)
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if age < self.ttl_seconds + self.stale_seconds:
+                self.stale_hits += 1
+                self._refresh(key, location)
+                return entry[1]
+
+        self.misses += 1
+        # Shielded so one waiter's cancellation does not cancel the shared fetch
+        return await asyncio.shield(self._refresh(key, location))
+
+    def _refresh(self, key: str, location: str) -> "asyncio.Task[Dict[str, float]]":
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+
+        task = asyncio.ensure_future(self._fetch(key, location))
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done))
+        return task
+
+    def _finish(self, key: str, task: "asyncio.Task[Dict[str, float]]"):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark background failures as retrieved; waiters still see the exception
+        if not task.cancelled():
+            task.exception()
+
+    async def _fetch(self, key: str, location: str) -> Dict[str, float]:
+        self.upstream_calls += 1
+        try:
+            value = await self.provider.fetch(location)
+        except Exception:
+            self.upstream_errors += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry[1]
+            raise
+
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "in_flight": len(self._inflight),
+            "ttl_seconds": self.ttl_seconds,
+            "stale_seconds": self.stale_seconds,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "upstream_calls": self.upstream_calls,
+            "upstream_errors": self.upstream_errors,
+        }
+
+    async def aclose(self):
+        for task in list(self._inflight.values()):
+            task.cancel()
+        await self.provider.aclose()
+
+
+def create_weather_cache(api_url: str = WEATHER_API_URL) -> WeatherCache:
+    """HTTP provider when AGRISEVA_WEATHER_API_URL is set, otherwise the mock"""
+    provider = HttpWeatherProvider(api_url) if api_url else MockWeatherProvider()
+    return WeatherCache(provider)
+
+
+def create_fake_upstream(delay_seconds: float = 0.2):
+    """Stand-in weather API for tests and local runs.
+
+    Serve it with `uvicorn --factory weather:create_fake_upstream`, or call it
+    in-process through httpx.ASGITransport(app=create_fake_upstream()).
+    app.state.calls counts the requests it has answered.
+    """
+    from fastapi import FastAPI
+
+    app = FastAPI(title="Fake weather upstream")
+    app.state.calls = 0
+
+    @app.get("/weather")
+    async def weather(location: str):
+        app.state.calls += 1
+        await asyncio.sleep(delay_seconds)
+        rng = random.Random(f"{normalize(location)}:{app.state.calls}")
+        return {
+            "location": location,
+            "temperature": round(25 + rng.uniform(-5, 10), 1),
+            "humidity": round(60 + rng.uniform(-20, 30), 1),
+            "rainfall": round(rng.uniform(0, 100), 1),
+        }
+
+    return app
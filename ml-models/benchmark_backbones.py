@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+from benchmark_disease_models import artifact_size_mb
+from disease_detection_model import BACKBONE_BENCHMARK_PATH, BACKBONES, DiseaseDetectionModel, PlantDiseaseClassifier
+
+
+def latency_percentiles(run, repeats):
+    run()
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return float(np.percentile(latencies, 50)), float(np.percentile(latencies, 99))
+
+
+def benchmark_backbone(backbone, repeats, threads):
+    """Single-image CPU latency in PyTorch and through the ONNX export, plus size and accuracy"""
+    import onnxruntime as ort
+
+    model = DiseaseDetectionModel(backbone)
+    model.device = torch.device('cpu')
+    model.model = PlantDiseaseClassifier(num_classes=len(model.classes), pretrained=False, backbone=backbone).eval()
+    image = torch.randn(1, 3, 224, 224)
+
+    with torch.inference_mode():
+        torch_p50, torch_p99 = latency_percentiles(lambda: model.model(image), repeats)
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        # Both export paths must work for every backbone
+        model.export_torchscript(model_dir)
+        onnx_path = model.export_onnx(model_dir)
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        session = ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        feed = {session.get_inputs()[0].name: image.numpy()}
+        onnx_p50, onnx_p99 = latency_percentiles(lambda: session.run(None, feed), repeats)
+        onnx_mb = artifact_size_mb(onnx_path)
+
+    meta = BACKBONES[backbone]['weights'].meta
+    return {
+        # The backend serves the ONNX export, so its latency is the one budgets are checked against
+        'p50_ms': round(onnx_p50, 2),
+        'p99_ms': round(onnx_p99, 2),
+        'torch_p50_ms': round(torch_p50, 2),
+        'torch_p99_ms': round(torch_p99, 2),
+        'gflops': meta['_ops'],
+        'params_millions': round(sum(p.numel() for p in model.model.parameters()) / 1e6, 2),
+        'onnx_mb': round(onnx_mb, 1),
+        'accuracy': meta['_metrics']['ImageNet-1K']['acc@1']
+    }
+
+
+def run_benchmark(backbones=tuple(BACKBONES), repeats=100, threads=0, output_path=BACKBONE_BENCHMARK_PATH,
+                  accuracy_overrides=None):
+    """Benchmark every backbone and write the table select_backbone reads"""
+    if threads:
+        torch.set_num_threads(threads)
+
+    results = {}
+    for backbone in backbones:
+        print(f"Benchmarking {backbone}...")
+        results[backbone] = benchmark_backbone(backbone, repeats, threads)
+    for backbone, accuracy in (accuracy_overrides or {}).items():
+        results[backbone]['accuracy'] = accuracy
+
+    print(f"\n{'backbone':<22}{'GFLOPs':>8}{'params M':>10}{'p50 ms':>9}{'p99 ms':>9}{'torch p99':>11}{'accuracy':>10}")
+    for backbone, result in results.items():
+        print(f"{backbone:<22}{result['gflops']:>8.2f}{result['params_millions']:>10.1f}{result['p50_ms']:>9.2f}"
+              f"{result['p99_ms']:>9.2f}{result['torch_p99_ms']:>11.2f}{result['accuracy']:>10.2f}")
+
+    report = {
+        'machine': {
+            'processor': platform.processor() or platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'threads': threads or torch.get_num_threads(),
+            'torch': torch.__version__
+        },
+        'latency': 'single 224x224 image, CPU, onnxruntime fp32 (p50_ms/p99_ms) and eager PyTorch (torch_*)',
+        'accuracy_source': ('ImageNet-1K top-1 of the pretrained weights unless overridden with '
+                            'validation accuracy on leaf images'),
+        'backbones': results
+    }
+    if output_path:
+        with open(output_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBenchmark results saved to {output_path}")
+    return report
+
+
+def main():
+    """Benchmark classifier backbones for select_backbone (latency, size, accuracy)"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--backbones', nargs='+', choices=list(BACKBONES), default=list(BACKBONES))
+    parser.add_argument('--repeats', type=int, default=100)
+    parser.add_argument('--threads', type=int, default=0, help='intra-op threads (0 = all cores)')
+    parser.add_argument('--accuracy', nargs='*', default=[], metavar='BACKBONE=ACC',
+                        help='leaf validation accuracy to rank by instead of ImageNet top-1')
+    parser.add_argument('--output', default=BACKBONE_BENCHMARK_PATH)
+    args = parser.parse_args()
+
+    overrides = {}
+    for item in args.accuracy:
+        backbone, accuracy = item.split('=')
+        overrides[backbone] = float(accuracy)
+
+    run_benchmark(args.backbones, args.repeats, args.threads, args.output, overrides)
+
+
+if __name__ == "__main__":
+    main()
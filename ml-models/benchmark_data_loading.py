@@ -0,0 +1,117 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from disease_detection_model import DiseaseDetectionModel, PlantDiseaseDataset, render_synthetic_leaf
+
+
+def render_leaf_per_pixel(img_size=224):
+    """The original renderer, painting spots pixel by pixel; kept as the speed baseline"""
+    pixels = np.zeros((img_size, img_size, 3), dtype=np.uint8)
+    pixels[:] = (34, 139, 34)
+
+    if random.random() > 0.3:
+        for _ in range(random.randint(1, 5)):
+            center_x = random.randint(20, img_size - 20)
+            center_y = random.randint(20, img_size - 20)
+            radius = random.randint(5, 15)
+            for i in range(max(0, center_y - radius), min(img_size, center_y + radius)):
+                for j in range(max(0, center_x - radius), min(img_size, center_x + radius)):
+                    if (i - center_y)**2 + (j - center_x)**2 <= radius**2:
+                        pixels[i, j] = [101, 67, 33] if random.random() > 0.5 else [139, 69, 19]
+
+    if random.random() > 0.6:
+        for _ in range(random.randint(1, 3)):
+            start_x = random.randint(0, img_size - 30)
+            start_y = random.randint(0, img_size - 30)
+            end_x = min(img_size, start_x + random.randint(10, 30))
+            end_y = min(img_size, start_y + random.randint(10, 30))
+            pixels[start_y:end_y, start_x:end_x] = [255, 255, 0]
+
+    noise = np.random.normal(0, 10, pixels.shape).astype(np.int8)
+    return np.clip(pixels.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+def images_per_sec(render, num_images):
+    start = time.perf_counter()
+    for _ in range(num_images):
+        render()
+    return num_images / (time.perf_counter() - start)
+
+
+def loader_images_per_sec(model, dataset, batch_size, num_workers, epochs):
+    """Steady-state throughput of full passes over a DataLoader; the first pass warms workers and page cache"""
+    loader = model.create_data_loader(dataset, batch_size, shuffle=True, num_workers=num_workers)
+    for _ in loader:
+        pass
+
+    start = time.perf_counter()
+    for _ in range(epochs):
+        for _ in loader:
+            pass
+    return epochs * len(dataset) / (time.perf_counter() - start)
+
+
+def run_benchmark(num_images=1000, batch_size=32, workers=(0, 2, 4), epochs=2, cache_dir=None, output_path=None):
+    """Render and DataLoader throughput: per-pixel vs mask-based rendering, on the fly vs pre-rendered shards"""
+    model = DiseaseDetectionModel()
+    rng = np.random.default_rng(0)
+
+    render_count = min(num_images, 200)
+    results = {
+        'render_per_pixel': images_per_sec(render_leaf_per_pixel, render_count),
+        'render_masked': images_per_sec(lambda: render_synthetic_leaf(rng), render_count),
+        'loader': {}
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.perf_counter()
+        shard_train, _ = model.create_synthetic_dataset(cache_dir=cache_dir or tmp_dir, num_images=num_images)
+        results['prerender_seconds'] = time.perf_counter() - start
+
+        on_the_fly = PlantDiseaseDataset([], [], transform=model.get_transforms(train=True), num_samples=num_images)
+        for num_workers in workers:
+            results['loader'][num_workers] = {
+                'on_the_fly': loader_images_per_sec(model, on_the_fly, batch_size, num_workers, epochs),
+                'shards': loader_images_per_sec(model, shard_train, batch_size, num_workers, epochs)
+            }
+
+    print(f"\nRendering: per-pixel {results['render_per_pixel']:.1f} images/sec, "
+          f"mask-based {results['render_masked']:.1f} images/sec "
+          f"({results['render_masked'] / results['render_per_pixel']:.1f}x)")
+    print(f"Pre-rendering {num_images} images per split took {results['prerender_seconds']:.1f}s")
+    print(f"\n{'workers':<9}{'on the fly':>12}{'shards':>12}{'speedup':>9}   (training transforms, images/sec)")
+    for num_workers, result in results['loader'].items():
+        print(f"{num_workers:<9}{result['on_the_fly']:>12.1f}{result['shards']:>12.1f}"
+              f"{result['shards'] / result['on_the_fly']:>8.1f}x")
+
+    if output_path:
+        with open(output_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBenchmark results saved to {output_path}")
+
+    return results
+
+
+def main():
+    """Benchmark synthetic leaf rendering and disease dataset loading throughput"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--num-images', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2, min(4, os.cpu_count() or 1)])
+    parser.add_argument('--epochs', type=int, default=2)
+    parser.add_argument('--cache-dir', default=None, help='reuse shards here instead of a temporary directory')
+    parser.add_argument('--output', default=None, help='optional JSON report path')
+    args = parser.parse_args()
+
+    run_benchmark(args.num_images, args.batch_size, sorted(set(args.workers)), args.epochs,
+                  args.cache_dir, args.output)
+
+
+if __name__ == "__main__":
+    main()
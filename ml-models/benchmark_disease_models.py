@@ -0,0 +1,154 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+
+from disease_detection_model import DiseaseDetectionModel, PlantDiseaseDataset
+
+# Benchmark exactly the variants AGRISEVA_DISEASE_MODEL_VARIANT can select in the backend
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from model_serving import DISEASE_ONNX_VARIANTS as VARIANTS
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB (Linux /proc), or None elsewhere"""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        return None
+
+
+def artifact_size_mb(path):
+    """Size of an ONNX file plus its external weight file, if any"""
+    size = os.path.getsize(path)
+    if os.path.exists(path + '.data'):
+        size += os.path.getsize(path + '.data')
+    return size / (1024 * 1024)
+
+
+def make_eval_images(num_images):
+    """Preprocessed synthetic leaf images as one (n, 3, 224, 224) float32 array"""
+    transform = DiseaseDetectionModel().get_transforms(train=False)
+    dataset = PlantDiseaseDataset([], [], transform=transform, synthetic=True)
+    return torch.stack([dataset[i][0] for i in range(num_images)]).numpy()
+
+
+def benchmark_variant(path, images, batch_sizes, repeats, intra_op_threads):
+    """Latency, throughput, memory and predictions for one ONNX artifact"""
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = intra_op_threads
+
+    rss_before = current_rss_mb()
+    session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+    input_name = session.get_inputs()[0].name
+
+    # Top-1 predictions over the evaluation set
+    predictions = np.concatenate([
+        session.run(None, {input_name: images[i:i + 32]})[0].argmax(axis=1)
+        for i in range(0, len(images), 32)
+    ])
+
+    # Single-image latency distribution
+    session.run(None, {input_name: images[:1]})
+    latencies = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        session.run(None, {input_name: images[i % len(images):i % len(images) + 1]})
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    throughput = {}
+    for batch_size in batch_sizes:
+        batch = np.resize(images, (batch_size,) + images.shape[1:])
+        session.run(None, {input_name: batch})
+        runs = max(1, repeats // batch_size)
+        start = time.perf_counter()
+        for _ in range(runs):
+            session.run(None, {input_name: batch})
+        throughput[batch_size] = runs * batch_size / (time.perf_counter() - start)
+
+    # Weights plus activation arenas after the largest batch
+    rss_after = current_rss_mb()
+
+    return {
+        'predictions': predictions,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'throughput_images_per_sec': {str(k): round(v, 2) for k, v in throughput.items()},
+        'artifact_mb': round(artifact_size_mb(path), 2),
+        'session_rss_mb': round(rss_after - rss_before, 2) if rss_before is not None else None
+    }
+
+
+def run_isolated(path, images, batch_sizes, repeats, intra_op_threads):
+    """Benchmark in a forked child so each variant's memory is measured from a clean process"""
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return benchmark_variant(path, images, batch_sizes, repeats, intra_op_threads)
+
+    with multiprocessing.get_context('fork').Pool(1) as pool:
+        return pool.apply(benchmark_variant, (path, images, batch_sizes, repeats, intra_op_threads))
+
+
+def run_benchmark(model_dir='saved_models', num_images=256, batch_sizes=(1, 8, 32), repeats=100,
+                  intra_op_threads=0, output_path=None):
+    """Compare fp32 and INT8 disease model artifacts and print a report"""
+    images = make_eval_images(num_images)
+
+    results = {}
+    for variant, filename in VARIANTS.items():
+        path = os.path.join(model_dir, filename)
+        if not os.path.exists(path):
+            print(f"Skipping {variant}: {path} not found")
+            continue
+        print(f"Benchmarking {variant}...")
+        results[variant] = run_isolated(path, images, batch_sizes, repeats, intra_op_threads)
+
+    if 'fp32' in results:
+        reference = results['fp32']['predictions']
+        for result in results.values():
+            result['top1_agreement'] = float(np.mean(result['predictions'] == reference) * 100)
+
+    print(f"\n{'variant':<14}{'agree %':>9}{'p50 ms':>9}{'p99 ms':>9}{'MB':>9}{'RSS MB':>9}  images/sec by batch")
+    for variant, result in results.items():
+        result.pop('predictions')
+        agreement = result.get('top1_agreement')
+        rss = result['session_rss_mb']
+        print(f"{variant:<14}"
+              f"{agreement if agreement is not None else float('nan'):>9.2f}"
+              f"{result['p50_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+              f"{result['artifact_mb']:>9.1f}{rss if rss is not None else float('nan'):>9.1f}  "
+              f"{result['throughput_images_per_sec']}")
+
+    if output_path:
+        with open(output_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBenchmark results saved to {output_path}")
+
+    return results
+
+
+def main():
+    """Benchmark fp32 vs INT8 disease detection ONNX models"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--model-dir', default='saved_models')
+    parser.add_argument('--num-images', type=int, default=256)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--repeats', type=int, default=100)
+    parser.add_argument('--threads', type=int, default=0, help='intra-op threads (0 = all cores)')
+    parser.add_argument('--output', default=None, help='optional JSON report path')
+    args = parser.parse_args()
+
+    run_benchmark(args.model_dir, args.num_images, args.batch_sizes, args.repeats,
+                  args.threads, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import json
+import tempfile
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+
+from disease_detection_model import BACKBONES, DiseaseDetectionModel, PlantDiseaseClassifier
+
+# (precision, channels_last, compile_model)
+CONFIGS = {
+    'fp32': ('fp32', False, False),
+    'bf16': ('bf16', False, False),
+    'bf16_channels_last': ('bf16', True, False),
+    'bf16_channels_last_compiled': ('bf16', True, True)
+}
+
+
+def benchmark_config(model, dataset, batch_size, epochs, precision, channels_last, compile_model):
+    """Steady-state training images/sec for one configuration, after a warm-up epoch"""
+    torch.manual_seed(0)
+    model.model = PlantDiseaseClassifier(num_classes=len(model.classes), pretrained=False,
+                                         backbone=model.backbone).to(model.device)
+    if channels_last:
+        model.model.to(memory_format=torch.channels_last)
+    net = torch.compile(model.model) if compile_model else model.model
+
+    loader = model.create_data_loader(dataset, batch_size, shuffle=True)
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(model.model.parameters(), lr=0.001)
+
+    # Warm-up: oneDNN primitive caches, compilation
+    model.train_epoch(net, loader, criterion, optimizer, precision, channels_last)
+    rates = [model.train_epoch(net, loader, criterion, optimizer, precision, channels_last)[2]
+             for _ in range(epochs)]
+    return sum(rates) / len(rates)
+
+
+def run_benchmark(configs=tuple(CONFIGS), num_images=128, batch_size=32, epochs=2, output_path=None,
+                  backbone='resnet50'):
+    """Compare disease model training throughput across precision, memory format and compilation"""
+    model = DiseaseDetectionModel(backbone)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        dataset, _ = model.create_synthetic_dataset(cache_dir=cache_dir, num_images=num_images)
+        for name in configs:
+            print(f"Benchmarking {name}...")
+            try:
+                results[name] = benchmark_config(model, dataset, batch_size, epochs, *CONFIGS[name])
+            except Exception as e:
+                # torch.compile needs a working C++ toolchain; report and carry on
+                print(f"  {name} failed: {e}")
+
+    baseline = results.get('fp32')
+    print(f"\n{'config':<30}{'images/sec':>12}{'speedup':>9}")
+    for name, rate in results.items():
+        speedup = f"{rate / baseline:.2f}x" if baseline else '-'
+        print(f"{name:<30}{rate:>12.1f}{speedup:>9}")
+
+    if output_path:
+        with open(output_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBenchmark results saved to {output_path}")
+
+    return results
+
+
+def main():
+    """Benchmark disease model training throughput (fp32 vs bf16, channels_last, torch.compile)"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--configs', nargs='+', choices=list(CONFIGS), default=list(CONFIGS))
+    parser.add_argument('--num-images', type=int, default=128)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--epochs', type=int, default=2)
+    parser.add_argument('--backbone', choices=list(BACKBONES), default='resnet50')
+    parser.add_argument('--output', default=None, help='optional JSON report path')
+    args = parser.parse_args()
+
+    run_benchmark(args.configs, args.num_images, args.batch_size, args.epochs, args.output, args.backbone)
+
+
+if __name__ == "__main__":
+    main()
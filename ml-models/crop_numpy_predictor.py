@@ -0,0 +1,91 @@
+import numpy as np
+import os
+
+NPZ_FILENAME = 'crop_recommendation.npz'
+
+
+def softmax(x):
+    """Row-wise softmax matching tf.keras.activations.softmax"""
+    shifted = x - np.max(x, axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / np.sum(exp, axis=1, keepdims=True)
+
+
+ACTIVATIONS = {
+    'relu': lambda x: np.maximum(x, 0),
+    'linear': lambda x: x,
+    'softmax': softmax,
+}
+
+
+def top_k_predictions(probabilities, classes, top_k=3):
+    """Vectorized top-k over an (n, n_classes) probability matrix.
+
+    Returns the (n, top_k) crop names and confidences in percent, best first.
+    """
+    top_indices = np.argpartition(probabilities, -top_k, axis=1)[:, -top_k:]
+    top_probs = np.take_along_axis(probabilities, top_indices, axis=1)
+    order = np.argsort(-top_probs, axis=1)
+    top_indices = np.take_along_axis(top_indices, order, axis=1)
+    top_probs = np.take_along_axis(top_probs, order, axis=1)
+    return np.asarray(classes)[top_indices], top_probs * 100
+
+
+class NumpyCropPredictor:
+    """Dependency-free crop recommendation inference from an exported .npz file"""
+
+    def __init__(self, kernels, biases, activations, scaler_mean, scaler_scale, classes, feature_columns):
+        self.kernels = [np.asarray(k, dtype=np.float32) for k in kernels]
+        self.biases = [np.asarray(b, dtype=np.float32) for b in biases]
+        self.activations = list(activations)
+        self.scaler_mean = np.asarray(scaler_mean, dtype=np.float64)
+        self.scaler_scale = np.asarray(scaler_scale, dtype=np.float64)
+        self.classes = np.asarray(classes)
+        self.feature_columns = list(feature_columns)
+
+    @classmethod
+    def load(cls, model_dir='saved_models'):
+        """Load weights, scaler statistics and classes from model_dir"""
+        with np.load(os.path.join(model_dir, NPZ_FILENAME), allow_pickle=False) as data:
+            n_layers = int(data['n_layers'])
+            return cls(
+                kernels=[data[f'kernel_{i}'] for i in range(n_layers)],
+                biases=[data[f'bias_{i}'] for i in range(n_layers)],
+                activations=[str(a) for a in data['activations']],
+                scaler_mean=data['scaler_mean'],
+                scaler_scale=data['scaler_scale'],
+                classes=data['classes'],
+                feature_columns=[str(c) for c in data['feature_columns']]
+            )
+
+    def predict_proba(self, features):
+        """Class probabilities for an (n, 7) array of raw (unscaled) features"""
+        features = np.asarray(features, dtype=np.float64).reshape(-1, len(self.feature_columns))
+
+        # StandardScaler.transform, then the Dense stack in float32 like Keras
+        x = ((features - self.scaler_mean) / self.scaler_scale).astype(np.float32)
+        for kernel, bias, activation in zip(self.kernels, self.biases, self.activations):
+            x = ACTIVATIONS[activation](x @ kernel + bias)
+        return x
+
+    def predict_batch(self, features, top_k=3):
+        """Predict top-k crops for an (n, 7) feature array"""
+        return top_k_predictions(self.predict_proba(features), self.classes, top_k)
+
+    def predict(self, soil_data):
+        """Predict crop recommendations for given soil data (same output as CropRecommendationModel)"""
+        input_data = np.array([[
+            soil_data['nitrogen'],
+            soil_data['phosphorus'],
+            soil_data['potassium'],
+            soil_data['temperature'],
+            soil_data['humidity'],
+            soil_data['ph'],
+            soil_data['rainfall']
+        ]])
+
+        crops, confidences = self.predict_batch(input_data, top_k=3)
+        return [
+            {'crop': str(crops[0][i]), 'confidence': float(confidences[0][i]), 'rank': i + 1}
+            for i in range(crops.shape[1])
+        ]
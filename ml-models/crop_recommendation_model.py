@@ -7,6 +7,23 @@ from sklearn.metrics import accuracy_score, classification_report
 import joblib
 import os
 import json
+import tempfile
+
+import model_registry
+from crop_numpy_predictor import NPZ_FILENAME, NumpyCropPredictor, top_k_predictions
+
+# (mean, std) of N, P, K, temperature, humidity, ph and rainfall per crop,
+# based on agricultural knowledge; other crops use the defaults
+CROP_PARAMETERS = {
+    'rice': [(80, 20), (60, 15), (40, 10), (25, 5), (80, 10), (6.5, 0.5), (200, 50)],
+    'wheat': [(50, 15), (50, 12), (50, 12), (20, 4), (65, 12), (6.8, 0.4), (100, 30)],
+    'maize': [(70, 18), (48, 12), (38, 10), (27, 4), (70, 10), (6.2, 0.5), (80, 25)],
+    'cotton': [(120, 25), (40, 10), (205, 30), (28, 3), (75, 8), (7.5, 0.3), (120, 40)],
+}
+DEFAULT_CROP_PARAMETERS = [(70, 25), (50, 15), (50, 15), (25, 5), (70, 15), (6.5, 0.8), (120, 50)]
+
+# (min, max) clip range per feature, in the same order
+FEATURE_LIMITS = [(0, 300), (5, 150), (5, 300), (8, 45), (14, 100), (3.5, 10), (20, 300)]
 
 class CropRecommendationModel:
     def __init__(self):
@@ -19,85 +36,63 @@ class CropRecommendationModel:
                      'grapes', 'watermelon', 'muskmelon', 'apple', 'orange', 'papaya', 
                      'coconut', 'cotton', 'jute', 'coffee']
     
-    def generate_synthetic_data(self, n_samples=10000):
-        """Generate synthetic crop data for training"""
-        np.random.seed(42)
-        
-        data = []
-        for crop in self.crops:
-            n_crop_samples = n_samples // len(self.crops)
-            
-            # Define crop-specific parameter ranges based on agricultural knowledge
-            if crop == 'rice':
-                nitrogen = np.random.normal(80, 20, n_crop_samples)
-                phosphorus = np.random.normal(60, 15, n_crop_samples)
-                potassium = np.random.normal(40, 10, n_crop_samples)
-                temperature = np.random.normal(25, 5, n_crop_samples)
-                humidity = np.random.normal(80, 10, n_crop_samples)
-                ph = np.random.normal(6.5, 0.5, n_crop_samples)
-                rainfall = np.random.normal(200, 50, n_crop_samples)
-            
-            elif crop == 'wheat':
-                nitrogen = np.random.normal(50, 15, n_crop_samples)
-                phosphorus = np.random.normal(50, 12, n_crop_samples)
-                potassium = np.random.normal(50, 12, n_crop_samples)
-                temperature = np.random.normal(20, 4, n_crop_samples)
-                humidity = np.random.normal(65, 12, n_crop_samples)
-                ph = np.random.normal(6.8, 0.4, n_crop_samples)
-                rainfall = np.random.normal(100, 30, n_crop_samples)
-            
-            elif crop == 'maize':
-                nitrogen = np.random.normal(70, 18, n_crop_samples)
-                phosphorus = np.random.normal(48, 12, n_crop_samples)
-                potassium = np.random.normal(38, 10, n_crop_samples)
-                temperature = np.random.normal(27, 4, n_crop_samples)
-                humidity = np.random.normal(70, 10, n_crop_samples)
-                ph = np.random.normal(6.2, 0.5, n_crop_samples)
-                rainfall = np.random.normal(80, 25, n_crop_samples)
-            
-            elif crop == 'cotton':
-                nitrogen = np.random.normal(120, 25, n_crop_samples)
-                phosphorus = np.random.normal(40, 10, n_crop_samples)
-                potassium = np.random.normal(205, 30, n_crop_samples)
-                temperature = np.random.normal(28, 3, n_crop_samples)
-                humidity = np.random.normal(75, 8, n_crop_samples)
-                ph = np.random.normal(7.5, 0.3, n_crop_samples)
-                rainfall = np.random.normal(120, 40, n_crop_samples)
-            
-            else:
-                # Default ranges for other crops
-                nitrogen = np.random.normal(70, 25, n_crop_samples)
-                phosphorus = np.random.normal(50, 15, n_crop_samples)
-                potassium = np.random.normal(50, 15, n_crop_samples)
-                temperature = np.random.normal(25, 5, n_crop_samples)
-                humidity = np.random.normal(70, 15, n_crop_samples)
-                ph = np.random.normal(6.5, 0.8, n_crop_samples)
-                rainfall = np.random.normal(120, 50, n_crop_samples)
-            
-            # Ensure positive values
-            nitrogen = np.clip(nitrogen, 0, 300)
-            phosphorus = np.clip(phosphorus, 5, 150)
-            potassium = np.clip(potassium, 5, 300)
-            temperature = np.clip(temperature, 8, 45)
-            humidity = np.clip(humidity, 14, 100)
-            ph = np.clip(ph, 3.5, 10)
-            rainfall = np.clip(rainfall, 20, 300)
-            
-            # Create crop samples
-            for i in range(n_crop_samples):
-                data.append({
-                    'N': nitrogen[i],
-                    'P': phosphorus[i],
-                    'K': potassium[i],
-                    'temperature': temperature[i],
-                    'humidity': humidity[i],
-                    'ph': ph[i],
-                    'rainfall': rainfall[i],
-                    'label': crop
-                })
-        
+    def generate_synthetic_data(self, n_samples=10000, rng=None, shuffle=False):
+        """Generate exactly n_samples rows of synthetic crop data for training
+        
+        Each crop gets n_samples // len(crops) rows and the remainder goes to
+        randomly chosen crops, one extra row each. Rows come grouped by crop
+        unless shuffle is set.
+        """
+        if rng is None:
+            rng = np.random.default_rng(42)
+        
+        counts = np.full(len(self.crops), n_samples // len(self.crops))
+        counts[rng.permutation(len(self.crops))[:n_samples % len(self.crops)]] += 1
+        codes = np.repeat(np.arange(len(self.crops)), counts)
+        if shuffle:
+            rng.shuffle(codes)
+        params = np.array([CROP_PARAMETERS.get(crop, DEFAULT_CROP_PARAMETERS) for crop in self.crops],
+                          dtype=np.float32)
+        means, stds = params[:, :, 0], params[:, :, 1]
+        
+        # One (samples, features) draw instead of a DataFrame row per sample
+        values = rng.standard_normal((n_samples, len(self.feature_columns)), dtype=np.float32)
+        values *= stds[codes]
+        values += means[codes]
+        low, high = np.array(FEATURE_LIMITS, dtype=np.float32).T
+        np.clip(values, low, high, out=values)
+        
+        data = {column: values[:, i] for i, column in enumerate(self.feature_columns)}
+        data['label'] = pd.Categorical.from_codes(codes, categories=self.crops)
         return pd.DataFrame(data)
     
+    def write_synthetic_shards(self, out_dir, n_samples, rows_per_shard=1_000_000, seed=42):
+        """Write synthetic data as Parquet shards of at most rows_per_shard rows for out-of-core training"""
+        if not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+        
+        # One generator across shards: reproducible for a seed, and every shard is class-balanced
+        # (to within one row per crop) and shuffled, so any shard or row range is a fair sample
+        rng = np.random.default_rng(seed)
+        paths = []
+        written = 0
+        while written < n_samples:
+            shard = self.generate_synthetic_data(min(rows_per_shard, n_samples - written), rng, shuffle=True)
+            path = os.path.join(out_dir, f'part-{len(paths):05d}.parquet')
+            shard.to_parquet(path, index=False)
+            paths.append(path)
+            written += len(shard)
+        
+        print(f"Wrote {written} synthetic rows to {len(paths)} shard(s) in {out_dir}")
+        return paths
+    
+    @staticmethod
+    def read_synthetic_shards(out_dir):
+        """Yield the Parquet shards written by write_synthetic_shards one DataFrame at a time"""
+        for name in sorted(os.listdir(out_dir)):
+            if name.endswith('.parquet'):
+                yield pd.read_parquet(os.path.join(out_dir, name))
+    
     def create_model(self, input_dim, output_dim):
         """Create a neural network model for crop recommendation"""
         model = tf.keras.Sequential([
@@ -175,11 +170,22 @@ class CropRecommendationModel:
         
         return history
     
-    def predict(self, soil_data):
-        """Predict crop recommendations for given soil data"""
+    def predict_batch(self, features, top_k=3):
+        """Predict top-k crops for an (n, 7) feature array with one scaler and model call"""
         if self.model is None:
             raise ValueError("Model not trained. Call train() first.")
         
+        features = np.asarray(features, dtype=np.float32).reshape(-1, len(self.feature_columns))
+        
+        # Scale all rows at once and run a single batched forward pass
+        input_scaled = self.scaler.transform(features)
+        predictions = self.model.predict(input_scaled, batch_size=4096, verbose=0)
+        
+        # Partial sort: only the top-k columns of each row are ordered
+        return top_k_predictions(predictions, self.label_encoder.classes_, top_k)
+    
+    def predict(self, soil_data):
+        """Predict crop recommendations for given soil data"""
         # Prepare input data
         input_data = np.array([[
             soil_data['nitrogen'],
@@ -191,22 +197,13 @@ class CropRecommendationModel:
             soil_data['rainfall']
         ]])
         
-        # Scale input data
-        input_scaled = self.scaler.transform(input_data)
-        
-        # Make prediction
-        predictions = self.model.predict(input_scaled)[0]
+        crops, confidences = self.predict_batch(input_data, top_k=3)
         
-        # Get top 3 recommendations
-        top_indices = np.argsort(predictions)[-3:][::-1]
         recommendations = []
-        
-        for i, idx in enumerate(top_indices):
-            crop = self.label_encoder.inverse_transform([idx])[0]
-            confidence = float(predictions[idx] * 100)
+        for i in range(crops.shape[1]):
             recommendations.append({
-                'crop': crop,
-                'confidence': confidence,
+                'crop': crops[0][i],
+                'confidence': float(confidences[0][i]),
                 'rank': i + 1
             })
         
@@ -230,7 +227,11 @@ class CropRecommendationModel:
             'crops': self.crops,
             'model_type': 'tensorflow',
             'input_shape': len(self.feature_columns),
-            'output_shape': len(self.crops)
+            'output_shape': len(self.crops),
+            # Preprocessing needed by runtimes that only see the exported graph (ONNX)
+            'classes': [str(c) for c in self.label_encoder.classes_],
+            'scaler_mean': self.scaler.mean_.tolist(),
+            'scaler_scale': self.scaler.scale_.tolist()
         }
         
         with open(os.path.join(model_dir, 'metadata.json'), 'w') as f:
@@ -270,6 +271,67 @@ class CropRecommendationModel:
         print(f"TensorFlow Lite model saved to {tflite_path}")
         return tflite_path
     
+    def export_numpy(self, model_dir='saved_models'):
+        """Export weights, scaler and classes to one .npz for TensorFlow-free serving"""
+        if self.model is None:
+            raise ValueError("Model not trained. Call train() first.")
+        
+        if not os.path.exists(model_dir):
+            os.makedirs(model_dir)
+        
+        # Dropout is a no-op at inference time, so only Dense layers are kept
+        dense_layers = [layer for layer in self.model.layers
+                        if isinstance(layer, tf.keras.layers.Dense)]
+        arrays = {}
+        for i, layer in enumerate(dense_layers):
+            kernel, bias = layer.get_weights()
+            arrays[f'kernel_{i}'] = kernel.astype(np.float32)
+            arrays[f'bias_{i}'] = bias.astype(np.float32)
+        
+        npz_path = os.path.join(model_dir, NPZ_FILENAME)
+        np.savez_compressed(
+            npz_path,
+            n_layers=np.array(len(dense_layers)),
+            activations=np.array([layer.get_config()['activation'] for layer in dense_layers]),
+            scaler_mean=self.scaler.mean_,
+            scaler_scale=self.scaler.scale_,
+            classes=np.asarray(self.label_encoder.classes_).astype(str),
+            feature_columns=np.array(self.feature_columns),
+            **arrays
+        )
+        
+        print(f"NumPy model saved to {npz_path}")
+        return npz_path
+    
+    def verify_numpy_export(self, model_dir='saved_models', n_samples=1000, atol=1e-5):
+        """Check the exported NumPy predictor against Keras on synthetic samples
+        
+        Probabilities must match within atol, and so must the top 3: where the
+        two pick different crops, Keras must rate them within atol (a near tie).
+        """
+        predictor = NumpyCropPredictor.load(model_dir)
+        features = self.generate_synthetic_data(n_samples)[self.feature_columns].to_numpy(dtype=np.float32)
+        
+        keras_probs = self.model.predict(self.scaler.transform(features), batch_size=4096, verbose=0)
+        numpy_probs = predictor.predict_proba(features)
+        max_diff = float(np.max(np.abs(keras_probs - numpy_probs)))
+        
+        keras_crops, keras_confidences = top_k_predictions(keras_probs, predictor.classes)
+        numpy_crops, _ = top_k_predictions(numpy_probs, predictor.classes)
+        exact_match = float(np.mean(np.all(keras_crops == numpy_crops, axis=1)))
+        class_index = {crop: i for i, crop in enumerate(predictor.classes)}
+        numpy_indices = np.vectorize(class_index.__getitem__)(numpy_crops)
+        numpy_pick_probs = np.take_along_axis(keras_probs, numpy_indices, axis=1)
+        top3_match = float(np.mean(np.all(np.abs(numpy_pick_probs - keras_confidences / 100) <= atol, axis=1)))
+        
+        print(f"NumPy vs Keras: max |diff| = {max_diff:.2e}, top-3 agreement = {top3_match * 100:.2f}% "
+              f"({exact_match * 100:.2f}% identical order)")
+        if max_diff > atol:
+            raise AssertionError(f"NumPy predictor differs from Keras by {max_diff:.2e} (> {atol:.0e})")
+        if top3_match < 1.0:
+            raise AssertionError(f"NumPy predictor top-3 agrees with Keras on only {top3_match * 100:.2f}% of samples")
+        return max_diff, top3_match
+    
     def export_onnx(self, model_dir='saved_models'):
         """Export model to ONNX format"""
         try:
@@ -293,6 +355,24 @@ class CropRecommendationModel:
         except ImportError:
             print("tf2onnx not available. Install with: pip install tf2onnx")
             return None
+    
+    def publish(self, registry_dir=model_registry.DEFAULT_REGISTRY_DIR, version=None, metrics=None):
+        """Save every serving format as a new version in the model registry"""
+        if self.model is None:
+            raise ValueError("Model not trained. Call train() first.")
+        
+        with tempfile.TemporaryDirectory() as staging_dir:
+            self.save_model(staging_dir)
+            self.export_numpy(staging_dir)
+            self.export_onnx(staging_dir)
+            
+            input_spec = {
+                'features': self.feature_columns,
+                'shape': [None, len(self.feature_columns)],
+                'dtype': 'float32'
+            }
+            return model_registry.publish(staging_dir, 'crop', registry_dir, version=version, metrics=metrics,
+                                          input_spec=input_spec, model_type='tensorflow')
 
 
 def main():
@@ -309,6 +389,11 @@ def main():
     model.save_model()
     model.export_tflite()
     model.export_onnx()
+    model.export_numpy()
+    model.verify_numpy_export()
+    
+    # Publish a registry version the backend can hot-swap to
+    model.publish(metrics={'val_accuracy': float(max(history.history['val_accuracy']))})
     
     # Test prediction
     test_data = {
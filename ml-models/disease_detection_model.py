@@ -1,9 +1,15 @@
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import Dataset, DataLoader
+import torch.distributed as dist
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import Dataset, DataLoader, DistributedSampler, Sampler
 import torchvision.transforms as transforms
-from torchvision.models import resnet50, ResNet50_Weights
+from torchvision.models import (
+    resnet50, ResNet50_Weights,
+    mobilenet_v3_large, MobileNet_V3_Large_Weights,
+    efficientnet_b0, EfficientNet_B0_Weights
+)
 import numpy as np
 import pandas as pd
 from PIL import Image
@@ -14,21 +20,162 @@ from sklearn.metrics import accuracy_score, classification_report, confusion_mat
 import seaborn as sns
 from collections import defaultdict
 import random
+import time
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import model_registry
+from image_store import IMAGES_FILENAME, LABELS_FILENAME, build_image_store, list_images
+
+# Backbones the classifier can be built on. head is the attribute holding the
+# ImageNet classifier; onnx_opset is the lowest opset that exports every layer
+# (Hardswish needs 14).
+BACKBONES = {
+    'resnet50': {'build': resnet50, 'weights': ResNet50_Weights.DEFAULT, 'head': 'fc', 'onnx_opset': 11},
+    'mobilenet_v3_large': {'build': mobilenet_v3_large, 'weights': MobileNet_V3_Large_Weights.DEFAULT,
+                           'head': 'classifier', 'onnx_opset': 14},
+    'efficientnet_b0': {'build': efficientnet_b0, 'weights': EfficientNet_B0_Weights.DEFAULT,
+                        'head': 'classifier', 'onnx_opset': 11}
+}
+DEFAULT_BACKBONE = 'resnet50'
+
+# Written by benchmark_backbones.py; read by select_backbone
+BACKBONE_BENCHMARK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backbone_benchmark.json')
+
+LEAF_GREEN = (34, 139, 34)
+SPOT_BROWNS = ((101, 67, 33), (139, 69, 19))
+PATCH_YELLOW = (255, 255, 0)
+
+_noise_banks = {}
+
+
+def noise_bank(img_size):
+    """Fixed N(0, 10) pixel noise at twice the image size; each image takes a random window of it"""
+    bank = _noise_banks.get(img_size)
+    if bank is None:
+        rng = np.random.default_rng(0)
+        noise = rng.standard_normal((2 * img_size, 2 * img_size, 3), dtype=np.float32) * 10
+        bank = _noise_banks[img_size] = noise.astype(np.int16)
+    return bank
+
+
+def render_synthetic_leaf(rng, img_size=224):
+    """Synthetic leaf as an (img_size, img_size, 3) uint8 array.
+    
+    Brown disease spots (70% of images) and yellow nutrient-deficiency patches
+    (40%) are painted through boolean masks over each shape's bounding box.
+    """
+    pixels = np.empty((img_size, img_size, 3), dtype=np.uint8)
+    pixels[:] = LEAF_GREEN
+    
+    if rng.random() > 0.3:
+        for _ in range(rng.integers(1, 5, endpoint=True)):
+            center_x, center_y = rng.integers(20, img_size - 20, size=2, endpoint=True)
+            radius = int(rng.integers(5, 15, endpoint=True))
+            top, bottom = max(0, center_y - radius), min(img_size, center_y + radius)
+            left, right = max(0, center_x - radius), min(img_size, center_x + radius)
+            
+            dy = np.arange(top, bottom)[:, None] - center_y
+            dx = np.arange(left, right)[None, :] - center_x
+            mask = dy * dy + dx * dx <= radius * radius
+            # Each spot pixel is one of two browns at random
+            browns = np.where((rng.random(mask.shape) > 0.5)[..., None], SPOT_BROWNS[0], SPOT_BROWNS[1])
+            region = pixels[top:bottom, left:right]
+            region[mask] = browns[mask]
+    
+    if rng.random() > 0.6:
+        for _ in range(rng.integers(1, 3, endpoint=True)):
+            start_x, start_y = rng.integers(0, img_size - 30, size=2, endpoint=True)
+            end_x = min(img_size, start_x + int(rng.integers(10, 30, endpoint=True)))
+            end_y = min(img_size, start_y + int(rng.integers(10, 30, endpoint=True)))
+            pixels[start_y:end_y, start_x:end_x] = PATCH_YELLOW
+    
+    # Drawing fresh Gaussian noise per image would cost more than everything above
+    offset_y, offset_x = rng.integers(0, img_size, size=2, endpoint=True)
+    noise = noise_bank(img_size)[offset_y:offset_y + img_size, offset_x:offset_x + img_size]
+    return np.clip(pixels + noise, 0, 255).astype(np.uint8)
+
+
+def shard_labels_path(images_path):
+    return os.path.splitext(images_path)[0] + '_labels.npy'
+
+
+def render_synthetic_shard(images_path, num_images, num_classes=11, img_size=224, seed=0):
+    """Pre-render synthetic leaves into a uint8 (n, H, W, 3) .npy file plus a labels file"""
+    rng = np.random.default_rng(seed)
+    tmp_path = images_path + '.tmp'
+    
+    # Rendered straight into the mapped file, so memory stays flat however many images there are
+    images = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8,
+                                       shape=(num_images, img_size, img_size, 3))
+    for i in range(num_images):
+        images[i] = render_synthetic_leaf(rng, img_size)
+    images.flush()
+    del images
+    
+    np.save(shard_labels_path(images_path), rng.integers(0, num_classes, num_images))
+    os.replace(tmp_path, images_path)
+    return images_path
+
+
+def is_distributed():
+    return dist.is_available() and dist.is_initialized()
+
+
+def is_local_main():
+    """Whether this is the first process on its node (LOCAL_RANK as set by torchrun/run_spawned)"""
+    if not is_distributed():
+        return True
+    return int(os.environ.get('LOCAL_RANK', dist.get_rank())) == 0
+
+
+class EvalShardSampler(Sampler):
+    """Every world_size-th index starting at this rank, in order.
+    
+    Unlike DistributedSampler it never pads the last shard with repeated
+    samples, so totals summed over all processes count each sample exactly once.
+    """
+    
+    def __init__(self, dataset):
+        self.indices = range(dist.get_rank(), len(dataset), dist.get_world_size())
+    
+    def __iter__(self):
+        return iter(self.indices)
+    
+    def __len__(self):
+        return len(self.indices)
+
+
+def epoch_totals(loss_sum, correct, total, batches):
+    """Host copies of an epoch's running totals, summed over all processes when distributed"""
+    totals = torch.stack([
+        loss_sum.double(),
+        correct.double(),
+        torch.tensor(float(total), dtype=torch.float64, device=loss_sum.device),
+        torch.tensor(float(batches), dtype=torch.float64, device=loss_sum.device)
+    ])
+    if is_distributed():
+        dist.all_reduce(totals)
+    loss_sum, correct, total, batches = totals.tolist()
+    return loss_sum, int(correct), int(total), int(batches)
+
 
 class PlantDiseaseDataset(Dataset):
     """Custom dataset for plant disease images"""
     
-    def __init__(self, image_paths, labels, transform=None, synthetic=True):
+    def __init__(self, image_paths, labels, transform=None, synthetic=True, num_samples=5000):
         self.image_paths = image_paths
         self.labels = labels
         self.transform = transform
         self.synthetic = synthetic
+        self.num_samples = num_samples
         self.classes = ['bacterial_leaf_spot', 'early_blight', 'late_blight', 'leaf_mold', 
                        'powdery_mildew', 'septoria_leaf_spot', 'spider_mites', 'target_spot',
                        'tomato_mosaic_virus', 'yellow_leaf_curl_virus', 'healthy']
     
     def __len__(self):
-        return len(self.image_paths) if not self.synthetic else 5000
+        return len(self.image_paths) if not self.synthetic else self.num_samples
     
     def __getitem__(self, idx):
         if self.synthetic:
@@ -48,67 +195,154 @@ class PlantDiseaseDataset(Dataset):
     
     def generate_synthetic_image(self):
         """Generate a synthetic plant leaf image for demo purposes"""
-        # Create a simple synthetic leaf-like image
-        img_size = 224
-        image = Image.new('RGB', (img_size, img_size), color=(34, 139, 34))  # Forest green base
-        
-        # Add some random patterns to simulate leaf texture and diseases
-        pixels = np.array(image)
-        
-        # Add some brown spots (disease simulation)
-        if random.random() > 0.3:  # 70% chance of disease spots
-            num_spots = random.randint(1, 5)
-            for _ in range(num_spots):
-                center_x = random.randint(20, img_size - 20)
-                center_y = random.randint(20, img_size - 20)
-                radius = random.randint(5, 15)
-                
-                for i in range(max(0, center_y - radius), min(img_size, center_y + radius)):
-                    for j in range(max(0, center_x - radius), min(img_size, center_x + radius)):
-                        if (i - center_y)**2 + (j - center_x)**2 <= radius**2:
-                            # Brown spots for disease
-                            pixels[i, j] = [101, 67, 33] if random.random() > 0.5 else [139, 69, 19]
-        
-        # Add some yellow areas (nutrient deficiency simulation)
-        if random.random() > 0.6:  # 40% chance of yellow areas
-            num_yellow = random.randint(1, 3)
-            for _ in range(num_yellow):
-                start_x = random.randint(0, img_size - 30)
-                start_y = random.randint(0, img_size - 30)
-                end_x = min(img_size, start_x + random.randint(10, 30))
-                end_y = min(img_size, start_y + random.randint(10, 30))
-                
-                pixels[start_y:end_y, start_x:end_x] = [255, 255, 0]  # Yellow
+        # Seeded from random, which DataLoader reseeds in every worker
+        rng = np.random.default_rng(random.getrandbits(64))
+        return Image.fromarray(render_synthetic_leaf(rng))
+
+
+class ImageShardDataset(Dataset):
+    """Pre-rendered uint8 (n, H, W, 3) images memory-mapped from a .npy file.
+    
+    Every process maps the file itself (copy-on-write, never written back), and
+    items are CHW uint8 tensor views of the mapping, so reading copies nothing
+    before the transform. Use get_transforms(from_tensor=True) with it.
+    indices restricts the dataset to a subset of rows, e.g. a train/val split.
+    """
+    
+    def __init__(self, images_path, labels_path=None, transform=None, indices=None):
+        self.images_path = images_path
+        self.labels = np.load(labels_path or shard_labels_path(images_path))
+        self.indices = np.arange(len(self.labels)) if indices is None else np.asarray(indices)
+        self.transform = transform
+        self._images = None
+    
+    def __len__(self):
+        return len(self.indices)
+    
+    def __getstate__(self):
+        # Workers re-map the file rather than receiving a pickled copy of it
+        state = self.__dict__.copy()
+        state['_images'] = None
+        return state
+    
+    def __getitem__(self, idx):
+        if self._images is None:
+            self._images = np.load(self.images_path, mmap_mode='c')
         
-        # Add some random noise
-        noise = np.random.normal(0, 10, pixels.shape).astype(np.int8)
-        pixels = np.clip(pixels.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+        row = self.indices[idx]
+        image = torch.from_numpy(self._images[row]).permute(2, 0, 1)
+        if self.transform:
+            image = self.transform(image)
         
-        return Image.fromarray(pixels)
+        return image, int(self.labels[row])
+
+
+class CalibrationImageReader:
+    """Feeds preprocessed dataset batches to ONNX Runtime static quantization calibration"""
+    
+    def __init__(self, dataset, num_samples=128, batch_size=8, input_name='input'):
+        self.dataset = dataset
+        self.num_samples = num_samples
+        self.batch_size = batch_size
+        self.input_name = input_name
+        self.offset = 0
+    
+    def get_next(self):
+        if self.offset >= self.num_samples:
+            return None
+        
+        count = min(self.batch_size, self.num_samples - self.offset)
+        batch = torch.stack([self.dataset[self.offset + i][0] for i in range(count)])
+        self.offset += count
+        return {self.input_name: batch.numpy()}
+    
+    def rewind(self):
+        self.offset = 0
+
+
+def distillation_loss(student_logits, teacher_logits, targets, temperature=4.0, alpha=0.7):
+    """alpha * KL(teacher || student) at temperature T (scaled by T^2) + (1 - alpha) * cross-entropy on labels"""
+    soft_teacher = torch.softmax(teacher_logits.float() / temperature, dim=1)
+    log_student = torch.log_softmax(student_logits.float() / temperature, dim=1)
+    kl = nn.functional.kl_div(log_student, soft_teacher, reduction='batchmean') * temperature ** 2
+    return alpha * kl + (1 - alpha) * nn.functional.cross_entropy(student_logits.float(), targets)
+
+
+class TeacherLogitsDataset(Dataset):
+    """Items of a dataset paired with teacher logits memory-mapped from an (n, classes) .npy file"""
+    
+    def __init__(self, dataset, logits_path):
+        self.dataset = dataset
+        self.logits_path = logits_path
+        self._logits = None
+    
+    def __len__(self):
+        return len(self.dataset)
+    
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_logits'] = None
+        return state
+    
+    def __getitem__(self, idx):
+        if self._logits is None:
+            self._logits = np.load(self.logits_path, mmap_mode='c')
+        image, label = self.dataset[idx]
+        return image, label, torch.from_numpy(self._logits[idx])
+
+
+def file_signature(*paths):
+    """Short hash of file sizes and modification times, for naming derived caches"""
+    digest = hashlib.sha1()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f'{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n'.encode())
+    return digest.hexdigest()[:12]
+
+
+def select_backbone(p99_budget_ms, benchmark_path=BACKBONE_BENCHMARK_PATH):
+    """Most accurate backbone whose benchmarked single-image p99 latency fits the budget"""
+    with open(benchmark_path) as f:
+        results = json.load(f)['backbones']
+    
+    fitting = [(name, result) for name, result in results.items()
+               if name in BACKBONES and result['p99_ms'] <= p99_budget_ms]
+    if not fitting:
+        fastest = min(results, key=lambda name: results[name]['p99_ms'])
+        raise ValueError(f"No backbone meets a p99 budget of {p99_budget_ms} ms "
+                         f"(fastest is {fastest} at {results[fastest]['p99_ms']:.1f} ms)")
+    
+    # Ties on accuracy go to the faster backbone
+    return max(fitting, key=lambda item: (item[1]['accuracy'], -item[1]['p99_ms']))[0]
 
 
 class PlantDiseaseClassifier(nn.Module):
-    """CNN model for plant disease classification"""
+    """CNN model for plant disease classification on a BACKBONES entry"""
     
-    def __init__(self, num_classes=11, pretrained=True):
+    def __init__(self, num_classes=11, pretrained=True, backbone=DEFAULT_BACKBONE):
         super(PlantDiseaseClassifier, self).__init__()
         
-        # Use ResNet50 as backbone
-        if pretrained:
-            self.backbone = resnet50(weights=ResNet50_Weights.DEFAULT)
-        else:
-            self.backbone = resnet50()
+        if backbone not in BACKBONES:
+            raise ValueError(f"Unknown backbone {backbone!r}; choose from {', '.join(BACKBONES)}")
+        spec = BACKBONES[backbone]
+        self.backbone = spec['build'](weights=spec['weights'] if pretrained else None)
         
         # Replace the final classifier
-        num_features = self.backbone.fc.in_features
-        self.backbone.fc = nn.Sequential(
-            nn.Dropout(0.5),
-            nn.Linear(num_features, 512),
-            nn.ReLU(),
-            nn.Dropout(0.3),
-            nn.Linear(512, num_classes)
-        )
+        if spec['head'] == 'fc':
+            num_features = self.backbone.fc.in_features
+            self.backbone.fc = nn.Sequential(
+                nn.Dropout(0.5),
+                nn.Linear(num_features, 512),
+                nn.ReLU(),
+                nn.Dropout(0.3),
+                nn.Linear(512, num_classes)
+            )
+        else:
+            # Mobile backbones already end in dropout + linear; only the output layer changes
+            classifier = getattr(self.backbone, spec['head'])
+            classifier[-1] = nn.Linear(classifier[-1].in_features, num_classes)
         
+        self.backbone_name = backbone
         self.num_classes = num_classes
     
     def forward(self, x):
@@ -118,7 +352,10 @@ class PlantDiseaseClassifier(nn.Module):
 class DiseaseDetectionModel:
     """Plant Disease Detection Model Manager"""
     
-    def __init__(self):
+    def __init__(self, backbone=DEFAULT_BACKBONE):
+        if backbone not in BACKBONES:
+            raise ValueError(f"Unknown backbone {backbone!r}; choose from {', '.join(BACKBONES)}")
+        self.backbone = backbone
         self.model = None
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         self.classes = ['bacterial_leaf_spot', 'early_blight', 'late_blight', 'leaf_mold', 
@@ -182,12 +419,15 @@ class DiseaseDetectionModel:
             }
         }
         
-        # Set default info for other classes
+        self.fill_class_info()
+    
+    def fill_class_info(self):
+        """Set default info for classes without a curated entry"""
         for class_name in self.classes:
             if class_name not in self.class_info:
                 self.class_info[class_name] = {
                     'severity': 'Medium',
-                    'description': f'Plant disease: {class_name.replace(\"_\", \" \").title()}',
+                    'description': f"Plant disease: {class_name.replace('_', ' ').title()}",
                     'treatments': {
                         'chemical': ['Consult agricultural expert'],
                         'organic': ['Neem oil spray', 'Organic treatments'],
@@ -195,8 +435,24 @@ class DiseaseDetectionModel:
                     }
                 }
     
-    def get_transforms(self, train=True):
-        """Get image transformations for training and validation"""
+    def get_transforms(self, train=True, from_tensor=False):
+        """Get image transformations for training and validation
+        
+        from_tensor=True takes CHW uint8 tensors (ImageShardDataset) instead of PIL images.
+        """
+        if from_tensor:
+            # Shards are stored at 224x224, so training only adds cheap tensor augmentations:
+            # reflect-padded crops, flips and brightness/contrast/saturation jitter
+            augment = [
+                transforms.RandomCrop(224, padding=16, padding_mode='reflect'),
+                transforms.RandomHorizontalFlip(0.5),
+                transforms.ConvertImageDtype(torch.float32),
+                transforms.ColorJitter(brightness=0.2, contrast=0.2, saturation=0.2)
+            ] if train else [transforms.ConvertImageDtype(torch.float32)]
+            return transforms.Compose(augment + [
+                transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+            ])
+        
         if train:
             return transforms.Compose([
                 transforms.Resize((256, 256)),
@@ -214,26 +470,752 @@ class DiseaseDetectionModel:
                 transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
             ])
     
-    def create_synthetic_dataset(self):
-        """Create synthetic dataset for training"""
+    def create_synthetic_dataset(self, cache_dir=None, num_images=5000, seed=0):
+        """Create synthetic dataset for training
+        
+        With cache_dir, images are pre-rendered once into memory-mapped shards
+        and reused by later runs; otherwise they are generated on the fly.
+        """
+        if cache_dir:
+            if not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+            
+            datasets = []
+            for offset, split in enumerate(('train', 'val')):
+                images_path = os.path.join(cache_dir, f'synthetic_{split}.npy')
+                if (not os.path.exists(images_path)
+                        or np.load(images_path, mmap_mode='r').shape[0] != num_images):
+                    print(f"Pre-rendering {num_images} synthetic {split} images to {images_path}...")
+                    render_synthetic_shard(images_path, num_images, len(self.classes), seed=seed + offset)
+                datasets.append(ImageShardDataset(
+                    images_path, transform=self.get_transforms(train=split == 'train', from_tensor=True)
+                ))
+            return tuple(datasets)
+        
         # Create synthetic data
         train_dataset = PlantDiseaseDataset(
             image_paths=[], 
             labels=[], 
             transform=self.get_transforms(train=True),
-            synthetic=True
+            synthetic=True,
+            num_samples=num_images
         )
         
         val_dataset = PlantDiseaseDataset(
             image_paths=[], 
             labels=[], 
             transform=self.get_transforms(train=False),
-            synthetic=True
+            synthetic=True,
+            num_samples=num_images
         )
         
         return train_dataset, val_dataset
     
-    def train(self, epochs=50, batch_size=32, learning_rate=0.001):
-        """Train the disease detection model"""
-        print(\"Training Plant Disease Detection Model...\")\n        \n        # Create model\n        self.model = PlantDiseaseClassifier(num_classes=len(self.classes))\n        self.model.to(self.device)\n        \n        # Create datasets\n        train_dataset, val_dataset = self.create_synthetic_dataset()\n        \n        train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True)\n        val_loader = DataLoader(val_dataset, batch_size=batch_size, shuffle=False)\n        \n        # Loss and optimizer\n        criterion = nn.CrossEntropyLoss()\n        optimizer = optim.Adam(self.model.parameters(), lr=learning_rate)\n        scheduler = optim.lr_scheduler.ReduceLROnPlateau(optimizer, 'min', patience=5)\n        \n        # Training history\n        train_losses = []\n        val_losses = []\n        train_accs = []\n        val_accs = []\n        \n        best_val_acc = 0.0\n        \n        for epoch in range(epochs):\n            # Training phase\n            self.model.train()\n            running_loss = 0.0\n            correct_train = 0\n            total_train = 0\n            \n            for batch_idx, (data, target) in enumerate(train_loader):\n                data, target = data.to(self.device), target.to(self.device)\n                \n                optimizer.zero_grad()\n                output = self.model(data)\n                loss = criterion(output, target)\n                loss.backward()\n                optimizer.step()\n                \n                running_loss += loss.item()\n                _, predicted = torch.max(output.data, 1)\n                total_train += target.size(0)\n                correct_train += (predicted == target).sum().item()\n                \n                if batch_idx % 50 == 0:\n                    print(f'Epoch {epoch+1}/{epochs}, Batch {batch_idx}, Loss: {loss.item():.4f}')\n            \n            train_loss = running_loss / len(train_loader)\n            train_acc = 100 * correct_train / total_train\n            \n            # Validation phase\n            self.model.eval()\n            val_loss = 0.0\n            correct_val = 0\n            total_val = 0\n            \n            with torch.no_grad():\n                for data, target in val_loader:\n                    data, target = data.to(self.device), target.to(self.device)\n                    output = self.model(data)\n                    val_loss += criterion(output, target).item()\n                    \n                    _, predicted = torch.max(output.data, 1)\n                    total_val += target.size(0)\n                    correct_val += (predicted == target).sum().item()\n            \n            val_loss /= len(val_loader)\n            val_acc = 100 * correct_val / total_val\n            \n            # Update learning rate\n            scheduler.step(val_loss)\n            \n            # Save best model\n            if val_acc > best_val_acc:\n                best_val_acc = val_acc\n                # torch.save(self.model.state_dict(), 'best_model.pth')\n            \n            # Record history\n            train_losses.append(train_loss)\n            val_losses.append(val_loss)\n            train_accs.append(train_acc)\n            val_accs.append(val_acc)\n            \n            print(f'Epoch {epoch+1}/{epochs}:')\n            print(f'  Train Loss: {train_loss:.4f}, Train Acc: {train_acc:.2f}%')\n            print(f'  Val Loss: {val_loss:.4f}, Val Acc: {val_acc:.2f}%')\n            print(f'  Learning Rate: {optimizer.param_groups[0][\"lr\"]:.6f}')\n            print('-' * 60)\n        \n        return {\n            'train_losses': train_losses,\n            'val_losses': val_losses,\n            'train_accs': train_accs,\n            'val_accs': val_accs,\n            'best_val_acc': best_val_acc\n        }\n    \n    def predict(self, image_path_or_array, top_k=3):\n        \"\"\"Predict disease from image\"\"\"\n        if self.model is None:\n            raise ValueError(\"Model not trained. Call train() first.\")\n        \n        self.model.eval()\n        \n        # Load and preprocess image\n        if isinstance(image_path_or_array, str):\n            image = Image.open(image_path_or_array).convert('RGB')\n        elif isinstance(image_path_or_array, np.ndarray):\n            image = Image.fromarray(image_path_or_array)\n        else:\n            image = image_path_or_array\n        \n        # Apply transforms\n        transform = self.get_transforms(train=False)\n        image_tensor = transform(image).unsqueeze(0).to(self.device)\n        \n        # Make prediction\n        with torch.no_grad():\n            outputs = self.model(image_tensor)\n            probabilities = torch.nn.functional.softmax(outputs, dim=1)\n            \n        # Get top-k predictions\n        top_probs, top_indices = torch.topk(probabilities, top_k)\n        \n        results = []\n        for i in range(top_k):\n            class_idx = top_indices[0][i].item()\n            confidence = top_probs[0][i].item() * 100\n            class_name = self.classes[class_idx]\n            \n            result = {\n                'disease': class_name.replace('_', ' ').title(),\n                'confidence': confidence,\n                'severity': self.class_info[class_name]['severity'],\n                'description': self.class_info[class_name]['description'],\n                'symptoms': [f\"Symptoms of {class_name.replace('_', ' ')}\"],\n                'causes': [f\"Common causes of {class_name.replace('_', ' ')}\"],\n                'treatments': self.class_info[class_name]['treatments']\n            }\n            results.append(result)\n        \n        return results[0] if top_k == 1 else results\n    \n    def save_model(self, model_dir='saved_models'):\n        \"\"\"Save the trained model\"\"\"\n        if not os.path.exists(model_dir):\n            os.makedirs(model_dir)\n        \n        # Save PyTorch model\n        torch.save({\n            'model_state_dict': self.model.state_dict(),\n            'classes': self.classes,\n            'class_info': self.class_info\n        }, os.path.join(model_dir, 'disease_detection_pytorch.pth'))\n        \n        # Save model metadata\n        metadata = {\n            'classes': self.classes,\n            'num_classes': len(self.classes),\n            'model_type': 'pytorch_resnet50',\n            'input_size': [224, 224, 3],\n            'class_info': self.class_info\n        }\n        \n        with open(os.path.join(model_dir, 'disease_metadata.json'), 'w') as f:\n            json.dump(metadata, f, indent=2)\n        \n        print(f\"Model saved to {model_dir}\")\n    \n    def load_model(self, model_dir='saved_models'):\n        \"\"\"Load a pre-trained model\"\"\"\n        checkpoint = torch.load(os.path.join(model_dir, 'disease_detection_pytorch.pth'),\n                               map_location=self.device)\n        \n        self.model = PlantDiseaseClassifier(num_classes=len(self.classes))\n        self.model.load_state_dict(checkpoint['model_state_dict'])\n        self.model.to(self.device)\n        self.model.eval()\n        \n        self.classes = checkpoint['classes']\n        self.class_info = checkpoint['class_info']\n        \n        print(f\"Model loaded from {model_dir}\")\n    \n    def export_torchscript(self, model_dir='saved_models'):\n        \"\"\"Export model to TorchScript format\"\"\"\n        if self.model is None:\n            raise ValueError(\"Model not trained. Call train() first.\")\n        \n        self.model.eval()\n        \n        # Create example input\n        example_input = torch.randn(1, 3, 224, 224).to(self.device)\n        \n        # Trace the model\n        traced_model = torch.jit.trace(self.model, example_input)\n        \n        # Save TorchScript model\n        torchscript_path = os.path.join(model_dir, 'disease_detection.pt')\n        traced_model.save(torchscript_path)\n        \n        print(f\"TorchScript model saved to {torchscript_path}\")\n        return torchscript_path\n    \n    def export_onnx(self, model_dir='saved_models'):\n        \"\"\"Export model to ONNX format\"\"\"\n        if self.model is None:\n            raise ValueError(\"Model not trained. Call train() first.\")\n        \n        self.model.eval()\n        \n        # Create example input\n        dummy_input = torch.randn(1, 3, 224, 224).to(self.device)\n        \n        # Export to ONNX\n        onnx_path = os.path.join(model_dir, 'disease_detection.onnx')\n        torch.onnx.export(\n            self.model,\n            dummy_input,\n            onnx_path,\n            export_params=True,\n            opset_version=11,\n            do_constant_folding=True,\n            input_names=['input'],\n            output_names=['output'],\n            dynamic_axes={\n                'input': {0: 'batch_size'},\n                'output': {0: 'batch_size'}\n            }\n        )\n        \n        print(f\"ONNX model saved to {onnx_path}\")\n        return onnx_path\n    \n    def export_tflite(self, model_dir='saved_models'):\n        \"\"\"Export model to TensorFlow Lite (requires onnx-tf)\"\"\"\n        try:\n            import onnx\n            from onnx_tf.backend import prepare\n            import tensorflow as tf\n            \n            # First export to ONNX\n            onnx_path = self.export_onnx(model_dir)\n            \n            # Load ONNX model\n            onnx_model = onnx.load(onnx_path)\n            \n            # Convert to TensorFlow\n            tf_rep = prepare(onnx_model)\n            \n            # Export to SavedModel format\n            tf_model_dir = os.path.join(model_dir, 'tf_model')\n            tf_rep.export_graph(tf_model_dir)\n            \n            # Convert to TFLite\n            converter = tf.lite.TFLiteConverter.from_saved_model(tf_model_dir)\n            converter.optimizations = [tf.lite.Optimize.DEFAULT]\n            tflite_model = converter.convert()\n            \n            # Save TFLite model\n            tflite_path = os.path.join(model_dir, 'disease_detection.tflite')\n            with open(tflite_path, 'wb') as f:\n                f.write(tflite_model)\n            \n            print(f\"TensorFlow Lite model saved to {tflite_path}\")\n            return tflite_path\n            \n        except ImportError:\n            print(\"onnx-tf not available. Install with: pip install onnx-tf\")\n            return None\n\n\ndef main():\n    \"\"\"Train and export the disease detection model\"\"\"\n    print(\"Training Disease Detection Model...\")\n    \n    # Create model instance\n    model = DiseaseDetectionModel()\n    \n    # Train model (reduced epochs for demo)\n    history = model.train(epochs=20, batch_size=16)\n    \n    print(f\"\\nBest validation accuracy: {history['best_val_acc']:.2f}%\")\n    \n    # Save model in multiple formats\n    model.save_model()\n    model.export_torchscript()\n    model.export_onnx()\n    model.export_tflite()\n    \n    # Test prediction with synthetic data\n    dataset = PlantDiseaseDataset([], [], transform=None, synthetic=True)\n    test_image = dataset.generate_synthetic_image()\n    \n    result = model.predict(test_image)\n    print(\"\\nTest Prediction:\")\n    print(f\"Disease: {result['disease']}\")\n    print(f\"Confidence: {result['confidence']:.2f}%\")\n    print(f\"Severity: {result['severity']}\")\n\n\nif __name__ == \"__main__\":\n    main()"
-      
\ No newline at end of file
+    def create_image_dataset(self, source, store_dir='image_store', image_root=None, val_fraction=0.2, seed=0):
+        """Train/val datasets over real images from a class-per-folder tree or a CSV of paths and labels
+        
+        Images are decoded and resized once into a memory-mapped store in
+        store_dir; later runs reuse it while the source files are unchanged.
+        """
+        paths, labels = list_images(source, image_root, self.classes)
+        if not paths:
+            raise ValueError(f"No images found in {source}")
+        
+        # Keep the built-in class order when the labels fit it, so class_info still applies
+        if not set(labels) <= set(self.classes):
+            self.classes = sorted(set(labels))
+            self.fill_class_info()
+        
+        index = build_image_store(store_dir, paths, labels, self.classes)
+        if not index['count']:
+            raise ValueError(f"None of the {len(paths)} images listed by {source} could be read")
+        order = np.random.default_rng(seed).permutation(index['count'])
+        num_val = int(round(index['count'] * val_fraction))
+        
+        images_path = os.path.join(store_dir, IMAGES_FILENAME)
+        labels_path = os.path.join(store_dir, LABELS_FILENAME)
+        train_dataset = ImageShardDataset(images_path, labels_path, self.get_transforms(train=True, from_tensor=True),
+                                          indices=np.sort(order[num_val:]))
+        val_dataset = ImageShardDataset(images_path, labels_path, self.get_transforms(train=False, from_tensor=True),
+                                        indices=np.sort(order[:num_val]))
+        return train_dataset, val_dataset
+    
+    def create_data_loader(self, dataset, batch_size=32, shuffle=False, num_workers=0, evaluation=False):
+        """DataLoader with worker processes kept alive across epochs and pinned memory for CUDA
+        
+        Under torch.distributed each process gets a DistributedSampler shard;
+        call loader.sampler.set_epoch(epoch) to reshuffle every epoch.
+        evaluation=True shards without padding (see EvalShardSampler) instead.
+        """
+        sampler = None
+        if is_distributed():
+            sampler = EvalShardSampler(dataset) if evaluation else DistributedSampler(dataset, shuffle=shuffle)
+        return DataLoader(
+            dataset,
+            batch_size=batch_size,
+            shuffle=shuffle and sampler is None,
+            sampler=sampler,
+            num_workers=num_workers,
+            pin_memory=self.device.type == 'cuda',
+            persistent_workers=num_workers > 0
+        )
+    
+    def train_epoch(self, model, loader, criterion, optimizer, precision='fp32', channels_last=False):
+        """One pass over loader; loss and accuracy stay on the device until the end of the epoch"""
+        model.train()
+        memory_format = torch.channels_last if channels_last else torch.contiguous_format
+        loss_sum = torch.zeros((), device=self.device)
+        correct = torch.zeros((), dtype=torch.long, device=self.device)
+        total = 0
+        batches = 0
+        start = time.perf_counter()
+        
+        for data, target in loader:
+            data = data.to(self.device, memory_format=memory_format, non_blocking=True)
+            target = target.to(self.device, non_blocking=True)
+            
+            optimizer.zero_grad(set_to_none=True)
+            with torch.autocast(self.device.type, dtype=torch.bfloat16, enabled=precision == 'bf16'):
+                output = model(data)
+                loss = criterion(output, target)
+            loss.backward()
+            optimizer.step()
+            
+            loss_sum += loss.detach()
+            correct += (output.argmax(dim=1) == target).sum()
+            total += target.size(0)
+            batches += 1
+        
+        # The only host sync (and cross-process reduction) of the epoch
+        loss_sum, correct, total, batches = epoch_totals(loss_sum, correct, total, batches)
+        seconds = time.perf_counter() - start
+        return loss_sum / max(batches, 1), 100 * correct / max(total, 1), total / seconds
+    
+    def evaluate(self, model, loader, criterion, precision='fp32', channels_last=False):
+        """Mean batch loss and accuracy over loader"""
+        model.eval()
+        memory_format = torch.channels_last if channels_last else torch.contiguous_format
+        loss_sum = torch.zeros((), device=self.device)
+        correct = torch.zeros((), dtype=torch.long, device=self.device)
+        total = 0
+        batches = 0
+        
+        with torch.no_grad(), torch.autocast(self.device.type, dtype=torch.bfloat16, enabled=precision == 'bf16'):
+            for data, target in loader:
+                data = data.to(self.device, memory_format=memory_format, non_blocking=True)
+                target = target.to(self.device, non_blocking=True)
+                output = model(data)
+                loss_sum += criterion(output, target)
+                correct += (output.argmax(dim=1) == target).sum()
+                total += target.size(0)
+                batches += 1
+        
+        loss_sum, correct, total, batches = epoch_totals(loss_sum, correct, total, batches)
+        return loss_sum / max(batches, 1), 100 * correct / max(total, 1)
+    
+    def checkpoint(self, epoch, val_acc):
+        """CPU snapshot of the current weights in the save_model checkpoint format"""
+        return {
+            'model_state_dict': {k: v.detach().to('cpu', copy=True) for k, v in self.model.state_dict().items()},
+            'classes': list(self.classes),
+            'class_info': self.class_info,
+            'backbone': self.backbone,
+            'epoch': epoch,
+            'val_acc': val_acc
+        }
+    
+    @staticmethod
+    def write_checkpoint(checkpoint, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        torch.save(checkpoint, path + '.tmp')
+        # Readers never see a half-written checkpoint
+        os.replace(path + '.tmp', path)
+    
+    def train(self, epochs=50, batch_size=32, learning_rate=0.001, num_workers=0, cache_dir=None, data_source=None,
+              precision='fp32', channels_last=False, compile_model=False, checkpoint_path=None, pretrained=True):
+        """Train the disease detection model
+        
+        data_source is an image folder tree or CSV (see create_image_dataset);
+        without it the model trains on synthetic leaves. precision='bf16' runs
+        forward passes under bfloat16 autocast (CPU or CUDA), channels_last
+        switches to NHWC tensors, compile_model wraps the model in torch.compile.
+        With checkpoint_path, the best model so far is saved there from a
+        background thread.
+        """
+        if precision not in ('fp32', 'bf16'):
+            raise ValueError(f"precision must be 'fp32' or 'bf16', not {precision!r}")
+        
+        # Under torch.distributed (see distributed_training.py) rank 0 alone logs and checkpoints
+        distributed = is_distributed()
+        is_main = not distributed or dist.get_rank() == 0
+        log = print if is_main else (lambda *args, **kwargs: None)
+        
+        log("Training Plant Disease Detection Model...")
+        
+        # Create datasets first: real data can change the class list.
+        # The first process on each node builds any cache while the rest wait at
+        # the barrier, which the builders only reach once every node's cache is
+        # complete; so cache_dir may be node-local. A cache_dir shared between
+        # nodes should be built beforehand (e.g. by a single-process run).
+        builds_cache = is_local_main()
+        if not builds_cache:
+            dist.barrier()
+        if data_source:
+            train_dataset, val_dataset = self.create_image_dataset(data_source, store_dir=cache_dir or 'image_store')
+        else:
+            train_dataset, val_dataset = self.create_synthetic_dataset(cache_dir=cache_dir)
+        if distributed and builds_cache:
+            dist.barrier()
+        
+        # Create model; DDP broadcasts rank 0's weights, so only it loads the pretrained ones
+        self.model = PlantDiseaseClassifier(num_classes=len(self.classes), pretrained=pretrained and is_main,
+                                            backbone=self.backbone)
+        self.model.to(self.device)
+        if channels_last:
+            self.model.to(memory_format=torch.channels_last)
+        # Wrappers share parameters with self.model, which stays the one saved and exported
+        net = DistributedDataParallel(self.model) if distributed else self.model
+        net = torch.compile(net) if compile_model else net
+        
+        train_loader = self.create_data_loader(train_dataset, batch_size, shuffle=True, num_workers=num_workers)
+        val_loader = self.create_data_loader(val_dataset, batch_size, num_workers=num_workers, evaluation=True)
+        # Shards may differ in length by one batch, so evaluate the plain module rather than
+        # through DDP, whose forward could wait on collectives the other ranks never join
+        val_net = self.model if distributed else net
+        
+        # Loss and optimizer
+        criterion = nn.CrossEntropyLoss()
+        optimizer = optim.Adam(self.model.parameters(), lr=learning_rate)
+        scheduler = optim.lr_scheduler.ReduceLROnPlateau(optimizer, 'min', patience=5)
+        
+        # Training history
+        train_losses = []
+        val_losses = []
+        train_accs = []
+        val_accs = []
+        train_throughput = []
+        
+        best_val_acc = 0.0
+        saver = ThreadPoolExecutor(max_workers=1) if checkpoint_path else None
+        pending_save = None
+        
+        try:
+            for epoch in range(epochs):
+                if distributed:
+                    train_loader.sampler.set_epoch(epoch)
+                train_loss, train_acc, images_per_sec = self.train_epoch(
+                    net, train_loader, criterion, optimizer, precision, channels_last
+                )
+                val_loss, val_acc = self.evaluate(val_net, val_loader, criterion, precision, channels_last)
+                
+                # Update learning rate
+                scheduler.step(val_loss)
+                
+                # Save best model: snapshot now, write while the next epoch trains
+                if val_acc > best_val_acc:
+                    best_val_acc = val_acc
+                    if saver is not None and is_main:
+                        if pending_save is not None:
+                            pending_save.result()
+                        pending_save = saver.submit(self.write_checkpoint, self.checkpoint(epoch + 1, val_acc),
+                                                    checkpoint_path)
+                
+                # Record history
+                train_losses.append(train_loss)
+                val_losses.append(val_loss)
+                train_accs.append(train_acc)
+                val_accs.append(val_acc)
+                train_throughput.append(images_per_sec)
+                
+                log(f'Epoch {epoch+1}/{epochs}:')
+                log(f'  Train Loss: {train_loss:.4f}, Train Acc: {train_acc:.2f}%, {images_per_sec:.1f} images/sec')
+                log(f'  Val Loss: {val_loss:.4f}, Val Acc: {val_acc:.2f}%')
+                log(f'  Learning Rate: {optimizer.param_groups[0]["lr"]:.6f}')
+                log('-' * 60)
+        finally:
+            if saver is not None:
+                saver.shutdown(wait=True)
+        
+        if pending_save is not None:
+            pending_save.result()
+            print(f"Best model (val acc {best_val_acc:.2f}%) saved to {checkpoint_path}")
+        
+        return {
+            'train_losses': train_losses,
+            'val_losses': val_losses,
+            'train_accs': train_accs,
+            'val_accs': val_accs,
+            'train_images_per_sec': train_throughput,
+            'best_val_acc': best_val_acc
+        }
+    
+    def cache_teacher_logits(self, dataset, logits_path, batch_size=64):
+        """Run this (teacher) model over dataset once and store its logits as a float32 (n, classes) .npy"""
+        self.model.eval()
+        tmp_path = logits_path + '.tmp'
+        logits = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32,
+                                           shape=(len(dataset), len(self.classes)))
+        offset = 0
+        with torch.inference_mode():
+            for data, _ in self.create_data_loader(dataset, batch_size):
+                output = self.model(data.to(self.device)).float().cpu().numpy()
+                logits[offset:offset + len(output)] = output
+                offset += len(output)
+        logits.flush()
+        del logits
+        os.replace(tmp_path, logits_path)
+        return logits_path
+    
+    def measure_latency(self, repeats=50):
+        """Single-image forward latency (p50, p99) in ms"""
+        self.model.eval()
+        image = torch.randn(1, 3, 224, 224, device=self.device)
+        latencies = []
+        with torch.inference_mode():
+            self.model(image)
+            for _ in range(repeats):
+                start = time.perf_counter()
+                self.model(image)
+                latencies.append((time.perf_counter() - start) * 1000)
+        return float(np.percentile(latencies, 50)), float(np.percentile(latencies, 99))
+    
+    def parameter_mb(self):
+        return sum(p.numel() * p.element_size() for p in self.model.parameters()) / (1024 * 1024)
+    
+    def distill(self, teacher_dir='saved_models', output_dir='saved_models_student', epochs=20, batch_size=32,
+                learning_rate=0.001, temperature=4.0, alpha=0.7, cache_dir='synthetic_cache', data_source=None,
+                num_images=5000, num_workers=0, precision='fp32', channels_last=False, pretrained=True,
+                latency_repeats=50):
+        """Distill a model saved in teacher_dir into this model's (smaller) backbone
+        
+        Teacher logits are computed once per dataset and memory-mapped from
+        cache_dir, so teacher and student both see the unaugmented images. The
+        student is trained on distillation_loss, the epoch with the best
+        teacher agreement is kept, and output_dir gets the save_model layout
+        plus TorchScript, ONNX and distillation_report.json.
+        """
+        if not cache_dir:
+            raise ValueError("distill needs a cache_dir for the image store and teacher logits")
+        
+        teacher = DiseaseDetectionModel()
+        teacher.load_model(teacher_dir)
+        self.classes = teacher.classes
+        self.class_info = teacher.class_info
+        
+        if data_source:
+            train_dataset, val_dataset = teacher.create_image_dataset(data_source, store_dir=cache_dir)
+        else:
+            train_dataset, val_dataset = teacher.create_synthetic_dataset(cache_dir=cache_dir, num_images=num_images)
+        
+        datasets = {}
+        teacher_checkpoint = os.path.join(teacher_dir, 'disease_detection_pytorch.pth')
+        for split, dataset in (('train', train_dataset), ('val', val_dataset)):
+            dataset.transform = self.get_transforms(train=False, from_tensor=True)
+            signature = file_signature(teacher_checkpoint, dataset.images_path)
+            logits_path = os.path.join(cache_dir, f'teacher_logits_{split}_{signature}.npy')
+            if not os.path.exists(logits_path):
+                print(f"Caching teacher logits for {len(dataset)} {split} images...")
+                teacher.cache_teacher_logits(dataset, logits_path, batch_size)
+            datasets[split] = TeacherLogitsDataset(dataset, logits_path)
+        
+        self.model = PlantDiseaseClassifier(num_classes=len(self.classes), pretrained=pretrained, backbone=self.backbone)
+        self.model.to(self.device)
+        memory_format = torch.channels_last if channels_last else torch.contiguous_format
+        self.model.to(memory_format=memory_format)
+        
+        train_loader = self.create_data_loader(datasets['train'], batch_size, shuffle=True, num_workers=num_workers)
+        val_loader = self.create_data_loader(datasets['val'], batch_size, num_workers=num_workers)
+        optimizer = optim.Adam(self.model.parameters(), lr=learning_rate)
+        scheduler = optim.lr_scheduler.ReduceLROnPlateau(optimizer, 'max', patience=5)
+        
+        best_agreement = -1.0
+        best_state = None
+        for epoch in range(epochs):
+            self.model.train()
+            loss_sum = torch.zeros((), device=self.device)
+            batches = 0
+            for data, target, teacher_logits in train_loader:
+                data = data.to(self.device, memory_format=memory_format, non_blocking=True)
+                target = target.to(self.device, non_blocking=True)
+                teacher_logits = teacher_logits.to(self.device, non_blocking=True)
+                
+                optimizer.zero_grad(set_to_none=True)
+                with torch.autocast(self.device.type, dtype=torch.bfloat16, enabled=precision == 'bf16'):
+                    output = self.model(data)
+                loss = distillation_loss(output, teacher_logits, target, temperature, alpha)
+                loss.backward()
+                optimizer.step()
+                loss_sum += loss.detach()
+                batches += 1
+            
+            accuracy, agreement, teacher_accuracy = self.evaluate_agreement(val_loader, precision, memory_format)
+            scheduler.step(agreement)
+            if agreement > best_agreement:
+                best_agreement = agreement
+                best_state = {k: v.detach().clone() for k, v in self.model.state_dict().items()}
+            
+            print(f'Epoch {epoch+1}/{epochs}: Distill Loss: {loss_sum.item() / max(batches, 1):.4f}, '
+                  f'Val Acc: {accuracy:.2f}%, Teacher Agreement: {agreement:.2f}%')
+        
+        if best_state is not None:
+            self.model.load_state_dict(best_state)
+        self.model.to(memory_format=torch.contiguous_format)
+        accuracy, agreement, teacher_accuracy = self.evaluate_agreement(val_loader, 'fp32', torch.contiguous_format)
+        
+        self.save_model(output_dir)
+        self.export_torchscript(output_dir)
+        self.export_onnx(output_dir)
+        
+        teacher_p50, teacher_p99 = teacher.measure_latency(latency_repeats)
+        student_p50, student_p99 = self.measure_latency(latency_repeats)
+        report = {
+            'teacher_backbone': teacher.backbone,
+            'student_backbone': self.backbone,
+            'temperature': temperature,
+            'alpha': alpha,
+            'val_images': len(datasets['val']),
+            'top1_agreement': agreement,
+            'student_accuracy': accuracy,
+            'teacher_accuracy': teacher_accuracy,
+            'teacher_p50_ms': round(teacher_p50, 2),
+            'teacher_p99_ms': round(teacher_p99, 2),
+            'student_p50_ms': round(student_p50, 2),
+            'student_p99_ms': round(student_p99, 2),
+            'latency_speedup': round(teacher_p50 / student_p50, 2),
+            'teacher_parameter_mb': round(teacher.parameter_mb(), 2),
+            'student_parameter_mb': round(self.parameter_mb(), 2),
+            'memory_reduction': round(teacher.parameter_mb() / self.parameter_mb(), 2)
+        }
+        with open(os.path.join(output_dir, 'distillation_report.json'), 'w') as f:
+            json.dump(report, f, indent=2)
+        
+        print(f"\nStudent ({self.backbone}) vs teacher ({teacher.backbone}):")
+        print(f"  Top-1 agreement: {agreement:.2f}%  (accuracy {accuracy:.2f}% vs {teacher_accuracy:.2f}%)")
+        print(f"  Latency p50/p99: {student_p50:.1f}/{student_p99:.1f} ms vs {teacher_p50:.1f}/{teacher_p99:.1f} ms "
+              f"({report['latency_speedup']}x faster)")
+        print(f"  Weights: {report['student_parameter_mb']} MB vs {report['teacher_parameter_mb']} MB "
+              f"({report['memory_reduction']}x smaller)")
+        return report
+    
+    def evaluate_agreement(self, loader, precision='fp32', memory_format=torch.contiguous_format):
+        """Student accuracy, student/teacher top-1 agreement and teacher accuracy over (image, label, logits) batches"""
+        self.model.eval()
+        correct = torch.zeros((), dtype=torch.long, device=self.device)
+        agree = torch.zeros((), dtype=torch.long, device=self.device)
+        teacher_correct = torch.zeros((), dtype=torch.long, device=self.device)
+        total = 0
+        with torch.inference_mode(), torch.autocast(self.device.type, dtype=torch.bfloat16, enabled=precision == 'bf16'):
+            for data, target, teacher_logits in loader:
+                data = data.to(self.device, memory_format=memory_format, non_blocking=True)
+                target = target.to(self.device, non_blocking=True)
+                teacher_predicted = teacher_logits.to(self.device, non_blocking=True).argmax(dim=1)
+                predicted = self.model(data).argmax(dim=1)
+                correct += (predicted == target).sum()
+                agree += (predicted == teacher_predicted).sum()
+                teacher_correct += (teacher_predicted == target).sum()
+                total += target.size(0)
+        total = max(total, 1)
+        return 100 * correct.item() / total, 100 * agree.item() / total, 100 * teacher_correct.item() / total
+    
+    def load_image(self, image_path_or_array):
+        """Load an image path, array or PIL image as an RGB PIL image"""
+        if isinstance(image_path_or_array, str):
+            return Image.open(image_path_or_array).convert('RGB')
+        elif isinstance(image_path_or_array, np.ndarray):
+            return Image.fromarray(image_path_or_array)
+        return image_path_or_array
+    
+    def format_prediction(self, class_idx, confidence):
+        """Build the result dictionary for one predicted class"""
+        class_name = self.classes[class_idx]
+        return {
+            'disease': class_name.replace('_', ' ').title(),
+            'confidence': confidence,
+            'severity': self.class_info[class_name]['severity'],
+            'description': self.class_info[class_name]['description'],
+            'symptoms': [f"Symptoms of {class_name.replace('_', ' ')}"],
+            'causes': [f"Common causes of {class_name.replace('_', ' ')}"],
+            'treatments': self.class_info[class_name]['treatments']
+        }
+    
+    def predict_batch(self, images, top_k=3):
+        """Predict diseases for a list of images with a single forward pass"""
+        if self.model is None:
+            raise ValueError("Model not trained. Call train() first.")
+        
+        self.model.eval()
+        
+        # Stack preprocessed images into one batch tensor
+        transform = self.get_transforms(train=False)
+        batch = torch.stack([transform(self.load_image(image)) for image in images]).to(self.device)
+        
+        # Make prediction
+        with torch.no_grad():
+            outputs = self.model(batch)
+            probabilities = torch.nn.functional.softmax(outputs, dim=1)
+        
+        # Get top-k predictions for every image
+        top_probs, top_indices = torch.topk(probabilities, top_k)
+        top_probs = top_probs.cpu().numpy()
+        top_indices = top_indices.cpu().numpy()
+        
+        return [
+            [self.format_prediction(int(top_indices[row][i]), float(top_probs[row][i]) * 100)
+             for i in range(top_k)]
+            for row in range(len(images))
+        ]
+    
+    def predict(self, image_path_or_array, top_k=3):
+        """Predict disease from image"""
+        results = self.predict_batch([image_path_or_array], top_k=top_k)[0]
+        return results[0] if top_k == 1 else results
+    
+    def save_model(self, model_dir='saved_models'):
+        """Save the trained model"""
+        if not os.path.exists(model_dir):
+            os.makedirs(model_dir)
+        
+        # Save PyTorch model
+        torch.save({
+            'model_state_dict': self.model.state_dict(),
+            'classes': self.classes,
+            'class_info': self.class_info,
+            'backbone': self.backbone
+        }, os.path.join(model_dir, 'disease_detection_pytorch.pth'))
+        
+        # Save model metadata
+        metadata = {
+            'classes': self.classes,
+            'num_classes': len(self.classes),
+            'model_type': f'pytorch_{self.backbone}',
+            'backbone': self.backbone,
+            'input_size': [224, 224, 3],
+            'class_info': self.class_info
+        }
+        
+        with open(os.path.join(model_dir, 'disease_metadata.json'), 'w') as f:
+            json.dump(metadata, f, indent=2)
+        
+        print(f"Model saved to {model_dir}")
+    
+    def load_model(self, model_dir='saved_models'):
+        """Load a pre-trained model"""
+        checkpoint = torch.load(os.path.join(model_dir, 'disease_detection_pytorch.pth'),
+                               map_location=self.device)
+        
+        self.classes = checkpoint['classes']
+        self.class_info = checkpoint['class_info']
+        # Checkpoints from before the backbone registry are ResNet50
+        self.backbone = checkpoint.get('backbone', DEFAULT_BACKBONE)
+        
+        # Weights come from the checkpoint, so skip the ImageNet download
+        self.model = PlantDiseaseClassifier(num_classes=len(self.classes), pretrained=False, backbone=self.backbone)
+        self.model.load_state_dict(checkpoint['model_state_dict'])
+        self.model.to(self.device)
+        self.model.eval()
+        
+        print(f"Model loaded from {model_dir}")
+    
+    def publish(self, registry_dir=model_registry.DEFAULT_REGISTRY_DIR, version=None, metrics=None,
+                quantize_modes=()):
+        """Save the checkpoint and ONNX export (plus optional INT8 variants) as a new registry version"""
+        if self.model is None:
+            raise ValueError("Model not trained. Call train() first.")
+        
+        with tempfile.TemporaryDirectory() as staging_dir:
+            self.save_model(staging_dir)
+            self.export_onnx(staging_dir)
+            for mode in quantize_modes:
+                self.quantize_onnx(staging_dir, mode=mode)
+            
+            input_spec = {
+                'shape': [None, 3, 224, 224],
+                'dtype': 'float32',
+                'layout': 'NCHW',
+                'mean': [0.485, 0.456, 0.406],
+                'std': [0.229, 0.224, 0.225],
+                'classes': self.classes
+            }
+            return model_registry.publish(staging_dir, 'disease', registry_dir, version=version, metrics=metrics,
+                                          input_spec=input_spec, model_type=f'pytorch_{self.backbone}')
+    
+    def export_torchscript(self, model_dir='saved_models'):
+        """Export model to TorchScript format"""
+        if self.model is None:
+            raise ValueError("Model not trained. Call train() first.")
+        
+        self.model.eval()
+        
+        # Create example input
+        example_input = torch.randn(1, 3, 224, 224).to(self.device)
+        
+        # Trace the model
+        traced_model = torch.jit.trace(self.model, example_input)
+        
+        # Save TorchScript model
+        torchscript_path = os.path.join(model_dir, 'disease_detection.pt')
+        traced_model.save(torchscript_path)
+        
+        print(f"TorchScript model saved to {torchscript_path}")
+        return torchscript_path
+    
+    def export_onnx(self, model_dir='saved_models'):
+        """Export model to ONNX format"""
+        if self.model is None:
+            raise ValueError("Model not trained. Call train() first.")
+        
+        self.model.eval()
+        
+        # Create example input
+        dummy_input = torch.randn(1, 3, 224, 224).to(self.device)
+        
+        # Export to ONNX
+        onnx_path = os.path.join(model_dir, 'disease_detection.onnx')
+        torch.onnx.export(
+            self.model,
+            dummy_input,
+            onnx_path,
+            export_params=True,
+            opset_version=BACKBONES[self.backbone]['onnx_opset'],
+            do_constant_folding=True,
+            input_names=['input'],
+            output_names=['output'],
+            dynamic_axes={
+                'input': {0: 'batch_size'},
+                'output': {0: 'batch_size'}
+            }
+        )
+        
+        print(f"ONNX model saved to {onnx_path}")
+        return onnx_path
+    
+    def quantize_onnx(self, model_dir='saved_models', mode='static', calibration_samples=128):
+        """Post-training INT8 quantization of the ONNX export.
+        
+        mode='dynamic' quantizes weights only; mode='static' also quantizes
+        activations using ranges calibrated on PlantDiseaseDataset images.
+        """
+        try:
+            from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+        except ImportError:
+            print("onnxruntime not available. Install with: pip install onnxruntime")
+            return None
+        
+        onnx_path = os.path.join(model_dir, 'disease_detection.onnx')
+        if not os.path.exists(onnx_path):
+            onnx_path = self.export_onnx(model_dir)
+        
+        # Exporter shape annotations can disagree with ONNX shape inference, so drop
+        # them and save a single-file copy (weights inline) for the quantizer to re-infer
+        import onnx
+        model_proto = onnx.load(onnx_path)
+        del model_proto.graph.value_info[:]
+        source_path = os.path.join(model_dir, 'disease_detection_quant_source.onnx')
+        onnx.save(model_proto, source_path)
+        
+        quantized_path = os.path.join(model_dir, f'disease_detection_int8_{mode}.onnx')
+        try:
+            if mode == 'dynamic':
+                quantize_dynamic(source_path, quantized_path, weight_type=QuantType.QInt8)
+            elif mode == 'static':
+                calibration_dataset = PlantDiseaseDataset(
+                    image_paths=[],
+                    labels=[],
+                    transform=self.get_transforms(train=False),
+                    synthetic=True
+                )
+                quantize_static(
+                    source_path,
+                    quantized_path,
+                    CalibrationImageReader(calibration_dataset, num_samples=calibration_samples),
+                    quant_format=QuantFormat.QDQ,
+                    per_channel=True,
+                    activation_type=QuantType.QUInt8,
+                    weight_type=QuantType.QInt8
+                )
+            else:
+                raise ValueError(f"Unknown quantization mode: {mode}")
+        finally:
+            os.remove(source_path)
+        
+        print(f"INT8 ({mode}) ONNX model saved to {quantized_path}")
+        return quantized_path
+    
+    def export_tflite(self, model_dir='saved_models'):
+        """Export model to TensorFlow Lite (requires onnx-tf)"""
+        try:
+            import onnx
+            from onnx_tf.backend import prepare
+            import tensorflow as tf
+            
+            # First export to ONNX
+            onnx_path = self.export_onnx(model_dir)
+            
+            # Load ONNX model
+            onnx_model = onnx.load(onnx_path)
+            
+            # Convert to TensorFlow
+            tf_rep = prepare(onnx_model)
+            
+            # Export to SavedModel format
+            tf_model_dir = os.path.join(model_dir, 'tf_model')
+            tf_rep.export_graph(tf_model_dir)
+            
+            # Convert to TFLite
+            converter = tf.lite.TFLiteConverter.from_saved_model(tf_model_dir)
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            tflite_model = converter.convert()
+            
+            # Save TFLite model
+            tflite_path = os.path.join(model_dir, 'disease_detection.tflite')
+            with open(tflite_path, 'wb') as f:
+                f.write(tflite_model)
+            
+            print(f"TensorFlow Lite model saved to {tflite_path}")
+            return tflite_path
+            
+        except ImportError:
+            print("onnx-tf not available. Install with: pip install onnx-tf")
+            return None
+
+
+def main():
+    """Train and export the disease detection model"""
+    print("Training Disease Detection Model...")
+    
+    # Create model instance
+    model = DiseaseDetectionModel()
+    
+    # Train model (reduced epochs for demo)
+    history = model.train(epochs=20, batch_size=16, num_workers=min(4, os.cpu_count() or 1),
+                          cache_dir='synthetic_cache', precision='bf16', channels_last=True,
+                          checkpoint_path=os.path.join('saved_models', 'disease_detection_best.pth'))
+    
+    print(f"\nBest validation accuracy: {history['best_val_acc']:.2f}%")
+    
+    # Save model in multiple formats
+    model.save_model()
+    model.export_torchscript()
+    model.export_onnx()
+    model.quantize_onnx(mode='dynamic')
+    model.quantize_onnx(mode='static')
+    model.export_tflite()
+    
+    # Publish a registry version the backend can hot-swap to
+    model.publish(metrics={'best_val_acc': history['best_val_acc']}, quantize_modes=('dynamic',))
+    
+    # Test prediction with synthetic data
+    dataset = PlantDiseaseDataset([], [], transform=None, synthetic=True)
+    test_image = dataset.generate_synthetic_image()
+    
+    result = model.predict(test_image)
+    print("\nTest Prediction:")
+    print(f"Disease: {result['disease']}")
+    print(f"Confidence: {result['confidence']:.2f}%")
+    print(f"Severity: {result['severity']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Data-parallel training of the disease classifier across CPU processes and nodes.
+
+One machine, N processes (spawned here):
+    python distributed_training.py --nproc 4 --epochs 20
+
+Several machines, through torchrun (run on every node):
+    torchrun --nnodes 2 --nproc-per-node 4 --rdzv-backend c10d --rdzv-endpoint HOST:29500 \\
+        distributed_training.py --epochs 20
+
+Scaling benchmark (images/sec at 1, 2, 4 and 8 processes on this machine):
+    python distributed_training.py --benchmark --processes 1 2 4 8
+"""
+import argparse
+import json
+import os
+import socket
+import tempfile
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import torch.nn as nn
+import torch.optim as optim
+from torch.nn.parallel import DistributedDataParallel
+
+from disease_detection_model import BACKBONES, DiseaseDetectionModel, PlantDiseaseClassifier
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def init_distributed(backend='gloo'):
+    """Join the process group described by torchrun-style environment variables.
+
+    Each process gets an equal share of the machine's cores for intra-op threads,
+    so N processes on one box do not oversubscribe it.
+    """
+    if not dist.is_initialized():
+        dist.init_process_group(backend)
+    local_world_size = int(os.environ.get('LOCAL_WORLD_SIZE', dist.get_world_size()))
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // local_world_size))
+    return dist.get_rank(), dist.get_world_size()
+
+
+def run_spawned(local_rank, nproc, target, args):
+    os.environ.update({
+        'RANK': str(local_rank),
+        'LOCAL_RANK': str(local_rank),
+        'WORLD_SIZE': str(nproc),
+        'LOCAL_WORLD_SIZE': str(nproc)
+    })
+    init_distributed(args.backend)
+    try:
+        target(args)
+    finally:
+        dist.destroy_process_group()
+
+
+def spawn_local(nproc, target, args):
+    """Run target(args) in nproc processes of a single-node process group"""
+    os.environ.setdefault('MASTER_ADDR', '127.0.0.1')
+    os.environ['MASTER_PORT'] = str(free_port())
+    mp.spawn(run_spawned, args=(nproc, target, args), nprocs=nproc, join=True)
+
+
+def train_worker(args):
+    """Per-process training; DiseaseDetectionModel.train handles samplers, DDP and rank-0 output"""
+    model = DiseaseDetectionModel(args.backbone)
+    model.train(
+        epochs=args.epochs,
+        batch_size=args.batch_size,
+        learning_rate=args.learning_rate * (dist.get_world_size() if args.scale_lr else 1),
+        num_workers=args.num_workers,
+        cache_dir=args.cache_dir,
+        data_source=args.data_source,
+        precision=args.precision,
+        channels_last=args.channels_last,
+        checkpoint_path=os.path.join(args.model_dir, 'disease_detection_best.pth'),
+        pretrained=args.pretrained
+    )
+    if dist.get_rank() == 0:
+        model.save_model(args.model_dir)
+
+
+def benchmark_worker(args):
+    """Steady-state training images/sec summed over all processes; rank 0 writes it to args.result_path"""
+    model = DiseaseDetectionModel(args.backbone)
+    dataset, _ = model.create_synthetic_dataset(cache_dir=args.cache_dir, num_images=args.num_images)
+
+    torch.manual_seed(0)
+    model.model = PlantDiseaseClassifier(num_classes=len(model.classes), pretrained=False,
+                                         backbone=model.backbone)
+    if args.channels_last:
+        model.model.to(memory_format=torch.channels_last)
+    net = DistributedDataParallel(model.model)
+    loader = model.create_data_loader(dataset, args.batch_size, shuffle=True, num_workers=args.num_workers)
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(model.model.parameters(), lr=args.learning_rate)
+
+    rates = []
+    # The first epoch warms up oneDNN and gloo buffers and is not counted
+    for epoch in range(args.benchmark_epochs + 1):
+        loader.sampler.set_epoch(epoch)
+        rates.append(model.train_epoch(net, loader, criterion, optimizer, args.precision, args.channels_last)[2])
+
+    if dist.get_rank() == 0:
+        with open(args.result_path, 'w') as f:
+            json.dump(sum(rates[1:]) / args.benchmark_epochs, f)
+
+
+def run_scaling_benchmark(args):
+    """Training throughput at each process count, over one shared pre-rendered dataset"""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        args.cache_dir = args.cache_dir or tmp_dir
+        # Render once up front so no run pays for (or races on) it
+        DiseaseDetectionModel().create_synthetic_dataset(cache_dir=args.cache_dir, num_images=args.num_images)
+
+        for nproc in args.processes:
+            print(f"Benchmarking {nproc} process(es)...")
+            args.result_path = os.path.join(tmp_dir, f'result_{nproc}.json')
+            spawn_local(nproc, benchmark_worker, args)
+            with open(args.result_path) as f:
+                results[nproc] = json.load(f)
+
+    baseline = results.get(1) or results[args.processes[0]] / args.processes[0]
+    print(f"\n{os.cpu_count()} cores, batch {args.batch_size} per process, {args.precision}"
+          f"{', channels_last' if args.channels_last else ''}")
+    print(f"{'processes':<11}{'images/sec':>12}{'speedup':>9}{'efficiency':>12}")
+    for nproc, rate in results.items():
+        print(f"{nproc:<11}{rate:>12.1f}{rate / baseline:>8.2f}x{rate / baseline / nproc * 100:>11.1f}%")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({str(k): v for k, v in results.items()}, f, indent=2)
+        print(f"\nBenchmark results saved to {args.output}")
+    return results
+
+
+def main():
+    """Distributed (DDP, gloo) training and scaling benchmark for the disease classifier"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--nproc', type=int, default=1, help='processes to spawn when not launched by torchrun')
+    parser.add_argument('--backend', default='gloo')
+    parser.add_argument('--backbone', choices=list(BACKBONES), default='resnet50')
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=16, help='per process')
+    parser.add_argument('--learning-rate', type=float, default=0.001)
+    parser.add_argument('--scale-lr', action='store_true', help='multiply the learning rate by the world size')
+    parser.add_argument('--num-workers', type=int, default=0, help='DataLoader workers per process')
+    parser.add_argument('--precision', choices=['fp32', 'bf16'], default='bf16')
+    parser.add_argument('--no-channels-last', dest='channels_last', action='store_false')
+    parser.add_argument('--no-pretrained', dest='pretrained', action='store_false', help='skip ImageNet weights')
+    parser.add_argument('--cache-dir', default=None, help='pre-rendered synthetic shards or real image store')
+    parser.add_argument('--data-source', default=None, help='image folder tree or CSV (default: synthetic)')
+    parser.add_argument('--model-dir', default='saved_models')
+    parser.add_argument('--benchmark', action='store_true', help='run the scaling benchmark instead of training')
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--num-images', type=int, default=256, help='benchmark dataset size')
+    parser.add_argument('--benchmark-epochs', type=int, default=2, help='timed epochs per process count')
+    parser.add_argument('--output', default=None, help='optional JSON benchmark report path')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_scaling_benchmark(args)
+    elif 'WORLD_SIZE' in os.environ:
+        # Launched by torchrun: this process is one rank
+        init_distributed(args.backend)
+        try:
+            train_worker(args)
+        finally:
+            dist.destroy_process_group()
+    else:
+        spawn_local(args.nproc, train_worker, args)
+
+
+if __name__ == "__main__":
+    main()
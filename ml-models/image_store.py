@@ -0,0 +1,203 @@
+import csv
+import hashlib
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+INDEX_FILENAME = 'index.json'
+IMAGES_FILENAME = 'images.npy'
+LABELS_FILENAME = 'labels.npy'
+
+# Header spellings accepted for the two CSV columns
+PATH_COLUMNS = ('path', 'image', 'filename', 'file', 'image_path')
+LABEL_COLUMNS = ('label', 'class', 'disease', 'class_name')
+
+
+def normalize_class_name(name):
+    """'Tomato___Early blight' -> 'tomato___early_blight'; the crop prefix is kept"""
+    return name.strip().lower().replace(' ', '_')
+
+
+def resolve_class_names(source_labels, known_classes=()):
+    """{source label: class name} for the distinct labels of a dataset.
+
+    PlantVillage folders look like 'Tomato___Early_blight'. The crop prefix is
+    dropped only when the rest is one of known_classes and no other label
+    resolves to it, so 'Tomato___Early_blight' and 'Potato___Early_blight' stay
+    separate classes. Raises ValueError if two source labels still resolve to
+    the same class (e.g. 'Early blight' and 'early_blight' folders).
+    """
+    names = {label: normalize_class_name(label) for label in set(source_labels)}
+    stripped_from = defaultdict(list)
+    for label, name in names.items():
+        stripped = name.split('___')[-1]
+        if stripped != name and stripped in known_classes:
+            stripped_from[stripped].append(label)
+    taken = set(names.values())
+    for stripped, labels in stripped_from.items():
+        if len(labels) == 1 and stripped not in taken:
+            names[labels[0]] = stripped
+
+    by_class = defaultdict(list)
+    for label, name in names.items():
+        by_class[name].append(label)
+    collisions = [f"{', '.join(repr(label) for label in sorted(labels))} -> {name!r}"
+                  for name, labels in sorted(by_class.items()) if len(labels) > 1]
+    if collisions:
+        raise ValueError(f"Labels that differ only in spelling map to the same class: {'; '.join(collisions)}")
+    return names
+
+
+def scan_image_folder(root):
+    """(paths, class folder names) for a root/<class>/<image> tree, in a stable order"""
+    paths, labels = [], []
+    for class_dir in sorted(os.listdir(root)):
+        class_path = os.path.join(root, class_dir)
+        if not os.path.isdir(class_path):
+            continue
+        for dirpath, dirnames, filenames in os.walk(class_path):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    paths.append(os.path.join(dirpath, filename))
+                    labels.append(class_dir)
+    return paths, labels
+
+
+def read_image_csv(csv_path, image_root=None):
+    """(paths, labels) from a CSV with path and label columns; relative paths resolve against image_root"""
+    image_root = image_root or os.path.dirname(os.path.abspath(csv_path))
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        columns = {name.strip().lower(): name for name in reader.fieldnames or []}
+        path_column = next((columns[c] for c in PATH_COLUMNS if c in columns), None)
+        label_column = next((columns[c] for c in LABEL_COLUMNS if c in columns), None)
+        if path_column is None or label_column is None:
+            raise ValueError(f"{csv_path} needs a path column ({', '.join(PATH_COLUMNS)}) "
+                             f"and a label column ({', '.join(LABEL_COLUMNS)})")
+
+        paths, labels = [], []
+        for row in reader:
+            paths.append(os.path.join(image_root, row[path_column].strip()))
+            labels.append(row[label_column].strip())
+    return paths, labels
+
+
+def list_images(source, image_root=None, known_classes=()):
+    """(paths, class names) from an image folder tree or a CSV file; see resolve_class_names"""
+    if os.path.isdir(source):
+        paths, labels = scan_image_folder(source)
+    else:
+        paths, labels = read_image_csv(source, image_root)
+    names = resolve_class_names(labels, known_classes)
+    return paths, [names[label] for label in labels]
+
+
+def fingerprint(paths, img_size):
+    """Changes whenever a source file is added, removed, replaced or touched"""
+    digest = hashlib.sha1(str(img_size).encode())
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            digest.update(f'{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n'.encode())
+        except OSError:
+            # Missing files are skipped by the build, and a file appearing later triggers a rebuild
+            digest.update(f'{path}\0missing\n'.encode())
+    return digest.hexdigest()
+
+
+def decode_resized(path, img_size):
+    """Decode one image straight to img_size x img_size RGB uint8, or None if it is unreadable"""
+    try:
+        with Image.open(path) as image:
+            # JPEG decodes at a reduced DCT scale when the target is much smaller
+            image.draft('RGB', (img_size, img_size))
+            image = image.convert('RGB').resize((img_size, img_size), Image.BILINEAR)
+            return np.asarray(image, dtype=np.uint8)
+    except (OSError, ValueError):
+        return None
+
+
+def load_index(store_dir):
+    index_path = os.path.join(store_dir, INDEX_FILENAME)
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path) as f:
+        return json.load(f)
+
+
+def build_image_store(store_dir, paths, labels, classes=None, img_size=224, num_threads=None):
+    """Decode and resize every image once into a memory-mapped uint8 store.
+
+    Unreadable or missing files are skipped and listed in the index. Writes images.npy (n, img_size, img_size, 3), labels.npy (class indices)
+    and index.json (classes, source files, fingerprint). An existing store
+    whose fingerprint still matches the sources is reused as is.
+    """
+    if len(paths) != len(labels):
+        raise ValueError("paths and labels must have the same length")
+    classes = list(classes) if classes else sorted(set(labels))
+    unknown = sorted(set(labels) - set(classes))
+    if unknown:
+        raise ValueError(f"Labels not in classes: {', '.join(unknown)}")
+
+    source_fingerprint = fingerprint(paths, img_size)
+    index = load_index(store_dir)
+    if index is not None and index['fingerprint'] == source_fingerprint and index['classes'] == classes:
+        print(f"Image store {store_dir} is up to date ({index['count']} images)")
+        return index
+
+    if index is not None:
+        os.remove(os.path.join(store_dir, INDEX_FILENAME))
+    elif not os.path.exists(store_dir):
+        os.makedirs(store_dir)
+
+    images_path = os.path.join(store_dir, IMAGES_FILENAME)
+    tmp_path = images_path + '.tmp'
+    images = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8,
+                                       shape=(len(paths), img_size, img_size, 3))
+
+    # PIL releases the GIL while decoding and resizing, so threads scale across cores
+    class_ids = {name: i for i, name in enumerate(classes)}
+    kept, skipped = [], []
+    with ThreadPoolExecutor(num_threads or os.cpu_count()) as pool:
+        for path, label, pixels in zip(paths, labels, pool.map(lambda p: decode_resized(p, img_size), paths)):
+            if pixels is None:
+                skipped.append(path)
+                continue
+            images[len(kept)] = pixels
+            kept.append((path, class_ids[label]))
+    images.flush()
+    del images
+
+    # Drop the rows reserved for unreadable files
+    if skipped:
+        full = np.load(tmp_path, mmap_mode='r')
+        trimmed = np.lib.format.open_memmap(tmp_path + '.trim', mode='w+', dtype=np.uint8,
+                                            shape=(len(kept), img_size, img_size, 3))
+        trimmed[:] = full[:len(kept)]
+        trimmed.flush()
+        del full, trimmed
+        os.replace(tmp_path + '.trim', tmp_path)
+
+    np.save(os.path.join(store_dir, LABELS_FILENAME), np.array([label for _, label in kept], dtype=np.int64))
+    os.replace(tmp_path, images_path)
+
+    index = {
+        'img_size': img_size,
+        'classes': classes,
+        'count': len(kept),
+        'files': [path for path, _ in kept],
+        'skipped': skipped,
+        'fingerprint': source_fingerprint
+    }
+    # Written last: a store without an index is rebuilt on the next run
+    with open(os.path.join(store_dir, INDEX_FILENAME), 'w') as f:
+        json.dump(index, f, indent=2)
+
+    print(f"Image store {store_dir}: {len(kept)} images, {len(skipped)} unreadable skipped")
+    return index
@@ -0,0 +1,163 @@
+"""Versioned model registry shared by the training scripts and the backend.
+
+Layout, one directory per published version:
+
+    model_registry/
+        disease/
+            20250101-120000/
+                manifest.json
+                disease_detection_pytorch.pth
+                disease_detection.onnx
+                ...
+            CURRENT            <- version the backend serves (written on activation)
+        crop/
+            ...
+
+manifest.json records every file's sha256 and size, the training metrics and
+the input spec the backend warms a new version up with. A version directory is
+assembled under a temporary name and renamed into place, so a half-copied
+version is never visible to readers.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+
+MANIFEST_FILENAME = 'manifest.json'
+CURRENT_FILENAME = 'CURRENT'
+DEFAULT_REGISTRY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_registry')
+
+# Model names and versions become directory names and arrive through the admin API, so keep them plain
+NAME_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$')
+
+
+def validate_name(value, what='model version'):
+    if not isinstance(value, str) or not NAME_PATTERN.match(value):
+        raise ValueError(f"Invalid {what}: {value!r}")
+    return value
+
+
+def sha256_file(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_checksums(model_dir):
+    """{relative path: {sha256, bytes}} for every file under model_dir except the manifest"""
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(model_dir):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            relative = os.path.relpath(path, model_dir).replace(os.sep, '/')
+            if relative == MANIFEST_FILENAME:
+                continue
+            files[relative] = {'sha256': sha256_file(path), 'bytes': os.path.getsize(path)}
+    return files
+
+
+def model_path(registry_dir, name):
+    return os.path.join(registry_dir, validate_name(name, 'model name'))
+
+
+def version_path(registry_dir, name, version):
+    """Directory of a published version; FileNotFoundError if there is none"""
+    path = os.path.join(model_path(registry_dir, name), validate_name(version))
+    if not os.path.exists(os.path.join(path, MANIFEST_FILENAME)):
+        raise FileNotFoundError(f"No published version {version} of the {name} model in {registry_dir}")
+    return path
+
+
+def load_manifest(path):
+    with open(os.path.join(path, MANIFEST_FILENAME)) as f:
+        return json.load(f)
+
+
+def list_versions(registry_dir, name):
+    """Manifests of every published version of a model, oldest first"""
+    root = model_path(registry_dir, name)
+    if not os.path.isdir(root):
+        return []
+    manifests = []
+    for entry in os.listdir(root):
+        if NAME_PATTERN.match(entry) and os.path.exists(os.path.join(root, entry, MANIFEST_FILENAME)):
+            manifests.append(load_manifest(os.path.join(root, entry)))
+    return sorted(manifests, key=lambda manifest: (manifest['created_at'], manifest['version']))
+
+
+def latest_version(registry_dir, name):
+    versions = list_versions(registry_dir, name)
+    return versions[-1]['version'] if versions else None
+
+
+def current_version(registry_dir, name):
+    """Version last activated for serving, or None"""
+    try:
+        with open(os.path.join(model_path(registry_dir, name), CURRENT_FILENAME)) as f:
+            return validate_name(f.read().strip())
+    except FileNotFoundError:
+        return None
+
+
+def set_current_version(registry_dir, name, version):
+    """Point CURRENT at a published version (atomic replace, so readers never see a partial file)"""
+    version_path(registry_dir, name, version)
+    pointer = os.path.join(model_path(registry_dir, name), CURRENT_FILENAME)
+    with open(pointer + '.tmp', 'w') as f:
+        f.write(version + '\n')
+    os.replace(pointer + '.tmp', pointer)
+
+
+def verify(path):
+    """Check every file listed in the manifest against its checksum; returns the manifest"""
+    manifest = load_manifest(path)
+    problems = []
+    for relative, expected in manifest['files'].items():
+        file_path = os.path.join(path, *relative.split('/'))
+        if not os.path.isfile(file_path):
+            problems.append(f"{relative} is missing")
+        elif os.path.getsize(file_path) != expected['bytes'] or sha256_file(file_path) != expected['sha256']:
+            problems.append(f"{relative} does not match its checksum")
+    if problems:
+        raise ValueError(f"Model version {manifest['version']} is corrupt: {'; '.join(problems)}")
+    return manifest
+
+
+def publish(model_dir, name, registry_dir=DEFAULT_REGISTRY_DIR, version=None, metrics=None, input_spec=None,
+            model_type=None):
+    """Copy the artifacts in model_dir into a new registry version and write its manifest.
+
+    version defaults to a UTC timestamp. Publishing does not change what is served;
+    the backend's admin endpoint activates a version.
+    """
+    version = validate_name(version or time.strftime('%Y%m%d-%H%M%S', time.gmtime()))
+    root = model_path(registry_dir, name)
+    target = os.path.join(root, version)
+    if os.path.exists(target):
+        raise FileExistsError(f"Version {version} of the {name} model already exists in {registry_dir}")
+
+    staging = os.path.join(root, f'.{version}.tmp')
+    if os.path.exists(staging):
+        shutil.rmtree(staging)
+    shutil.copytree(model_dir, staging)
+
+    manifest = {
+        'name': name,
+        'version': version,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'model_type': model_type,
+        'metrics': metrics or {},
+        'input_spec': input_spec or {},
+        'files': file_checksums(staging)
+    }
+    with open(os.path.join(staging, MANIFEST_FILENAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.rename(staging, target)
+
+    print(f"Published {name} model version {version} to {target}")
+    return manifest